@@ -0,0 +1,129 @@
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from config import WAIT_SETTINGS
+import tracing
+
+class WaitStats:
+    """Duraciones observadas por paso, persistidas entre ejecuciones"""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, state_file, max_samples=50):
+        self.state_file = state_file
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.samples = self._load()
+
+    @classmethod
+    def shared(cls):
+        """Instancia común para todos los drivers del proceso"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(WAIT_SETTINGS['stats_file'])
+            return cls._shared
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"No se pudieron leer las estadísticas de espera: {e}")
+            return {}
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.samples, indent=2, sort_keys=True)
+        folder = os.path.dirname(self.state_file) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.state_file)
+
+    def record(self, step, seconds):
+        with self.lock:
+            samples = self.samples.setdefault(step, [])
+            samples.append(round(seconds, 3))
+            del samples[:-self.max_samples]
+
+    def reset(self, step):
+        """Olvida el historial del paso, que vuelve a usar max_timeout hasta reunir muestras"""
+        with self.lock:
+            self.samples.pop(step, None)
+
+    def timeout_for(self, step, min_timeout, max_timeout):
+        """
+        Timeout aprendido para el paso: percentil 95 observado multiplicado por un margen,
+        acotado entre min_timeout y max_timeout. Sin historial usa max_timeout.
+        """
+        with self.lock:
+            samples = sorted(self.samples.get(step, []))
+        if len(samples) < WAIT_SETTINGS['min_samples']:
+            return max_timeout
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return max(min_timeout, min(max_timeout, p95 * WAIT_SETTINGS['timeout_factor'] + 1))
+
+class AdaptiveWaiter:
+    """Espera condiciones con polling corto en lugar de pausas fijas"""
+
+    def __init__(self, driver, stats=None, poll_frequency=None):
+        self.driver = driver
+        self.stats = stats or WaitStats.shared()
+        self.poll_frequency = poll_frequency or WAIT_SETTINGS['poll_frequency']
+
+    def until(self, step, condition, max_timeout=30, min_timeout=2):
+        """
+        Espera a que `condition(driver)` sea verdadera y registra cuánto tardó.
+
+        Args:
+            step (str): Nombre del paso, usado para aprender su timeout
+            condition (callable): Condición estilo expected_conditions
+            max_timeout (float): Tiempo máximo absoluto
+            min_timeout (float): Timeout mínimo aunque el historial sea más rápido
+        Returns:
+            El valor retornado por la condición
+        """
+        timeout = self.stats.timeout_for(step, min_timeout, max_timeout)
+        started = time.monotonic()
+        try:
+            with tracing.span('wait', step=step, timeout=round(timeout, 1)):
+                result = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(condition)
+        except TimeoutException:
+            logging.warning(f"Timeout esperando '{step}' después de {timeout:.1f}s")
+            # El timeout solo acota la duración real; registrarlo como muestra haría que el
+            # percentil siguiera por debajo de lo que el paso necesita ahora
+            self.stats.reset(step)
+            raise
+        elapsed = time.monotonic() - started
+        self.stats.record(step, elapsed)
+        logging.debug(f"Paso '{step}' listo en {elapsed:.2f}s (timeout {timeout:.1f}s)")
+        return result
+
+def page_ready(driver):
+    """La página terminó de cargar (document.readyState == 'complete')"""
+    return driver.execute_script("return document.readyState") == 'complete'
+
+class network_idle:
+    """
+    La página está cargada y no terminó ningún recurso nuevo durante `idle_seconds`,
+    según la Resource Timing API del navegador.
+    """
+
+    def __init__(self, idle_seconds=0.5):
+        self.idle_seconds = idle_seconds
+
+    def __call__(self, driver):
+        state = driver.execute_script(
+            "const entries = performance.getEntriesByType('resource');"
+            "const last = entries.reduce((m, e) => Math.max(m, e.responseEnd), 0);"
+            "return [document.readyState, performance.now() - last];")
+        return state[0] == 'complete' and state[1] >= self.idle_seconds * 1000
@@ -0,0 +1,317 @@
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import urlparse, parse_qs
+import os
+import re
+import threading
+import time
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from driver_pool import DriverPool, _PooledDriver
+from shopify_automation import ShopifyAutomation
+from benchmarks.synthetic_data import window_export_csv
+
+DEFAULT_LATENCIES = {
+    'page_load': 0.3,
+    'click': 0.1,
+    'login': 0.5,
+    'report_load': 0.8,
+    'download': 0.5,
+    'upload': 0.5
+}
+
+# Selectores usados por ShopifyAutomation y SharePointUploader y el elemento lógico de
+# la página falsa al que corresponden
+SELECTORS = {
+    (By.ID, 'account_email'): 'shopify_email',
+    (By.ID, 'account_password'): 'shopify_password',
+    (By.XPATH, "//button[@type='submit']"): 'shopify_submit',
+    (By.CSS_SELECTOR, '.Polaris-Navigation, .Polaris-TopBar'): 'shopify_nav',
+    (By.XPATH, ShopifyAutomation.MORE_ACTIONS_XPATH): 'more_actions',
+    (By.XPATH, "//button[contains(., 'Export')]"): 'export_button',
+    (By.XPATH, "//input[@type='radio' and @value='csv']"): 'csv_radio',
+    (By.ID, 'i0116'): 'ms_email',
+    (By.ID, 'i0118'): 'ms_password',
+    (By.ID, 'idSIButton9'): 'ms_next',
+    (By.CLASS_NAME, 'lightbox-cover'): 'ms_lightbox',
+    (By.XPATH, "//span[contains(text(), 'Cargar') or contains(text(), 'Upload')]"): 'sp_upload',
+    (By.XPATH, "//span[contains(text(), 'Archivos') or contains(text(), 'Files')]"): 'sp_files',
+    (By.XPATH, "//input[@type='file']"): 'sp_file_input',
+    (By.XPATH, "//*[@role='progressbar']"): 'sp_progress'
+}
+
+UPLOADED_TEXT = re.compile(r"^//\*\[contains\(text\(\), '(.+)'\)\]$")
+
+class FakeElement:
+    def __init__(self, tab, name, generation):
+        self.tab = tab
+        self.name = name
+        self.generation = generation
+
+    def _check(self):
+        if self.generation != self.tab.generation:
+            raise StaleElementReferenceException(f"{self.name} ya no está en la página")
+
+    def is_displayed(self):
+        self._check()
+        return True
+
+    def is_enabled(self):
+        self._check()
+        return True
+
+    def is_selected(self):
+        self._check()
+        return self.tab.state.get(f"{self.name}_selected", False)
+
+    def clear(self):
+        self._check()
+
+    def click(self):
+        self._check()
+        self.tab.click(self.name)
+
+    def send_keys(self, value):
+        self._check()
+        self.tab.send_keys(self.name, value)
+
+class FakeTab:
+    """Página de una pestaña: qué elementos hay y desde cuándo están disponibles"""
+
+    def __init__(self, driver, url='about:blank'):
+        self.driver = driver
+        self.generation = 0
+        self.elements = {}
+        self.state = {}
+        self.last_activity = time.monotonic()
+        self.get(url)
+
+    def _show(self, *names, delay=0.0):
+        ready_at = time.monotonic() + delay
+        for name in names:
+            self.elements[name] = ready_at
+
+    def _hide(self, *names):
+        for name in names:
+            self.elements.pop(name, None)
+
+    def _navigate(self, url):
+        self.url = url
+        self.generation += 1
+        self.elements = {}
+        self.state = {}
+        self.last_activity = time.monotonic() + self.driver.latency('page_load')
+
+    def get(self, url):
+        self._navigate(url)
+        host = urlparse(url).netloc
+        if 'accounts.shopify.com' in host:
+            self._show('shopify_email', 'shopify_submit', delay=self.driver.latency('page_load'))
+        elif 'login.microsoftonline.com' in host:
+            self._show('ms_email', 'ms_next', delay=self.driver.latency('page_load'))
+        elif 'ql' in parse_qs(urlparse(url).query):
+            self.last_activity += self.driver.latency('report_load')
+            self._show('more_actions', delay=self.driver.latency('page_load') + self.driver.latency('report_load'))
+        elif url != 'about:blank':
+            self._show('sp_upload', 'shopify_nav', delay=self.driver.latency('page_load'))
+
+    def find(self, by, value):
+        name = SELECTORS.get((by, value))
+        if name is None:
+            match = UPLOADED_TEXT.match(value) if by == By.XPATH else None
+            if match and match.group(1) in self.state.get('uploaded', ()):
+                name = f"text:{match.group(1)}"
+                self.elements.setdefault(name, 0)
+        if name is None or self.elements.get(name, float('inf')) > time.monotonic():
+            raise NoSuchElementException(f"{by}={value}")
+        return FakeElement(self, name, self.generation)
+
+    def click(self, name):
+        delay = self.driver.latency('click')
+        self.last_activity = time.monotonic() + delay
+        if name == 'shopify_submit':
+            if 'password' not in self.state:
+                self.state['password'] = True
+                self._show('shopify_password', delay=delay)
+            else:
+                self._navigate('https://admin.shopify.com/store/benchmark')
+                self._show('shopify_nav', delay=self.driver.latency('login'))
+        elif name == 'more_actions':
+            self._show('export_button', delay=delay)
+        elif name == 'export_button':
+            if not self.state.get('dialog_open'):
+                self.state['dialog_open'] = True
+                self._show('csv_radio', delay=delay)
+            else:
+                self.state['dialog_open'] = False
+                self._hide('csv_radio')
+                self.driver.start_download(self.url)
+        elif name == 'csv_radio':
+            self.state['csv_radio_selected'] = True
+        elif name == 'ms_next':
+            step = self.state.get('ms_step', 0) + 1
+            self.state['ms_step'] = step
+            self.generation += 1
+            if step == 1:
+                self._show('ms_password', 'ms_next', delay=delay)
+            elif step == 2:
+                self._show('ms_next', delay=self.driver.latency('login'))
+            else:
+                self._hide('ms_next')
+        elif name == 'sp_upload':
+            self._show('sp_files', delay=delay)
+        elif name == 'sp_files':
+            self._show('sp_file_input', delay=delay)
+
+    def send_keys(self, name, value):
+        if name == 'sp_file_input':
+            upload = self.driver.latency('upload')
+            self.last_activity = time.monotonic() + upload
+            self._show('sp_progress')
+            threading.Timer(upload, self._finish_upload, args=(os.path.basename(value),)).start()
+            self.driver.uploaded.append(value)
+
+    def _finish_upload(self, file_name):
+        self._hide('sp_progress')
+        self.state.setdefault('uploaded', set()).add(file_name)
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        if handle not in self.driver.tabs:
+            raise NoSuchElementException(f"No existe la pestaña {handle}")
+        self.driver.current_window_handle = handle
+
+class FakeWebDriver:
+    """
+    WebDriver falso que reproduce los flujos de elementos usados por ShopifyAutomation
+    (login, reporte, menú de exportación, descarga) y SharePointUploader (login de
+    Microsoft, carga de archivos) con latencias configurables, sin navegador ni red.
+
+    Las exportaciones escriben un CSV sintético con las ventas de la ventana SINCE/UNTIL
+    de la consulta en la carpeta de descargas configurada por el pool.
+    """
+
+    CONTEXT_CHROME = 'chrome'
+    CONTEXT_CONTENT = 'content'
+
+    def __init__(self, latencies=None, export_rows=200):
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.export_rows = export_rows
+        self.download_dir = None
+        self.downloads = []
+        self.uploaded = []
+        self.cookies = []
+        self.tabs = {}
+        self.tab_counter = 0
+        self.current_window_handle = self._open_tab()
+        self.switch_to = _SwitchTo(self)
+
+    def latency(self, name):
+        return self.latencies.get(name, 0.0)
+
+    def _open_tab(self, url='about:blank'):
+        self.tab_counter += 1
+        handle = f"tab-{self.tab_counter}"
+        self.tabs[handle] = FakeTab(self, url)
+        return handle
+
+    @property
+    def tab(self):
+        return self.tabs[self.current_window_handle]
+
+    @property
+    def window_handles(self):
+        return list(self.tabs)
+
+    @property
+    def current_url(self):
+        return self.tab.url
+
+    def get(self, url):
+        self.tab.get(url)
+
+    def find_element(self, by=By.ID, value=None):
+        return self.tab.find(by, value)
+
+    def find_elements(self, by=By.ID, value=None):
+        try:
+            return [self.find_element(by, value)]
+        except NoSuchElementException:
+            return []
+
+    def execute_script(self, script, *args):
+        if script == "return 1":
+            return 1
+        if script == "return document.readyState":
+            return 'complete' if time.monotonic() >= self.tab.last_activity else 'interactive'
+        if "performance.getEntriesByType('resource')" in script:
+            idle_ms = (time.monotonic() - self.tab.last_activity) * 1000
+            return ['complete' if idle_ms >= 0 else 'interactive', max(idle_ms, 0)]
+        if "window.open" in script:
+            self.tab.last_activity = time.monotonic()
+            self._open_tab(args[0])
+            return None
+        if "Services.prefs" in script:
+            self.download_dir = args[0]
+            return None
+        if "arguments[0].click()" in script:
+            args[0].click()
+        return None
+
+    @contextmanager
+    def context(self, context):
+        yield
+
+    def start_download(self, url):
+        """Escribe el CSV de la ventana de la consulta como lo haría Firefox (.part y luego el archivo)"""
+        query = parse_qs(urlparse(url).query)['ql'][0]
+        since = date.fromisoformat(re.search(r"SINCE (\S+)", query).group(1))
+        until = date.fromisoformat(re.search(r"UNTIL (\S+)", query).group(1))
+        folder = self.download_dir or os.getcwd()
+        path = os.path.join(folder, f"sales_{since.isoformat()}_{until.isoformat()}.csv")
+
+        def write():
+            window_export_csv(path + '.part', since, until, self.export_rows)
+            os.replace(path + '.part', path)
+            self.downloads.append(path)
+
+        threading.Timer(self.latency('download'), write).start()
+
+    def save_screenshot(self, file_name):
+        return True
+
+    def get_screenshot_as_png(self):
+        return b''
+
+    @property
+    def page_source(self):
+        return "<html></html>"
+
+    def get_cookies(self):
+        return list(self.cookies) or [{'name': 'benchmark', 'value': '1', 'domain': 'localhost', 'path': '/'}]
+
+    def add_cookie(self, cookie):
+        self.cookies.append(cookie)
+
+    def delete_all_cookies(self):
+        self.cookies = []
+
+    def close(self):
+        del self.tabs[self.current_window_handle]
+
+    def quit(self):
+        self.tabs = {}
+
+class FakeDriverPool(DriverPool):
+    """DriverPool real cuyos navegadores son FakeWebDriver"""
+
+    def __init__(self, latencies=None, export_rows=200, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = latencies
+        self.export_rows = export_rows
+
+    def _create(self):
+        return _PooledDriver(FakeWebDriver(self.latencies, self.export_rows))
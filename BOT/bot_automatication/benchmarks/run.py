@@ -0,0 +1,216 @@
+"""
+Benchmarks offline del pipeline: filtrado de CSV, exportación de Shopify y subida a
+SharePoint con un WebDriver falso. Cada caso corre en un proceso aparte para medir su
+memoria máxima (RSS) y se compara con la línea base guardada.
+
+Uso (desde bot_automatication):
+    python -m benchmarks.run                        # casos por defecto
+    python -m benchmarks.run --sizes 10k,1m,10m     # tamaños de CSV
+    python -m benchmarks.run --save-baseline        # guarda los resultados como base
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from config import BENCHMARK_SETTINGS, STORE_CONFIGS, EXPORT_SETTINGS
+from benchmarks.synthetic_data import generate_sales_csv, parse_row_count
+from benchmarks.fake_webdriver import DEFAULT_LATENCIES, FakeDriverPool
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+
+def _scaled_latencies(scale):
+    return {name: value * scale for name, value in DEFAULT_LATENCIES.items()}
+
+def _benchmark_env():
+    env = dict(os.environ)
+    env.update({
+        'SHOPIFY_EMAIL': 'benchmark@example.com',
+        'SHOPIFY_PASSWORD': 'benchmark',
+        'PYTHONPATH': os.pathsep.join(filter(None, [str(BOT_DIR), env.get('PYTHONPATH')]))
+    })
+    return env
+
+def bench_process_csv(workdir, params):
+    """Filtra filas en 0 de un CSV sintético con process_csv_file"""
+    from main import process_csv_file
+    source = Path(params['data_file'])
+    csv_file = Path(workdir) / 'sales.csv'
+    shutil.copyfile(source, csv_file)
+    started = time.perf_counter()
+    if not process_csv_file(csv_file):
+        raise RuntimeError("process_csv_file falló")
+    return {'wall_seconds': time.perf_counter() - started, 'items': params['rows'], 'unit': 'rows'}
+
+def bench_shopify_export(workdir, params):
+    """Login, exportación por ventanas y combinación de una tienda con el WebDriver falso"""
+    from shopify_automation import ShopifyAutomation
+    from query_sharding import count_csv_rows
+    from stores import get_store_csv_path
+    store_type = next(iter(STORE_CONFIGS))
+    STORE_CONFIGS[store_type].update(backend='browser', base_url='')
+    EXPORT_SETTINGS['start_date'] = (date.today() - timedelta(days=30 * params['months'])).isoformat()
+    pool = FakeDriverPool(_scaled_latencies(params['latency_scale']), export_rows=params['export_rows'])
+    try:
+        automation = ShopifyAutomation(store_type, incremental=False, pool=pool)
+        started = time.perf_counter()
+        if not automation.run():
+            raise RuntimeError("La exportación falló")
+        wall = time.perf_counter() - started
+    finally:
+        pool.close()
+    output = get_store_csv_path(store_type)
+    return {'wall_seconds': wall, 'items': count_csv_rows(output), 'unit': 'rows'}
+
+def bench_sharepoint_upload(workdir, params):
+    """Login de Microsoft y subida por la interfaz web de los CSV de todas las tiendas"""
+    from sharepoint_uploader import SharePointConfig, SharePointUploader
+    from stores import get_store_csv_path
+    files = []
+    for index, store_type in enumerate(STORE_CONFIGS):
+        files.append(Path(generate_sales_csv(str(get_store_csv_path(store_type)), params['upload_rows'], seed=index)))
+    # Puerto cerrado: la verificación HTTP de la sesión falla al instante, sin red
+    site = "http://127.0.0.1:9/sites/benchmark"
+    config = SharePointConfig(
+        email='benchmark@example.com', password='benchmark', base_url=site,
+        folder_urls={store_type: f"{site}/Shared%20Documents/{store_type}" for store_type in STORE_CONFIGS},
+        upload_backend='selenium')
+    pool = FakeDriverPool(_scaled_latencies(params['latency_scale']))
+    try:
+        uploader = SharePointUploader(config, pool=pool)
+        started = time.perf_counter()
+        failed = uploader.upload_files(force=True, files=files)
+        wall = time.perf_counter() - started
+    finally:
+        pool.close()
+    if failed:
+        raise RuntimeError(f"Fallaron subidas: {failed}")
+    return {'wall_seconds': wall, 'items': sum(f.stat().st_size for f in files), 'unit': 'bytes'}
+
+BENCHMARKS = {
+    'process_csv': bench_process_csv,
+    'shopify_export': bench_shopify_export,
+    'sharepoint_upload': bench_sharepoint_upload
+}
+
+def run_child(name, params):
+    """Ejecuta un caso en el proceso actual e imprime sus métricas como JSON"""
+    logging.basicConfig(level=logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    os.chdir(workdir)
+    try:
+        metrics = BENCHMARKS[name](workdir, params)
+    finally:
+        os.chdir(BOT_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    # ru_maxrss está en KB en Linux
+    metrics['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    metrics['throughput'] = metrics['items'] / metrics['wall_seconds'] if metrics['wall_seconds'] else None
+    print(json.dumps(metrics))
+
+def run_case(name, params):
+    """Ejecuta un caso en un proceso nuevo para aislar su memoria máxima"""
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run', '--child', name, '--params', json.dumps(params)],
+        cwd=BOT_DIR, env=_benchmark_env(), capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"El benchmark {name} falló:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def build_cases(args):
+    """Casos a ejecutar como (id, benchmark, parámetros)"""
+    cases = []
+    selected = args.only.split(',') if args.only else list(BENCHMARKS)
+    if 'process_csv' in selected:
+        data_dir = Path(BENCHMARK_SETTINGS['data_dir'])
+        for size in args.sizes.split(','):
+            rows = parse_row_count(size)
+            data_file = data_dir / f"sales_{size}.csv"
+            if not data_file.exists():
+                logging.info(f"Generando CSV sintético de {rows} filas en {data_file}")
+                generate_sales_csv(str(data_file), rows)
+            cases.append((f"process_csv[{size}]", 'process_csv', {'data_file': str(data_file.absolute()), 'rows': rows}))
+    if 'shopify_export' in selected:
+        cases.append((f"shopify_export[{args.months}m]", 'shopify_export', {
+            'months': args.months, 'export_rows': args.export_rows, 'latency_scale': args.latency_scale}))
+    if 'sharepoint_upload' in selected:
+        cases.append(("sharepoint_upload", 'sharepoint_upload', {
+            'upload_rows': args.upload_rows, 'latency_scale': args.latency_scale}))
+    return cases
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def find_regressions(results, baseline, tolerance):
+    """Métricas que empeoraron más que la tolerancia respecto a la línea base"""
+    regressions = []
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric in ('wall_seconds', 'peak_rss_mb'):
+            if base.get(metric) and metrics[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{case}: {metric} {metrics[metric]:.2f} vs base {base[metric]:.2f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline del bot de Shopify/SharePoint")
+    parser.add_argument('--only', help="Benchmarks a ejecutar separados por coma: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--sizes', default='10k', help="Filas de los CSV sintéticos, p. ej. 10k,1m,10m")
+    parser.add_argument('--months', type=int, default=3, help="Meses exportados en shopify_export")
+    parser.add_argument('--export-rows', type=int, default=200, help="Filas por ventana descargada")
+    parser.add_argument('--upload-rows', type=int, default=10000, help="Filas de cada CSV subido")
+    parser.add_argument('--latency-scale', type=float, default=1.0, help="Multiplica las latencias del WebDriver falso")
+    parser.add_argument('--baseline', default=BENCHMARK_SETTINGS['baseline_file'])
+    parser.add_argument('--tolerance', type=float, default=BENCHMARK_SETTINGS['tolerance'])
+    parser.add_argument('--save-baseline', action='store_true', help="Guarda los resultados como nueva línea base")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--params', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, json.loads(args.params))
+        return 0
+    # Una ventana diaria que llega al LIMIT se rechaza como truncada (TruncatedExportError)
+    if args.export_rows >= EXPORT_SETTINGS['query_limit']:
+        parser.error(f"--export-rows debe ser menor que el LIMIT de la consulta ({EXPORT_SETTINGS['query_limit']})")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    results = {}
+    for case, name, params in build_cases(args):
+        logging.info(f"Ejecutando {case}")
+        results[case] = run_case(name, params)
+
+    baseline = load_baseline(args.baseline)
+    print(f"{'caso':<28}{'tiempo (s)':>12}{'throughput':>18}{'RSS máx (MB)':>15}{'vs base':>10}")
+    for case, metrics in results.items():
+        base = baseline.get(case, {}).get('wall_seconds')
+        change = f"{(metrics['wall_seconds'] / base - 1) * 100:+.0f}%" if base else '-'
+        throughput = f"{metrics['throughput']:,.0f} {metrics['unit']}/s"
+        print(f"{case:<28}{metrics['wall_seconds']:>12.2f}{throughput:>18}{metrics['peak_rss_mb']:>15.1f}{change:>10}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        logging.info(f"Línea base guardada en {args.baseline}")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        logging.error(f"Regresión: {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+from config import SALES_COLUMNS
+
+PRODUCT_TYPES = np.array(['Camisa', 'Pantalón', 'Vestido', 'Zapatos', 'Accesorios', 'Chaqueta'])
+PAYMENT_STATUSES = np.array(['paid', 'partially_refunded', 'refunded', 'pending'])
+LINE_TYPES = np.array(['product', 'shipping', 'gift_card'])
+
+def parse_row_count(value):
+    """Convierte '10k', '1m' o '10M' en número de filas"""
+    value = str(value).strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def synthetic_sales_chunk(rng, start_row, rows, since, days, zero_ratio):
+    """Bloque de filas con la forma del reporte de Shopify"""
+    index = np.arange(start_row, start_row + rows)
+    day_offsets = np.sort(rng.integers(0, days, rows))
+    order_days = (np.datetime64(since) + day_offsets.astype('timedelta64[D]')).astype(str)
+    customers = rng.integers(1, 50_000, rows)
+    sku_ids = rng.integers(1, 5_000, rows)
+    quantity = rng.integers(1, 6, rows).astype('float64')
+    price = np.round(rng.uniform(20_000, 400_000, rows), -2)
+    gross = quantity * price
+    discounts = -np.round(gross * rng.choice([0, 0, 0.1, 0.2], rows), 2)
+    net = gross + discounts
+    zero = rng.random(rows) < zero_ratio
+    for values in (quantity, gross, discounts, net):
+        values[zero] = 0
+
+    return pd.DataFrame({
+        'Order name': np.char.add('#', (index // 3 + 1000).astype(str)),
+        'Day': order_days,
+        'Order payment status': rng.choice(PAYMENT_STATUSES, rows),
+        'Customer ID': customers,
+        # Títulos con comas y comillas para ejercitar el parser CSV
+        'Product title': np.char.add('Producto "Línea", talla ', (sku_ids % 7).astype(str)),
+        'Product variant SKU': np.char.add('SKU-', sku_ids.astype(str)),
+        'Product variant price': price,
+        'Product type': rng.choice(PRODUCT_TYPES, rows),
+        'Line type': rng.choice(LINE_TYPES, rows, p=[0.9, 0.08, 0.02]),
+        'Order or return': np.where(rng.random(rows) < 0.03, 'return', 'order'),
+        'Is canceled order': rng.random(rows) < 0.02,
+        'Customer name': np.char.add('Cliente ', customers.astype(str)),
+        'Customer email': np.char.add(customers.astype(str), '@example.com'),
+        'Customer first order date': str(since),
+        'Customer last order date': order_days,
+        'New or returning customer': rng.choice(np.array(['New', 'Returning']), rows),
+        'Customer email subscription status': 'SUBSCRIBED',
+        'Customer SMS subscription status': 'NOT_SUBSCRIBED',
+        'Quantity ordered': quantity,
+        'Gross sales': gross,
+        'Discounts': discounts,
+        'Total sales': net,
+        'Net sales': net
+    }, columns=SALES_COLUMNS)
+
+def generate_sales_csv(path, rows, since=date(2024, 12, 1), days=365, zero_ratio=0.3,
+                       seed=0, chunk_size=200_000):
+    """
+    Escribe un CSV sintético con las columnas exactas del reporte de ventas de Shopify.
+
+    Args:
+        path (str): Archivo de salida
+        rows (int): Filas de datos
+        since (date): Primer día de las ventas
+        days (int): Días cubiertos por las ventas
+        zero_ratio (float): Proporción de filas con todas las columnas numéricas en 0
+        seed (int): Semilla para que los datos sean reproducibles
+    Returns:
+        str: Ruta del archivo generado
+    """
+    rng = np.random.default_rng(seed)
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write(','.join(SALES_COLUMNS) + '\n')
+        for start_row in range(0, rows, chunk_size):
+            chunk = synthetic_sales_chunk(rng, start_row, min(chunk_size, rows - start_row),
+                                          since, days, zero_ratio)
+            chunk.to_csv(f, header=False, index=False)
+    return path
+
+def sales_days(since, until):
+    """Días del rango [since, until] para generar exportaciones de una ventana"""
+    return (until - since).days + 1 if until >= since else 1
+
+def window_export_csv(path, since, until, rows, seed=0):
+    """CSV sintético con ventas solo dentro de la ventana [since, until]"""
+    return generate_sales_csv(path, rows, since=since, days=sales_days(since, until), zero_ratio=0.3,
+                              seed=seed + since.toordinal())
+
+if __name__ == "__main__":
+    import sys
+    generate_sales_csv(sys.argv[1], parse_row_count(sys.argv[2] if len(sys.argv) > 2 else '10k'))
@@ -0,0 +1,195 @@
+"""
+Logging del bot: los módulos llaman a logging.info/error como siempre, pero el registro
+solo se encola en el hilo que lo emite; un QueueListener lo formatea y lo escribe en un
+archivo rotado y en la consola.
+
+Los artefactos de falla (captura de pantalla y HTML) se toman del driver en el momento del
+error y se escriben en segundo plano en una carpeta por ejecución, con un límite de
+artefactos por ejecución y de ejecuciones guardadas.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from pathlib import Path
+import atexit
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+from config import LOGGING_SETTINGS, ARTIFACT_SETTINGS
+import tracing
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler que descarta registros si la cola está llena en lugar de bloquear"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
+
+def _build_file_handler(settings):
+    log_file = os.getenv('BOT_LOG_FILE') or settings['log_file']
+    Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+    if settings['rotation'] == 'time':
+        return TimedRotatingFileHandler(log_file, when=settings['when'], backupCount=settings['backup_count'],
+                                        encoding='utf-8', delay=True)
+    return RotatingFileHandler(log_file, maxBytes=settings['max_bytes'], backupCount=settings['backup_count'],
+                               encoding='utf-8', delay=True)
+
+def setup_logging(settings=None):
+    """
+    Configura el logging del proceso una sola vez; las llamadas siguientes no hacen nada.
+
+    Args:
+        settings (dict): Configuración, por defecto LOGGING_SETTINGS
+    """
+    global _listener, _queue_handler
+    settings = settings or LOGGING_SETTINGS
+    with _setup_lock:
+        if _listener is not None:
+            return
+        formatter = logging.Formatter(settings['format'])
+        handlers = [_build_file_handler(settings), logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        _queue_handler = _DroppingQueueHandler(queue.Queue(settings['queue_size']))
+        root = logging.getLogger()
+        root.setLevel(os.getenv('BOT_LOG_LEVEL') or settings['level'])
+        root.addHandler(_queue_handler)
+        _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Escribe los registros pendientes y detiene el hilo de logging"""
+    global _listener, _queue_handler
+    with _setup_lock:
+        listener, handler = _listener, _queue_handler
+        _listener = _queue_handler = None
+    if listener is None:
+        return
+    if _artifacts is not None:
+        _artifacts.flush()
+    logging.getLogger().removeHandler(handler)
+    listener.stop()
+    for target in listener.handlers:
+        target.close()
+    if handler.dropped:
+        logging.warning(f"Se descartaron {handler.dropped} registros de log por cola llena")
+
+class FailureArtifacts:
+    """
+    Guarda capturas y HTML de fallas en `<artifacts_dir>/<run_id>/`. Solo se conservan las
+    últimas `max_runs` ejecuciones y hasta `max_per_run` artefactos por ejecución, para que
+    los reintentos de un proceso largo no llenen el disco.
+    """
+
+    def __init__(self, artifacts_dir=None, max_runs=None, max_per_run=None, save_html=None):
+        self.artifacts_dir = Path(artifacts_dir or ARTIFACT_SETTINGS['artifacts_dir'])
+        self.max_runs = max_runs or ARTIFACT_SETTINGS['max_runs']
+        self.max_per_run = max_per_run or ARTIFACT_SETTINGS['max_per_run']
+        self.save_html = ARTIFACT_SETTINGS['save_html'] if save_html is None else save_html
+        self.process_run_id = datetime.now().strftime('%Y%m%d_%H%M%S') + f"_{os.getpid()}"
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifacts')
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.pending = []
+
+    def _run_id(self):
+        root = tracing.get_tracer().root
+        run_id = root.attrs.get('run_id') if root is not None else None
+        return str(run_id or self.process_run_id)
+
+    def _reserve(self, run_id):
+        """Número del siguiente artefacto de la ejecución, o None si ya llegó al límite"""
+        with self.lock:
+            count = self.counts.get(run_id, 0)
+            if count >= self.max_per_run:
+                return None
+            self.counts[run_id] = count + 1
+            return count + 1
+
+    def _prune(self, keep):
+        runs = sorted((path for path in self.artifacts_dir.iterdir() if path.is_dir()),
+                      key=lambda path: path.stat().st_mtime, reverse=True)
+        for old_run in [path for path in runs if path.name != keep][self.max_runs - 1:]:
+            shutil.rmtree(old_run, ignore_errors=True)
+
+    def _write(self, run_id, base_name, screenshot, html):
+        run_dir = self.artifacts_dir / run_id
+        is_new = not run_dir.exists()
+        run_dir.mkdir(parents=True, exist_ok=True)
+        if is_new:
+            self._prune(keep=run_id)
+        if screenshot:
+            (run_dir / f"{base_name}.png").write_bytes(screenshot)
+        if html:
+            (run_dir / f"{base_name}.html").write_text(html, encoding='utf-8')
+        logging.info(f"Artefactos de falla guardados en {run_dir / base_name}.*")
+
+    def capture(self, driver, name):
+        """
+        Toma la captura y el HTML del driver y los guarda en segundo plano.
+
+        Args:
+            driver: WebDriver en el estado de la falla
+            name (str): Descripción corta de la falla, se usa en el nombre del archivo
+
+        Returns:
+            Future de la escritura, o None si no se guardó nada
+        """
+        run_id = self._run_id()
+        number = self._reserve(run_id)
+        if number is None:
+            logging.debug(f"Límite de artefactos de la ejecución {run_id} alcanzado, se omite '{name}'")
+            return None
+        try:
+            screenshot = driver.get_screenshot_as_png()
+            html = driver.page_source if self.save_html else None
+        except Exception as e:
+            logging.warning(f"No se pudo capturar el estado del navegador para '{name}': {e}")
+            return None
+
+        safe_name = re.sub(r'[^\w.-]+', '_', name).strip('_')
+        base_name = f"{number:03d}_{safe_name}_{datetime.now().strftime('%H%M%S')}"
+        future = self.executor.submit(self._write, run_id, base_name, screenshot, html)
+        with self.lock:
+            self.pending = [pending for pending in self.pending if not pending.done()] + [future]
+        return future
+
+    def flush(self, timeout=30):
+        """Espera a que terminen las escrituras pendientes"""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for future in pending:
+            try:
+                future.result(timeout=timeout)
+            except Exception as e:
+                logging.warning(f"No se pudo guardar un artefacto de falla: {e}")
+
+_artifacts = None
+_artifacts_lock = threading.Lock()
+
+def get_artifacts():
+    """Colector de artefactos común del proceso"""
+    global _artifacts
+    with _artifacts_lock:
+        if _artifacts is None:
+            _artifacts = FailureArtifacts()
+        return _artifacts
+
+def capture_failure(driver, name):
+    """Guarda la captura y el HTML del driver en la carpeta de la ejecución actual"""
+    return get_artifacts().capture(driver, name)
@@ -0,0 +1,163 @@
+"""
+Línea de comandos del bot. Cada subcomando ejecuta una sola etapa del pipeline y solo
+valida las variables de entorno que esa etapa usa; las dependencias pesadas (selenium,
+pandas, pyarrow) se importan dentro del subcomando que las necesita.
+
+Uso (desde bot_automatication):
+    python cli.py export [--store pos ...]            # solo exportar de Shopify
+    python cli.py filter [--store pos ...] [--force]  # validar y filtrar el CSV y actualizar resúmenes
+    python cli.py upload [--store pos ...] [--force]  # solo subir a SharePoint
+    python cli.py run [--force]                       # pipeline completo
+    python cli.py profile [--url URL ...] [-n 3]      # medir páginas con y sin perfil liviano
+"""
+import argparse
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+from config import STORE_CONFIGS, ROLLUP_SETTINGS, VALIDATION_SETTINGS
+from stores import (get_store_types, get_store_csv_path, get_rollup_paths, get_sharepoint_folder_url, get_open_year,
+                    get_year_window, has_closed_days)
+from main import setup_base_logging, validate_environment_vars
+
+def cmd_export(args):
+    """Exporta el CSV de Shopify de las tiendas indicadas"""
+    validate_environment_vars(args.store, stages=['export'])
+    from main import export_store
+    from store_scheduler import run_store_tasks
+    from driver_pool import shutdown_shared_pool
+
+    try:
+        result = run_store_tasks(lambda store_type, deadline: export_store(store_type), args.store)
+    finally:
+        shutdown_shared_pool()
+    for store_type in result.failed:
+        logging.error(f"Falló la exportación de {store_type}: {result.errors.get(store_type, 'sin detalle')}")
+    return 0 if result.all_succeeded else 1
+
+def cmd_filter(args):
+    """Valida y filtra las filas en 0 del CSV de cada tienda y actualiza sus resúmenes"""
+    from main import prepare_csv_file
+    import rollups
+
+    failed = []
+    for store_type in args.store or get_store_types():
+        csv_file = get_store_csv_path(store_type)
+        if not csv_file.exists():
+            logging.error(f"No se encontró el archivo: {csv_file}")
+            failed.append(store_type)
+            continue
+        if VALIDATION_SETTINGS['enabled']:
+            from validation import validate_csv_file
+
+            require_rows = has_closed_days(*get_year_window(get_open_year()))
+            if not validate_csv_file(csv_file, args.force, require_rows).ok:
+                failed.append(store_type)
+                continue
+        if not prepare_csv_file(csv_file, args.force):
+            failed.append(store_type)
+            continue
+        if ROLLUP_SETTINGS['enabled']:
+            try:
+                rollups.update_rollups(csv_file, STORE_CONFIGS[store_type]['folder_name'])
+            except Exception as e:
+                logging.error(f"Falló la actualización de resúmenes de {store_type}: {str(e)}")
+                failed.append(store_type)
+    return 1 if failed else 0
+
+def cmd_upload(args):
+    """Sube a SharePoint el CSV y los resúmenes de cada tienda"""
+    validate_environment_vars(args.store, stages=['upload'])
+    from main import build_sharepoint_uploader
+
+    files = []
+    for store_type in args.store or get_store_types():
+        csv_file = get_store_csv_path(store_type)
+        files.append(csv_file)
+        if ROLLUP_SETTINGS['enabled']:
+            files += list(get_rollup_paths(csv_file).values())
+    uploader = build_sharepoint_uploader()
+    try:
+        failed = uploader.upload_files(force=args.force, files=[f for f in files if f.exists()])
+    finally:
+        uploader.close()
+    for file_path in failed:
+        logging.error(f"Falló la subida de {file_path}")
+    return 1 if failed else 0
+
+def cmd_run(args):
+    """Pipeline completo con reanudación"""
+    from main import run_automation
+
+    try:
+        run_automation(force=args.force)
+    except Exception:
+        return 1
+    return 0
+
+def cmd_profile(args):
+    """Mide tiempo de carga y bytes de las páginas del bot con y sin el perfil liviano"""
+    from profile_metrics import ProfilePage, compare_profiles, format_report
+
+    if args.url:
+        pages = [ProfilePage(url, url) for url in args.url]
+    else:
+        from shopify_automation import ShopifyAutomation
+        pages = []
+        for store_type in args.store or get_store_types():
+            if STORE_CONFIGS[store_type]['base_url']:
+                automation = ShopifyAutomation(store_type, incremental=False)
+                pages.append(ProfilePage(f"shopify:{store_type}",
+                                         automation.get_shopify_url(visualize=True),
+                                         session_key=f"shopify:{os.getenv('SHOPIFY_EMAIL')}",
+                                         lean_url=automation.get_shopify_url(visualize=False)))
+            folder_url = get_sharepoint_folder_url(store_type)
+            if folder_url:
+                pages.append(ProfilePage(f"sharepoint:{store_type}", folder_url,
+                                         session_key=f"sharepoint:{os.getenv('SHAREPOINT_EMAIL')}"))
+    if not pages:
+        raise ValueError("No hay páginas que medir: configure base_url/SharePoint o use --url")
+
+    report = compare_profiles(pages, repeats=args.repeats)
+    print(format_report(report))
+    return 0
+
+COMMANDS = {
+    'export': cmd_export,
+    'filter': cmd_filter,
+    'upload': cmd_upload,
+    'run': cmd_run,
+    'profile': cmd_profile
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bot de exportación de Shopify y subida a SharePoint")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, handler in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=handler.__doc__)
+        if name != 'run':
+            subparser.add_argument('--store', action='append', choices=list(STORE_CONFIGS),
+                                   help="Tienda a procesar, se puede repetir (por defecto todas)")
+        if name == 'profile':
+            subparser.add_argument('--url', action='append',
+                                   help="Página a medir en lugar de las de las tiendas, se puede repetir")
+            subparser.add_argument('-n', '--repeats', type=int, default=3,
+                                   help="Cargas por página y perfil (se reporta la mediana)")
+        elif name != 'export':
+            subparser.add_argument('--force', action='store_true',
+                                   default=os.getenv('BOT_FORCE') == '1',
+                                   help="Procesar y subir aunque los archivos no hayan cambiado")
+    return parser
+
+def main(argv=None):
+    load_dotenv()
+    args = build_parser().parse_args(argv)
+    setup_base_logging()
+    try:
+        return COMMANDS[args.command](args)
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
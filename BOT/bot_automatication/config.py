@@ -2,11 +2,241 @@ STORE_CONFIGS = {
     'pos': {
         'base_url': "",
         'folder_name': "Monteria",
-        'output_file': "2025.csv"
+        # {year} es el año abierto; los años cerrados se congelan en el archivo histórico
+        'output_file': "{year}.csv",
+        'backend': "browser",
+        'shop_domain': "",
+        'access_token_env': "SHOPIFY_POS_ACCESS_TOKEN",
+        'sharepoint_url_env': "SHAREPOINT_MONTERIA_URL",
+        'priority': 1,
+        'timeout_minutes': 45
     },
     'outlet': {
         'base_url': "",
         'folder_name': "Mayorca",
-        'output_file': "2025.csv"
+        'output_file': "{year}.csv",
+        'backend': "browser",
+        'shop_domain': "",
+        'access_token_env': "SHOPIFY_OUTLET_ACCESS_TOKEN",
+        'sharepoint_url_env': "SHAREPOINT_MAYORCA_URL",
+        'priority': 2,
+        'timeout_minutes': 45
+    }
+}
+
+EXPORT_SETTINGS = {
+    'start_date': "2024-12-01",
+    'incremental': True,
+    'overlap_days': 3,
+    'query_limit': 1000,
+    'sharding': True,
+    'max_parallel_tabs': 2,
+    'download_timeout': 60,
+    # El gráfico del reporte no se usa para exportar el CSV
+    'visualize': False,
+    'watermark_file': ".bot_state/watermarks.json"
+}
+
+DAY_COLUMN = 'Day'
+
+# Columnas del reporte en el orden en que Shopify exporta la consulta de
+# ShopifyAutomation.build_query: primero las del GROUP BY y luego las del SHOW
+SALES_COLUMNS = [
+    'Order name', 'Day', 'Order payment status', 'Customer ID', 'Product title',
+    'Product variant SKU', 'Product variant price', 'Product type', 'Line type',
+    'Order or return', 'Is canceled order', 'Customer name', 'Customer email',
+    'Customer first order date', 'Customer last order date', 'New or returning customer',
+    'Customer email subscription status', 'Customer SMS subscription status',
+    'Quantity ordered', 'Gross sales', 'Discounts', 'Total sales', 'Net sales'
+]
+NUMERIC_COLUMNS = [
+    'Quantity ordered',
+    'Gross sales',
+    'Discounts',
+    'Total sales',
+    'Net sales'
+]
+
+# Todas las dimensiones del GROUP BY: dos filas del reporte con las mismas dimensiones son
+# la misma fila. Un subconjunto (p. ej. orden, día, SKU) uniría líneas distintas de una
+# orden que difieren en precio, cliente o estado de pago
+DEDUP_KEY_COLUMNS = [column for column in SALES_COLUMNS if column not in NUMERIC_COLUMNS]
+
+CSV_CHUNK_SIZE = 100000
+
+VALIDATION_SETTINGS = {
+    'enabled': True,
+    'state_file': ".bot_state/validation.json",
+    # Carpeta dentro de la carpeta de la tienda y cuántos archivos rechazados se conservan
+    'quarantine_dir': "quarantine",
+    'max_quarantined': 10,
+    'max_invalid_rows': 0,
+    # Caída máxima de filas o totales respecto a la validación anterior
+    'max_drop_ratio': 0.2,
+    'total_columns': ['Quantity ordered', 'Net sales']
+}
+
+PARQUET_SETTINGS = {
+    'enabled': True,
+    'dataset_dir': "parquet"
+}
+
+ARCHIVE_SETTINGS = {
+    'enabled': True,
+    # Carpeta dentro de la carpeta de la tienda, con un subdirectorio year=<año> por año cerrado
+    'archive_dir': "archive",
+    'compression': "zstd",
+    'row_group_size': 20000,
+    'sku_column': 'Product variant SKU'
+}
+
+WAIT_SETTINGS = {
+    'poll_frequency': 0.2,
+    'min_samples': 5,
+    'timeout_factor': 3,
+    'stats_file': ".bot_state/wait_stats.json"
+}
+
+SESSION_SETTINGS = {
+    'sessions_dir': ".bot_state/sessions",
+    'check_timeout': 10,
+    # Una sesión guardada por este proceso hace menos de esto se restaura sin verificarla
+    'fresh_seconds': 300
+}
+
+DRIVER_POOL_SETTINGS = {
+    'headless': True,
+    'max_size': 2,
+    'max_tasks_per_driver': 20
+}
+
+BROWSER_PROFILE_SETTINGS = {
+    # Perfil liviano: sin imágenes, video, fuentes web, telemetría ni servicios de fondo
+    'lean': True,
+    'block_images': True,
+    'block_media': True,
+    'block_fonts': True,
+    # Hosts de telemetría y analítica que se envían a un proxy inexistente (PAC)
+    'blocked_hosts': [
+        "*.google-analytics.com",
+        "*.googletagmanager.com",
+        "*.doubleclick.net",
+        "*.sentry.io",
+        "*.bugsnag.com",
+        "*.nr-data.net",
+        "*.newrelic.com",
+        "*.hotjar.com",
+        "*.segment.io",
+        "*.segment.com",
+        "monorail-edge.shopifysvc.com",
+        "*.events.data.microsoft.com",
+        "browser.pipe.aria.microsoft.com",
+        "*.clarity.ms",
+        "*.telemetry.mozilla.org",
+        "*.services.mozilla.com"
+    ]
+}
+
+LOGGING_SETTINGS = {
+    'log_file': "automation.log",
+    'level': "INFO",
+    'format': '%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+    # 'size' rota al llegar a max_bytes; 'time' rota según `when` (p. ej. a medianoche)
+    'rotation': "size",
+    'max_bytes': 10 * 1024 * 1024,
+    'when': "midnight",
+    'backup_count': 7,
+    # Registros en espera de escribirse; si se llena se descartan en vez de bloquear
+    'queue_size': 10000
+}
+
+ARTIFACT_SETTINGS = {
+    'artifacts_dir': ".bot_state/artifacts",
+    'max_runs': 10,
+    'max_per_run': 30,
+    'save_html': True
+}
+
+SHAREPOINT_HTTP_SETTINGS = {
+    'chunk_size': 10 * 1024 * 1024,
+    'pool_size': 4,
+    'timeout': 60,
+    'state_dir': ".bot_state/uploads"
+}
+
+SHAREPOINT_UPLOAD_SETTINGS = {
+    # Archivos que se suben a la vez; con el navegador cada subida usa un driver del pool
+    'max_concurrent_uploads': 3
+}
+
+MANIFEST_SETTINGS = {
+    'manifest_file': ".bot_state/manifest.json"
+}
+
+SHOPIFY_API_SETTINGS = {
+    'api_version': "2024-10",
+    'pool_size': 4,
+    'timeout': 60
+}
+
+PIPELINE_SETTINGS = {
+    'state_file': ".bot_state/pipeline_state.json",
+    'resume_max_age_hours': 12
+}
+
+DAEMON_SETTINGS = {
+    'interval_minutes': 30,
+    'active_hours': (8, 21),
+    'active_weekdays': (0, 1, 2, 3, 4, 5, 6),
+    'status_host': "127.0.0.1",
+    'status_port': 8765
+}
+
+SCHEDULER_SETTINGS = {
+    'max_workers': 4,
+    'default_priority': 10,
+    # Límite blando: se verifica al empezar cada etapa (export, validate, process, rollup,
+    # upload), no la interrumpe a mitad. Una etapa en curso termina o falla por sus propios
+    # timeouts (descarga, esperas, reintentos), así que una tienda puede pasarse del límite
+    # hasta lo que dure su etapa más larga
+    'default_timeout_minutes': 60
+}
+
+TRACING_SETTINGS = {
+    'report_dir': ".bot_state/reports",
+    'prometheus_file': None
+}
+
+BENCHMARK_SETTINGS = {
+    'baseline_file': "benchmarks/baseline.json",
+    'data_dir': ".bot_state/benchmarks",
+    'tolerance': 0.2
+}
+
+ROLLUP_SETTINGS = {
+    'enabled': True,
+    'state_dir': ".bot_state/rollups",
+    'rollups': {
+        'daily': [],
+        'product_type': ['Product type'],
+        'sku': ['Product variant SKU']
+    }
+}
+
+RETRY_SETTINGS = {
+    'max_attempts': 5,
+    'classes': {
+        'auth': {'max_attempts': 1, 'base_delay': 0, 'max_delay': 0},
+        'circuit_open': {'max_attempts': 1, 'base_delay': 0, 'max_delay': 0},
+        'truncated': {'max_attempts': 1, 'base_delay': 0, 'max_delay': 0},
+        'element_missing': {'max_attempts': 3, 'base_delay': 1, 'max_delay': 8},
+        'timeout': {'max_attempts': 3, 'base_delay': 2, 'max_delay': 30},
+        'download_missing': {'max_attempts': 2, 'base_delay': 5, 'max_delay': 20},
+        'network': {'max_attempts': 4, 'base_delay': 2, 'max_delay': 60},
+        'unknown': {'max_attempts': 2, 'base_delay': 5, 'max_delay': 20}
+    },
+    'circuit_breaker': {
+        'failure_threshold': 5,
+        'reset_seconds': 300
     }
 }
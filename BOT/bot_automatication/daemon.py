@@ -0,0 +1,175 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from dotenv import load_dotenv
+from config import DAEMON_SETTINGS
+from driver_pool import shutdown_shared_pool
+from main import setup_base_logging, validate_environment_vars, run_automation
+
+class AutomationDaemon:
+    """
+    Ejecuta el ciclo exportación/procesamiento/subida de forma periódica dentro de un
+    proceso residente.
+
+    Entre ciclos se mantienen cargados el intérprete, los navegadores del pool y las
+    sesiones, por lo que cada ciclo evita el arranque en frío. Nunca se ejecutan dos ciclos
+    a la vez: un disparo manual durante un ciclo en curso se rechaza. Un servidor HTTP local
+    expone el estado (`GET /status`) y permite forzar un ciclo (`POST /run`).
+    """
+
+    def __init__(self, interval_minutes=None, active_hours=None, active_weekdays=None,
+                 host=None, port=None):
+        self.interval = timedelta(minutes=interval_minutes or DAEMON_SETTINGS['interval_minutes'])
+        self.active_hours = active_hours or DAEMON_SETTINGS['active_hours']
+        self.active_weekdays = active_weekdays or DAEMON_SETTINGS['active_weekdays']
+        self.host = host or DAEMON_SETTINGS['status_host']
+        self.port = DAEMON_SETTINGS['status_port'] if port is None else port
+        self.run_lock = threading.Lock()
+        self.trigger = threading.Event()
+        self.stopping = threading.Event()
+        self.force_next = False
+        self.server = None
+        self.status = {
+            'state': 'idle',
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'runs': 0,
+            'failures': 0,
+            'last_run_started': None,
+            'last_run_finished': None,
+            'last_run_seconds': None,
+            'last_error': None,
+            'next_run': None
+        }
+
+    def is_active_time(self, moment):
+        """True si el momento cae dentro del horario de tienda configurado"""
+        start_hour, end_hour = self.active_hours
+        return moment.weekday() in self.active_weekdays and start_hour <= moment.hour < end_hour
+
+    def next_run_time(self, after):
+        """Próximo instante programado dentro del horario activo"""
+        candidate = after + self.interval
+        for _ in range(7 * 24 * 60):
+            if self.is_active_time(candidate):
+                return candidate
+            candidate = (candidate + timedelta(minutes=1)).replace(second=0, microsecond=0)
+        raise ValueError("El horario del daemon no tiene ninguna hora activa")
+
+    def run_cycle(self, force=False):
+        """
+        Ejecuta un ciclo completo si no hay otro en curso.
+
+        Returns:
+            bool: False si ya había un ciclo en ejecución
+        """
+        if not self.run_lock.acquire(blocking=False):
+            logging.warning("Ya hay un ciclo en ejecución, se omite el disparo")
+            return False
+        started = time.monotonic()
+        try:
+            self.status.update(state='running', last_run_started=datetime.now().isoformat(timespec='seconds'))
+            run_automation(force=force, keep_warm=True)
+            self.status['last_error'] = None
+        except Exception as e:
+            self.status['failures'] += 1
+            self.status['last_error'] = str(e)
+            logging.error(f"Ciclo del daemon fallido: {e}")
+        finally:
+            self.status.update(
+                state='idle',
+                runs=self.status['runs'] + 1,
+                last_run_finished=datetime.now().isoformat(timespec='seconds'),
+                last_run_seconds=round(time.monotonic() - started, 1))
+            self.run_lock.release()
+        return True
+
+    def request_run(self, force=False):
+        """Pide un ciclo inmediato; retorna False si hay uno en curso"""
+        if self.run_lock.locked():
+            return False
+        self.force_next = self.force_next or force
+        self.trigger.set()
+        return True
+
+    def _make_handler(self):
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def _send(self, code, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.rstrip('/') == '/status':
+                    self._send(200, daemon.status)
+                else:
+                    self._send(404, {'error': 'no encontrado'})
+
+            def do_POST(self):
+                path, _, query = self.path.partition('?')
+                if path.rstrip('/') != '/run':
+                    self._send(404, {'error': 'no encontrado'})
+                elif daemon.request_run(force='force=1' in query.split('&')):
+                    self._send(202, {'accepted': True})
+                else:
+                    self._send(409, {'accepted': False, 'error': 'ciclo en ejecución'})
+
+            def log_message(self, format, *args):
+                logging.debug(f"HTTP {self.address_string()} {format % args}")
+
+        return StatusHandler
+
+    def start_server(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        threading.Thread(target=self.server.serve_forever, name='daemon-status', daemon=True).start()
+        logging.info(f"Estado del daemon en http://{self.host}:{self.server.server_port}/status")
+
+    def stop(self, *_):
+        logging.info("Deteniendo daemon")
+        self.stopping.set()
+        self.trigger.set()
+
+    def serve_forever(self):
+        """Bucle principal: espera al próximo horario o a un disparo manual y ejecuta el ciclo"""
+        self.start_server()
+        next_run = datetime.now()
+        if not self.is_active_time(next_run):
+            next_run = self.next_run_time(next_run)
+        try:
+            while not self.stopping.is_set():
+                self.status['next_run'] = next_run.isoformat(timespec='seconds')
+                wait = max((next_run - datetime.now()).total_seconds(), 0)
+                triggered = self.trigger.wait(timeout=wait)
+                if self.stopping.is_set():
+                    break
+                self.trigger.clear()
+                force, self.force_next = self.force_next, False
+                if triggered:
+                    logging.info("Ciclo disparado manualmente")
+                self.run_cycle(force=force)
+                next_run = self.next_run_time(datetime.now())
+        finally:
+            if self.server is not None:
+                self.server.shutdown()
+                self.server.server_close()
+            shutdown_shared_pool()
+
+if __name__ == "__main__":
+    setup_base_logging()
+    load_dotenv()
+    validate_environment_vars()
+    automation_daemon = AutomationDaemon(
+        interval_minutes=int(os.getenv('BOT_INTERVAL_MINUTES', 0)) or None,
+        port=int(os.environ['BOT_STATUS_PORT']) if os.getenv('BOT_STATUS_PORT') else None)
+    signal.signal(signal.SIGTERM, automation_daemon.stop)
+    signal.signal(signal.SIGINT, automation_daemon.stop)
+    automation_daemon.serve_forever()
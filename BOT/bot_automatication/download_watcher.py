@@ -0,0 +1,118 @@
+import logging
+import os
+import time
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+PARTIAL_SUFFIXES = ('.part', '.crdownload', '.tmp')
+
+class DownloadWatcher:
+    """
+    Detecta la descarga completa de un archivo en una carpeta.
+
+    Se inicia antes de hacer clic en exportar: solo se consideran archivos que no existían
+    en ese momento o que fueron modificados después. Usa inotify cuando está disponible
+    (inotify_simple) y acepta solo archivos cerrados tras escribirse (CLOSE_WRITE) o
+    renombrados a su nombre final (MOVED_TO); si no, polling corto con verificación de
+    tamaño estable. Los archivos parciales de Firefox (.part) nunca se consideran.
+    """
+
+    def __init__(self, folder, extension='.csv', ignore_prefixes=('_',), poll_interval=0.25,
+                 stable_checks=2):
+        self.folder = folder
+        self.extension = extension
+        self.ignore_prefixes = ignore_prefixes
+        self.poll_interval = poll_interval
+        self.stable_checks = stable_checks
+        self.inotify = None
+        self.started_at = None
+        self.baseline = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """Toma una foto de la carpeta y comienza a escuchar eventos"""
+        self.started_at = time.time()
+        self.baseline = {name: self._mtime(name) for name in os.listdir(self.folder)}
+        if INotify is not None:
+            try:
+                self.inotify = INotify()
+                self.inotify.add_watch(self.folder, inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO)
+            except OSError as e:
+                logging.warning(f"inotify no disponible, usando polling: {e}")
+                self.inotify = None
+        return self
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def _mtime(self, name):
+        try:
+            return os.stat(os.path.join(self.folder, name)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _is_candidate(self, name):
+        if not name.endswith(self.extension) or name.startswith(self.ignore_prefixes):
+            return False
+        mtime = self._mtime(name)
+        if mtime is None:
+            return False
+        return name not in self.baseline or mtime > self.baseline[name]
+
+    def _is_complete(self, name):
+        path = os.path.join(self.folder, name)
+        if any(os.path.exists(path + suffix) for suffix in PARTIAL_SUFFIXES):
+            return False
+        return os.path.getsize(path) > 0
+
+    def _candidates(self):
+        return sorted((name for name in os.listdir(self.folder) if self._is_candidate(name)),
+                      key=self._mtime, reverse=True)
+
+    def wait_for_download(self, timeout=60):
+        """
+        Espera a que aparezca una descarga completa.
+
+        Returns:
+            str: Ruta del archivo descargado, o None si se agotó el tiempo
+        """
+        deadline = time.monotonic() + timeout
+        sizes = {}
+        stable = {}
+        finished = set()
+        while time.monotonic() < deadline:
+            for name in self._candidates():
+                if not self._is_complete(name):
+                    continue
+                if self.inotify is not None:
+                    if name in finished:
+                        return os.path.join(self.folder, name)
+                    continue
+                size = os.path.getsize(os.path.join(self.folder, name))
+                stable[name] = stable.get(name, 0) + 1 if sizes.get(name) == size else 0
+                sizes[name] = size
+                if stable[name] >= self.stable_checks:
+                    return os.path.join(self.folder, name)
+
+            remaining = max(0, deadline - time.monotonic())
+            if self.inotify is not None:
+                events = self.inotify.read(timeout=int(min(remaining, 1) * 1000))
+                finished.update(event.name for event in events)
+            else:
+                time.sleep(min(self.poll_interval, remaining))
+        return None
+
+def move_download(source_path, target_path):
+    """Mueve la descarga a su nombre final de forma atómica (reemplaza si existe)"""
+    os.replace(source_path, target_path)
+    return target_path
@@ -0,0 +1,253 @@
+from selenium import webdriver
+from selenium.webdriver.firefox.options import Options
+from contextlib import contextmanager
+from urllib.parse import quote
+import json
+import logging
+import threading
+from config import DRIVER_POOL_SETTINGS, BROWSER_PROFILE_SETTINGS
+
+# Preferencias que apagan servicios de fondo de Firefox que el bot nunca usa
+BACKGROUND_SERVICE_PREFS = {
+    "toolkit.telemetry.enabled": False,
+    "toolkit.telemetry.unified": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "app.normandy.enabled": False,
+    "app.shield.optoutstudies.enabled": False,
+    "app.update.auto": False,
+    "extensions.update.enabled": False,
+    "browser.search.update": False,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "browser.safebrowsing.downloads.enabled": False,
+    "browser.shell.checkDefaultBrowser": False,
+    "browser.newtabpage.enabled": False,
+    "browser.newtabpage.activity-stream.feeds.telemetry": False,
+    "browser.newtabpage.activity-stream.telemetry": False,
+    "network.captive-portal-service.enabled": False,
+    "network.connectivity-service.enabled": False,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    "media.gmp-manager.updateEnabled": False
+}
+
+def build_blocking_pac(blocked_hosts):
+    """Script PAC que envía los hosts bloqueados a un proxy cerrado y el resto directo"""
+    return ("function FindProxyForURL(url, host) {"
+            f"var blocked = {json.dumps(list(blocked_hosts))};"
+            "for (var i = 0; i < blocked.length; i++) {"
+            "if (shExpMatch(host, blocked[i])) return 'PROXY 127.0.0.1:9';"
+            "}"
+            "return 'DIRECT';"
+            "}")
+
+def apply_lean_profile(options, settings=None):
+    """
+    Preferencias del perfil liviano: la automatización solo necesita el DOM, así que no
+    se descargan imágenes, video ni fuentes web, los hosts de telemetría se bloquean con
+    un PAC y se apagan los servicios de fondo de Firefox.
+    """
+    settings = settings or BROWSER_PROFILE_SETTINGS
+    if settings['block_images']:
+        options.set_preference("permissions.default.image", 2)
+    if settings['block_media']:
+        options.set_preference("media.autoplay.default", 5)
+        options.set_preference("media.autoplay.blocking_policy", 2)
+        options.set_preference("media.preload.default", 0)
+        options.set_preference("media.preload.auto", 0)
+    if settings['block_fonts']:
+        options.set_preference("gfx.downloadable_fonts.enabled", False)
+        options.set_preference("browser.display.use_document_fonts", 0)
+    if settings['blocked_hosts']:
+        options.set_preference("network.proxy.type", 2)
+        options.set_preference("network.proxy.autoconfig_url",
+                               "data:application/x-ns-proxy-autoconfig," + quote(build_blocking_pac(settings['blocked_hosts'])))
+    for name, value in BACKGROUND_SERVICE_PREFS.items():
+        options.set_preference(name, value)
+    return options
+
+def build_firefox_options(headless=True, lean=None):
+    """
+    Opciones comunes de Firefox para exportar y subir archivos sin diálogos.
+
+    Args:
+        headless (bool): Firefox sin ventana
+        lean (bool): Aplicar el perfil liviano, por defecto según BROWSER_PROFILE_SETTINGS
+    """
+    options = Options()
+    if headless:
+        options.add_argument("-headless")
+    options.add_argument("--width=1920")
+    options.add_argument("--height=1080")
+    # Necesario en Firefox recientes para cambiar preferencias en caliente (contexto chrome)
+    options.add_argument("-remote-allow-system-access")
+
+    options.set_preference("browser.download.folderList", 2)
+    options.set_preference("browser.download.useDownloadDir", True)
+    options.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/csv,text/csv,application/octet-stream")
+    options.set_preference("browser.download.manager.showWhenStarting", False)
+    options.set_preference("browser.download.manager.focusWhenStarting", False)
+    options.set_preference("browser.download.manager.closeWhenDone", True)
+    options.set_preference("browser.download.manager.alertOnEXEOpen", False)
+    options.set_preference("browser.download.manager.useWindow", False)
+    options.set_preference("browser.download.manager.addToRecentDocs", False)
+    options.set_preference("browser.download.always_ask_before_handling_new_types", False)
+    if BROWSER_PROFILE_SETTINGS['lean'] if lean is None else lean:
+        apply_lean_profile(options)
+    return options
+
+def set_download_dir(driver, folder):
+    """Cambia la carpeta de descargas de un Firefox ya iniciado"""
+    with driver.context(driver.CONTEXT_CHROME):
+        driver.execute_script(
+            "Services.prefs.setIntPref('browser.download.folderList', 2);"
+            "Services.prefs.setStringPref('browser.download.dir', arguments[0]);"
+            "Services.prefs.setStringPref('browser.download.lastDir', arguments[0]);",
+            folder)
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.tasks = 0
+
+class DriverPool:
+    """
+    Pool de Firefox reutilizables entre etapas y tiendas.
+
+    Cada tarea toma un navegador con `acquire`, que le asigna su carpeta de descargas.
+    Al devolverlo se verifica que siga respondiendo; si falló o alcanzó
+    `max_tasks_per_driver` se cierra y la siguiente tarea arranca uno nuevo.
+    """
+
+    def __init__(self, max_size=None, max_tasks_per_driver=None, headless=None, lean=None):
+        self.max_size = max_size or DRIVER_POOL_SETTINGS['max_size']
+        self.max_tasks_per_driver = max_tasks_per_driver or DRIVER_POOL_SETTINGS['max_tasks_per_driver']
+        self.headless = DRIVER_POOL_SETTINGS['headless'] if headless is None else headless
+        self.lean = lean
+        self.condition = threading.Condition()
+        self.idle = []
+        self.active = 0
+        self.closed = False
+
+    def _create(self):
+        logging.info(f"Iniciando Firefox para el pool (headless={self.headless})")
+        return _PooledDriver(webdriver.Firefox(options=build_firefox_options(self.headless, self.lean)))
+
+    def _is_healthy(self, pooled):
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            logging.warning(f"Firefox del pool no responde, se reciclará: {e}")
+            return False
+
+    def _reset(self, pooled):
+        """Deja un solo tab en blanco para la siguiente tarea"""
+        driver = pooled.driver
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logging.warning(f"Error cerrando Firefox del pool: {e}")
+
+    def _take(self):
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("El pool de drivers está cerrado")
+                if self.idle:
+                    self.active += 1
+                    return self.idle.pop()
+                if self.active < self.max_size:
+                    self.active += 1
+                    return None
+                self.condition.wait()
+
+    def _give_back(self, pooled, reuse):
+        with self.condition:
+            self.active -= 1
+            if reuse and not self.closed:
+                self.idle.append(pooled)
+                pooled = None
+            self.condition.notify()
+        if pooled is not None:
+            self._quit(pooled)
+
+    @contextmanager
+    def acquire(self, download_dir=None):
+        """
+        Toma un Firefox del pool (o inicia uno) para una tarea.
+
+        Args:
+            download_dir (str): Carpeta de descargas para esta tarea
+        """
+        pooled = self._take()
+        try:
+            while pooled is not None and not self._is_healthy(pooled):
+                self._quit(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._create()
+            if download_dir:
+                set_download_dir(pooled.driver, download_dir)
+        except Exception:
+            if pooled is not None:
+                self._give_back(pooled, reuse=False)
+            else:
+                self._release_slot()
+            raise
+
+        try:
+            yield pooled.driver
+        finally:
+            pooled.tasks += 1
+            reuse = pooled.tasks < self.max_tasks_per_driver and self._is_healthy(pooled)
+            if reuse:
+                try:
+                    self._reset(pooled)
+                except Exception as e:
+                    logging.warning(f"No se pudo limpiar Firefox del pool: {e}")
+                    reuse = False
+            self._give_back(pooled, reuse)
+
+    def _release_slot(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def close(self):
+        """Cierra todos los navegadores inactivos y rechaza nuevas tareas"""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.condition.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_shared_pool():
+    """Pool común del proceso, compartido por la exportación y la subida"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None or _shared_pool.closed:
+            _shared_pool = DriverPool()
+        return _shared_pool
+
+def shutdown_shared_pool():
+    """Cierra el pool común al terminar la ejecución"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close()
+            _shared_pool = None
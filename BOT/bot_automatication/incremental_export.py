@@ -0,0 +1,147 @@
+import csv
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+
+_state_lock = threading.Lock()
+
+class WatermarkStore:
+    """
+    Guarda por tienda y año el último día exportado completamente (watermark), para que el
+    CSV de un año cerrado y el del año abierto avancen por separado.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        with open(self.state_file, encoding='utf-8') as f:
+            state = json.load(f)
+        for store_type, value in state.items():
+            if isinstance(value, str):
+                # Formato anterior: un solo watermark por tienda, del año de esa fecha
+                state[store_type] = {value[:4]: value}
+        return state
+
+    def _save(self, state):
+        folder = os.path.dirname(self.state_file) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+    def get(self, store_type, year):
+        """Retorna el watermark del CSV de la tienda para ese año como date, o None si no existe"""
+        with _state_lock:
+            value = self._load().get(store_type, {}).get(str(year))
+        return date.fromisoformat(value) if value else None
+
+    def set(self, store_type, year, day):
+        """Actualiza el watermark del CSV de la tienda para ese año de forma atómica"""
+        with _state_lock:
+            state = self._load()
+            state.setdefault(store_type, {})[str(year)] = day.isoformat()
+            self._save(state)
+
+    def clear(self, store_type, year=None):
+        """Elimina el watermark de un año, o de todos los de la tienda, para forzar una exportación completa"""
+        with _state_lock:
+            state = self._load()
+            years = state.get(store_type, {})
+            removed = years.pop(str(year), None) if year is not None else state.pop(store_type, None)
+            if removed is not None:
+                self._save(state)
+
+def get_incremental_since(watermark, overlap_days, default_start):
+    """Calcula la fecha SINCE a partir del watermark y la ventana de solapamiento"""
+    if watermark is None:
+        return default_start
+    return max(default_start, watermark - timedelta(days=overlap_days))
+
+def merge_incremental_csv(existing_path, delta_path, since, key_columns, day_column='Day'):
+    """
+    Combina un export incremental con el CSV existente de la tienda.
+
+    Las filas existentes con día anterior a `since` se copian tal cual; a partir de
+    `since` el export nuevo es la fuente de verdad. Como `key_columns` incluye el día,
+    una fila del export nuevo nunca comparte clave con una fila previa a `since`, así que
+    solo se deduplica el export nuevo, conservando la última aparición. Las filas sin día
+    (la línea de TOTALS) se descartan. El resultado se escribe a un archivo temporal que
+    reemplaza atómicamente al original.
+
+    Args:
+        existing_path (str): CSV acumulado de la tienda
+        delta_path (str): CSV recién descargado con los días desde `since`
+        since (date): Primer día cubierto por el export nuevo
+        key_columns (list): Columnas que identifican una fila de negocio, incluido el día
+        day_column (str): Columna con el día en formato ISO
+    Returns:
+        dict: Filas conservadas, filas nuevas, duplicados y filas sin día descartadas
+    """
+    since_str = since.isoformat()
+    folder = os.path.dirname(existing_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.csv.tmp')
+    stats = {'kept': 0, 'new': 0, 'duplicates': 0, 'no_day': 0}
+
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as out, \
+                open(delta_path, newline='', encoding='utf-8') as delta_file:
+            writer = csv.writer(out)
+            delta_reader = csv.reader(delta_file)
+            header = next(delta_reader, None)
+            if header is None:
+                raise ValueError(f"El export incremental {delta_path} está vacío")
+            missing = [col for col in key_columns + [day_column] if col not in header]
+            if missing:
+                raise ValueError(f"Faltan columnas en {delta_path}: {', '.join(missing)}")
+            writer.writerow(header)
+
+            day_index = header.index(day_column)
+            key_indexes = [header.index(col) for col in key_columns]
+            delta_rows = {}
+            for row in delta_reader:
+                if not row:
+                    continue
+                if not row[day_index]:
+                    stats['no_day'] += 1
+                    continue
+                key = tuple(row[i] for i in key_indexes)
+                if key in delta_rows:
+                    stats['duplicates'] += 1
+                    del delta_rows[key]
+                delta_rows[key] = row
+
+            if os.path.exists(existing_path):
+                with open(existing_path, newline='', encoding='utf-8') as existing_file:
+                    existing_reader = csv.reader(existing_file)
+                    existing_header = next(existing_reader, None)
+                    if existing_header is not None and existing_header != header:
+                        raise ValueError(f"Las columnas de {existing_path} no coinciden con el export nuevo")
+                    for row in existing_reader:
+                        if not row or row[day_index] >= since_str:
+                            continue
+                        if not row[day_index]:
+                            stats['no_day'] += 1
+                            continue
+                        writer.writerow(row)
+                        stats['kept'] += 1
+
+            writer.writerows(delta_rows.values())
+            stats['new'] = len(delta_rows)
+
+        os.replace(tmp_path, existing_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logging.info(f"Merge incremental en {existing_path}: {stats['kept']} filas previas, "
+                 f"{stats['new']} filas nuevas, {stats['duplicates']} duplicados y "
+                 f"{stats['no_day']} filas sin día descartados")
+    return stats
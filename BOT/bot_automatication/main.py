@@ -1,86 +1,316 @@
-from shopify_automation import ShopifyAutomation
-from sharepoint_uploader import SharePointConfig, SharePointUploader
+# pandas, pyarrow y selenium se importan dentro de cada etapa para que los comandos que
+# no las usan (p. ej. `cli.py upload` con el backend HTTP) arranquen sin cargarlas
+from config import (STORE_CONFIGS, NUMERIC_COLUMNS, CSV_CHUNK_SIZE, PARQUET_SETTINGS, ROLLUP_SETTINGS,
+                    VALIDATION_SETTINGS, ARCHIVE_SETTINGS)
+from pipeline_state import PipelineState
+from store_scheduler import run_store_tasks
+from stores import (get_store_csv_path, get_sharepoint_folder_url, get_required_env_vars, get_open_year,
+                    get_year_window, has_closed_days)
+import tracing
+from bot_logging import setup_logging
+from manifest import FileManifest
+from query_sharding import count_csv_rows
+import csv
 import logging
 import os
+import tempfile
+from itertools import islice
 from dotenv import load_dotenv
-import pandas as pd
 from pathlib import Path
 
 def setup_base_logging():
     """Configura el logging base para todo el proyecto"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('automation.log'),
-            logging.StreamHandler()
-        ]
-    )
+    setup_logging()
+
+def validate_environment_vars(store_types=None, stages=None):
+    """
+    Valida que estén presentes las variables de entorno que usan las etapas indicadas.
 
-def validate_environment_vars():
-    """Valida que todas las variables de entorno necesarias estén presentes"""
-    required_vars = [
-        'SHOPIFY_EMAIL',
-        'SHOPIFY_PASSWORD',
-        'SHAREPOINT_EMAIL',
-        'SHAREPOINT_PASSWORD',
-        'SHAREPOINT_BASE_URL',
-        'SHAREPOINT_MAYORCA_URL',
-        'SHAREPOINT_MONTERIA_URL'
-    ]
+    Args:
+        store_types (list): Tiendas a validar, por defecto todas
+        stages (list): Etapas ('export', 'upload'), por defecto todas
+    """
+    required_vars = get_required_env_vars(store_types, stages)
     
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
         raise ValueError(f"Faltan las siguientes variables de entorno: {', '.join(missing_vars)}")
 
-def process_csv_file(file_path: Path) -> bool:
+def process_csv_file(file_path: Path, chunk_size: int = CSV_CHUNK_SIZE) -> bool:
     """
     Procesa un archivo CSV de Shopify para eliminar filas donde todos los valores numéricos son 0
     o están vacíos.
+
+    El archivo se recorre por bloques: pandas lee solo las columnas numéricas (como float64)
+    para calcular la máscara, mientras las filas originales se copian sin re-formatear a un
+    archivo temporal que reemplaza atómicamente al original al terminar.
     
     Args:
         file_path (Path): Ruta al archivo CSV
+        chunk_size (int): Filas por bloque
     Returns:
         bool: True si el proceso fue exitoso, False en caso contrario
     """
+    import pandas as pd
+
+    tmp_path = None
     try:
         logging.info(f"Procesando archivo: {file_path}")
-        
 
-        df = pd.read_csv(file_path, keep_default_na=True)
-        
-   
-        numeric_columns = [
-            'Quantity ordered',
-            'Gross sales',
-            'Discounts',
-            'Total sales',
-            'Net sales'
-        ]
-        
-    
-        mask = df[numeric_columns].replace({0: None}).notna().any(axis=1)
-        
+        chunks = pd.read_csv(
+            file_path,
+            usecols=NUMERIC_COLUMNS,
+            dtype={column: 'float64' for column in NUMERIC_COLUMNS},
+            chunksize=chunk_size
+        )
 
-        filtered_df = df[mask]
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, suffix='.csv.tmp')
+        total_rows = 0
+        kept_rows = 0
+        with open(file_path, newline='', encoding='utf-8') as source, \
+                os.fdopen(fd, 'w', newline='', encoding='utf-8') as target:
+            reader = csv.reader(source)
+            writer = csv.writer(target)
+            writer.writerow(next(reader))
+            raw_rows = (row for row in reader if row)
 
-        filtered_df.to_csv(file_path, index=False)
-        
+            for chunk in chunks:
+                mask = (chunk.ne(0) & chunk.notna()).any(axis=1).to_numpy()
+                rows = list(islice(raw_rows, len(chunk)))
+                if len(rows) != len(chunk):
+                    raise ValueError("El número de filas leídas no coincide con el bloque numérico")
+                writer.writerows(row for row, keep in zip(rows, mask) if keep)
+                total_rows += len(chunk)
+                kept_rows += int(mask.sum())
+
+            if next(raw_rows, None) is not None:
+                raise ValueError("El archivo tiene más filas de las que pandas pudo leer")
+
+        os.replace(tmp_path, file_path)
+        tmp_path = None
+        tracing.count('rows_in', total_rows)
+        tracing.count('rows_out', kept_rows)
 
-        rows_removed = len(df) - len(filtered_df)
         logging.info(f"Procesamiento completado para {file_path.name}:")
-        logging.info(f"- Filas originales: {len(df)}")
-        logging.info(f"- Filas después del filtrado: {len(filtered_df)}")
-        logging.info(f"- Filas removidas: {rows_removed}")
+        logging.info(f"- Filas originales: {total_rows}")
+        logging.info(f"- Filas después del filtrado: {kept_rows}")
+        logging.info(f"- Filas removidas: {total_rows - kept_rows}")
         
         return True
         
     except Exception as e:
         logging.error(f"Error procesando {file_path}: {str(e)}")
         return False
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def store_as_parquet(file_path: Path) -> bool:
+    """
+    Copia el CSV procesado al dataset Parquet de la tienda. El CSV procesado sigue siendo
+    el archivo que se sube a SharePoint, con el formato original de Shopify; el dataset es
+    un almacén paralelo para consultas.
+    """
+    import parquet_store
 
-def run_automation():
-    """Ejecuta el proceso completo de automatización"""
+    try:
+        dataset_dir = file_path.parent / PARQUET_SETTINGS['dataset_dir']
+        parquet_store.sync_from_csv(file_path, dataset_dir)
+        return True
+    except Exception as e:
+        logging.error(f"Error guardando {file_path} en Parquet: {str(e)}")
+        return False
+
+def prepare_csv_file(file_path: Path, force: bool = False, store_parquet: bool = True) -> bool:
+    """
+    Filtra el CSV de la tienda y lo guarda en Parquet, omitiendo ambos pasos si el archivo
+    es idéntico al resultado del último procesamiento (salvo que se indique `force`). El
+    dataset Parquet es el del año abierto; un año cerrado pasa `store_parquet=False` porque
+    se guarda en el archivo histórico.
+    """
+    manifest = FileManifest.shared()
+    if not force and manifest.is_unchanged('process', file_path, file_path):
+        logging.info(f"{file_path} no cambió desde el último procesamiento, se omite")
+        return True
+
+    if not process_csv_file(file_path):
+        return False
+    if store_parquet and PARQUET_SETTINGS['enabled'] and not store_as_parquet(file_path):
+        return False
+
+    manifest.record('process', file_path, file_path, rows=count_csv_rows(file_path))
+    return True
+
+def build_sharepoint_uploader():
+    """SharePointUploader con las credenciales del entorno y la carpeta de cada tienda"""
+    from sharepoint_uploader import SharePointConfig, SharePointUploader
+
+    sharepoint_config = SharePointConfig(
+        email=os.getenv('SHAREPOINT_EMAIL'),
+        password=os.getenv('SHAREPOINT_PASSWORD'),
+        base_url=os.getenv('SHAREPOINT_BASE_URL'),
+        folder_urls={store_type: get_sharepoint_folder_url(store_type) for store_type in STORE_CONFIGS},
+        upload_backend=os.getenv('SHAREPOINT_UPLOAD_BACKEND', 'http')
+    )
+    return SharePointUploader(sharepoint_config)
+
+def export_year(store_type: str, year: int = None) -> bool:
+    """Exporta el CSV de un año de la tienda (por defecto el abierto) con su propio Firefox y carpeta de descarga"""
+    from shopify_automation import ShopifyAutomation
+
+    logging.info(f"Exportando {year or get_open_year()} de la tienda {store_type} "
+                 f"({STORE_CONFIGS[store_type]['folder_name']})")
+    return ShopifyAutomation(store_type, year=year).run()
+
+def export_store(store_type: str) -> bool:
+    """
+    Ejecuta la exportación de una tienda. Al cambiar de año, el año anterior se completa
+    hasta el 31 de diciembre antes de exportar el año abierto.
+    """
+    if ARCHIVE_SETTINGS['enabled']:
+        import year_archive
+
+        for year in year_archive.years_to_close(store_type):
+            logging.info(f"Completando el año {year} de {store_type} antes de archivarlo")
+            if not export_year(store_type, year):
+                return False
+    return export_year(store_type)
+
+def run_store_pipeline(store_type: str, state: PipelineState, uploader,
+                       force: bool = False, deadline=None) -> bool:
+    """
+    Exporta, valida, procesa, resume y sube el CSV de una tienda. Las etapas completadas en una ejecución
+    anterior se omiten mientras su archivo no haya cambiado; una etapa repetida obliga a
+    repetir las siguientes. Los CSV de años cerrados que aún no están archivados se
+    completan, pasan por las mismas etapas y se archivan antes de exportar el año abierto,
+    para que una falla del año abierto no deje sin archivar el año que cerró.
+
+    Args:
+        store_type (str): Tienda de STORE_CONFIGS
+        state (PipelineState): Estado persistido de la ejecución
+        uploader (SharePointUploader): Subidor compartido entre tiendas
+        force (bool): Procesar y subir aunque el archivo no haya cambiado
+        deadline (StoreDeadline): Tiempo límite blando de la tienda, verificado antes de cada etapa
+    """
+    import rollups
+
+    current_year = get_open_year()
+    csv_file = get_store_csv_path(store_type, current_year)
+    dirty = False
+
+    def needs_run(stage):
+        nonlocal dirty
+        if not dirty and state.is_valid(stage):
+            logging.info(f"Etapa {stage} completada en la ejecución {state.run_id}, se omite")
+            return False
+        if deadline is not None:
+            deadline.check(stage)
+        dirty = True
+        return True
+
+    def run_export_stage(year, open_year=True):
+        """Exporta el CSV de un año; los años cerrados tienen su propia etapa"""
+        stage = f"export:{store_type}" if open_year else f"export:{store_type}:{year}"
+        if needs_run(stage):
+            with tracing.span('stage', stage='export', store=store_type):
+                try:
+                    exported = export_year(store_type, year)
+                except Exception as e:
+                    state.mark_failed(stage, e)
+                    raise
+                if not exported:
+                    state.mark_failed(stage, "Exportación fallida")
+                    raise Exception(f"Falló la exportación de la tienda {store_type}")
+                state.mark_done(stage, [get_store_csv_path(store_type, year)])
+
+    def run_file_stages(csv_file, key, year, open_year=True):
+        """Valida, procesa, resume y sube un CSV; `key` distingue las etapas de cada archivo"""
+        if VALIDATION_SETTINGS['enabled']:
+            stage = f"validate:{key}"
+            if needs_run(stage):
+                with tracing.span('stage', stage='validate', store=store_type):
+                    from validation import validate_csv_file
+
+                    if not csv_file.exists():
+                        state.mark_failed(stage, "Archivo no encontrado")
+                        raise FileNotFoundError(f"No se encontró el archivo: {csv_file}")
+                    result = validate_csv_file(csv_file, force,
+                                               require_rows=has_closed_days(*get_year_window(year)))
+                    if not result.ok:
+                        state.mark_failed(stage, "; ".join(result.errors))
+                        raise Exception(f"El archivo {csv_file} no pasó la validación: {'; '.join(result.errors)}")
+                    state.mark_done(stage, [csv_file])
+
+        stage = f"process:{key}"
+        if needs_run(stage):
+            with tracing.span('stage', stage='process', store=store_type):
+                if not csv_file.exists():
+                    state.mark_failed(stage, "Archivo no encontrado")
+                    raise FileNotFoundError(f"No se encontró el archivo: {csv_file}")
+                if not prepare_csv_file(csv_file, force, store_parquet=open_year):
+                    state.mark_failed(stage, "Error al procesar")
+                    raise Exception(f"Error al procesar el archivo {csv_file}")
+                state.mark_done(stage, [csv_file])
+
+        rollup_files = []
+        if ROLLUP_SETTINGS['enabled']:
+            rollup_files = list(rollups.get_rollup_paths(csv_file).values())
+            stage = f"rollup:{key}"
+            if needs_run(stage):
+                with tracing.span('stage', stage='rollup', store=store_type):
+                    try:
+                        rollups.update_rollups(csv_file, STORE_CONFIGS[store_type]['folder_name'])
+                    except Exception as e:
+                        state.mark_failed(stage, e)
+                        raise
+                    state.mark_done(stage, rollup_files)
+
+        stage = f"upload:{key}"
+        if needs_run(stage):
+            with tracing.span('stage', stage='upload', store=store_type):
+                failed_files = uploader.upload_files(force=force, files=[csv_file] + rollup_files)
+                if failed_files:
+                    state.mark_failed(stage, "Subida fallida")
+                    raise Exception(f"Falló la subida de: {', '.join(str(f) for f in failed_files)}")
+                state.mark_done(stage, [csv_file] + rollup_files)
+
+    with tracing.span('store', store=store_type):
+        if ARCHIVE_SETTINGS['enabled']:
+            import year_archive
+
+            for year in year_archive.years_to_close(store_type):
+                run_export_stage(year, open_year=False)
+            archive_dir = year_archive.get_archive_dir(store_type)
+            for year, year_file in year_archive.years_to_archive(store_type).items():
+                run_file_stages(year_file, f"{store_type}:{year}", year, open_year=False)
+                stage = f"archive:{store_type}:{year}"
+                if needs_run(stage):
+                    with tracing.span('stage', stage='archive', store=store_type):
+                        try:
+                            year_archive.archive_year(year_file, archive_dir, year)
+                        except Exception as e:
+                            state.mark_failed(stage, e)
+                            raise
+                        state.mark_done(stage, [year_file])
+
+        run_export_stage(current_year)
+        run_file_stages(csv_file, store_type, current_year)
+
+    return True
+
+def run_automation(force: bool = False, keep_warm: bool = False):
+    """
+    Ejecuta el proceso completo de automatización. Cada tienda recorre sus etapas
+    (exportación, procesamiento y subida) en un pool acotado de workers, por orden de
+    prioridad. El avance se guarda en disco: si una ejecución anterior quedó incompleta, se
+    reanuda desde la primera etapa pendiente cuyos archivos siguen vigentes.
+
+    Args:
+        force (bool): Ignora la ejecución anterior y procesa y sube los archivos aunque no hayan cambiado
+        keep_warm (bool): No cerrar los navegadores al terminar (modo daemon)
+    """
+    tracer = tracing.get_tracer()
+    error = None
     try:
         setup_base_logging()
         logging.info("Iniciando proceso de automatización")
@@ -88,51 +318,29 @@ def run_automation():
         load_dotenv()
         validate_environment_vars()
         
+        state = PipelineState()
+        state.begin(force_new=force)
+        tracer.start_run(run_id=state.run_id, force=force)
 
-        logging.info("Iniciando descarga de archivos de Shopify")
-        
-
-        logging.info("Procesando tienda POS (Monteria)")
-        pos_automation = ShopifyAutomation('pos')
-        pos_automation.run()
-        
+        uploader = build_sharepoint_uploader()
 
-        logging.info("Procesando tienda Outlet (Mayorca)")
-        outlet_automation = ShopifyAutomation('outlet')
-        outlet_automation.run()
-        
-        logging.info("Iniciando procesamiento de archivos CSV para eliminar filas con valores en 0")
-        csv_files = [
-            Path("Monteria/2025.csv"),
-            Path("Mayorca/2025.csv")
-        ]
-        
-        for csv_file in csv_files:
-            if csv_file.exists():
-                if not process_csv_file(csv_file):
-                    raise Exception(f"Error al procesar el archivo {csv_file}")
-            else:
-                logging.error(f"Archivo no encontrado: {csv_file}")
-                raise FileNotFoundError(f"No se encontró el archivo: {csv_file}")
-        
-
-        logging.info("Iniciando proceso de carga a SharePoint")
-        sharepoint_config = SharePointConfig(
-            email=os.getenv('SHAREPOINT_EMAIL'),
-            password=os.getenv('SHAREPOINT_PASSWORD'),
-            base_url=os.getenv('SHAREPOINT_BASE_URL'),
-            mayorca_folder_url=os.getenv('SHAREPOINT_MAYORCA_URL'),
-            monteria_folder_url=os.getenv('SHAREPOINT_MONTERIA_URL')
-        )
-        
-        uploader = SharePointUploader(sharepoint_config)
-        uploader.upload_files()
+        result = run_store_tasks(
+            lambda store_type, deadline: run_store_pipeline(store_type, state, uploader, force, deadline))
+        if result.failed:
+            raise Exception(f"Falló el proceso de las tiendas: {', '.join(result.failed)}")
         
+        state.finish()
         logging.info("Proceso completo finalizado exitosamente")
         
     except Exception as e:
+        error = e
         logging.error(f"Error en el proceso de automatización: {str(e)}")
         raise
+    finally:
+        tracer.finish_run(error=error)
+        if not keep_warm:
+            from driver_pool import shutdown_shared_pool
+            shutdown_shared_pool()
 
 if __name__ == "__main__":
-    run_automation()
\ No newline at end of file
+    run_automation(force=os.getenv('BOT_FORCE') == '1')
\ No newline at end of file
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+from config import MANIFEST_SETTINGS
+
+def file_sha256(file_path, block_size=1 << 20):
+    """Hash SHA-256 de un archivo leyendo por bloques"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FileManifest:
+    """
+    Registro local por etapa y archivo con hash, tamaño, filas y fecha del último
+    procesamiento. Permite omitir etapas cuando el archivo no cambió desde la última vez.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+    @classmethod
+    def shared(cls):
+        """Instancia común del proceso"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(MANIFEST_SETTINGS['manifest_file'])
+            return cls._shared
+
+    def _load(self):
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"No se pudo leer el manifiesto, se ignorará: {e}")
+            return {}
+
+    def _save(self):
+        folder = os.path.dirname(self.manifest_file) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_file)
+
+    def get(self, stage, key):
+        with self.lock:
+            return self.entries.get(stage, {}).get(str(key))
+
+    def is_unchanged(self, stage, key, file_path, sha256=None):
+        """True si el archivo tiene el mismo hash que la última vez que pasó por la etapa"""
+        entry = self.get(stage, key)
+        if entry is None or not os.path.exists(file_path):
+            return False
+        if entry.get('size') != os.path.getsize(file_path):
+            return False
+        return entry.get('sha256') == (sha256 or file_sha256(file_path))
+
+    def record(self, stage, key, file_path, sha256=None, rows=None, size=None):
+        """
+        Registra que el archivo completó la etapa. `sha256` y `size` permiten registrarlo
+        cuando el archivo ya se movió o se borró.
+        """
+        entry = {
+            'sha256': sha256 or file_sha256(file_path),
+            'size': os.path.getsize(file_path) if size is None else size,
+            'rows': rows,
+            'recorded_at': datetime.now().isoformat(timespec='seconds')
+        }
+        with self.lock:
+            self.entries.setdefault(stage, {})[str(key)] = entry
+            self._save()
+        return entry
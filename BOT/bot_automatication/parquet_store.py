@@ -0,0 +1,110 @@
+import csv
+import json
+import logging
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+from config import NUMERIC_COLUMNS, DAY_COLUMN
+
+COLUMNS_FILE = '_columns.json'
+
+def _read_header(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), [])
+
+def column_types(columns):
+    """Tipos explícitos: numéricas float64, día date32 y el resto texto"""
+    types = {column: pa.string() for column in columns}
+    types.update({column: pa.float64() for column in NUMERIC_COLUMNS if column in types})
+    types[DAY_COLUMN] = pa.date32()
+    return types
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(DAY_COLUMN, pa.date32())]), flavor='hive')
+
+def sync_from_csv(csv_path, dataset_dir, block_size=16 << 20):
+    """
+    Escribe el CSV de la tienda como dataset Parquet particionado por día.
+
+    El CSV se lee en streaming por bloques con tipos explícitos. Las particiones de los
+    días presentes se reemplazan y las de días que ya no están en el CSV se eliminan,
+    de modo que el dataset refleja exactamente el CSV.
+
+    Args:
+        csv_path (Path): CSV procesado de la tienda
+        dataset_dir (Path): Carpeta del dataset Parquet
+        block_size (int): Bytes leídos por bloque
+    Returns:
+        int: Número de días escritos
+    """
+    columns = _read_header(csv_path)
+    if DAY_COLUMN not in columns:
+        raise ValueError(f"El archivo {csv_path} no tiene la columna {DAY_COLUMN}")
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types(columns))
+    )
+    written_days = set()
+
+    def visit(written_file):
+        written_days.add(os.path.basename(os.path.dirname(written_file.path)))
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    ds.write_dataset(
+        reader,
+        dataset_dir,
+        format='parquet',
+        partitioning=_partitioning(),
+        basename_template='part-{i}.parquet',
+        existing_data_behavior='delete_matching',
+        file_visitor=visit
+    )
+
+    for entry in os.listdir(dataset_dir):
+        path = os.path.join(dataset_dir, entry)
+        if entry.startswith(f"{DAY_COLUMN}=") and entry not in written_days and os.path.isdir(path):
+            shutil.rmtree(path)
+
+    with open(os.path.join(dataset_dir, COLUMNS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(columns, f)
+
+    logging.info(f"Dataset Parquet actualizado en {dataset_dir}: {len(written_days)} días")
+    return len(written_days)
+
+def open_dataset(dataset_dir):
+    """Abre el dataset Parquet de una tienda"""
+    return ds.dataset(dataset_dir, format='parquet', partitioning=_partitioning())
+
+def _day_filter(since=None, until=None):
+    expression = None
+    for condition in (
+        ds.field(DAY_COLUMN) >= pa.scalar(since, pa.date32()) if since else None,
+        ds.field(DAY_COLUMN) <= pa.scalar(until, pa.date32()) if until else None
+    ):
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    return expression
+
+def read_dataset(dataset_dir, columns=None, since=None, until=None):
+    """
+    Lee el dataset aplicando proyección de columnas y filtro por día. El filtro se
+    resuelve sobre las particiones, por lo que solo se abren los días pedidos.
+
+    Args:
+        dataset_dir (Path): Carpeta del dataset Parquet
+        columns (list): Columnas a leer, por defecto todas
+        since (date): Primer día incluido
+        until (date): Último día incluido
+    Returns:
+        pyarrow.Table: Filas seleccionadas
+    """
+    return open_dataset(dataset_dir).to_table(columns=columns, filter=_day_filter(since, until))
+
+def get_column_order(dataset_dir):
+    """Orden de columnas del CSV original"""
+    with open(os.path.join(dataset_dir, COLUMNS_FILE), encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+from manifest import file_sha256
+from config import PIPELINE_SETTINGS
+
+class PipelineState:
+    """
+    Estado persistido de una ejecución del pipeline, etapa por etapa.
+
+    Cada etapa completada guarda el hash de los archivos que dejó escritos. Al reanudar,
+    una etapa se omite solo si sigue completada y sus archivos aún tienen el hash que dejó
+    el pipeline; si no, se vuelve a ejecutar junto con las etapas siguientes de la misma
+    tienda.
+    """
+
+    def __init__(self, state_file=None, max_age_hours=None):
+        self.state_file = state_file or PIPELINE_SETTINGS['state_file']
+        self.max_age = timedelta(hours=max_age_hours or PIPELINE_SETTINGS['resume_max_age_hours'])
+        self.lock = threading.Lock()
+        self.state = None
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return None
+        try:
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"No se pudo leer el estado del pipeline, se inicia de cero: {e}")
+            return None
+
+    def _save(self):
+        folder = os.path.dirname(self.state_file) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+    def begin(self, force_new=False):
+        """
+        Reanuda la ejecución anterior si quedó incompleta y no está vencida; en otro caso
+        comienza una nueva.
+
+        Returns:
+            bool: True si se reanudó una ejecución anterior
+        """
+        previous = None if force_new else self._load()
+        if previous and not previous.get('finished_at'):
+            started = datetime.fromisoformat(previous['started_at'])
+            if datetime.now() - started <= self.max_age:
+                self.state = previous
+                done = [name for name, stage in previous['stages'].items() if stage['status'] == 'done']
+                logging.info(f"Reanudando ejecución {previous['run_id']}; etapas completadas: {', '.join(done) or 'ninguna'}")
+                return True
+            logging.info(f"La ejecución {previous['run_id']} quedó incompleta pero está vencida, se inicia una nueva")
+
+        self.state = {
+            'run_id': uuid.uuid4().hex[:12],
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'finished_at': None,
+            'stages': {},
+            'files': {}
+        }
+        self._save()
+        return False
+
+    @property
+    def run_id(self):
+        return self.state['run_id']
+
+    def is_valid(self, name):
+        """True si la etapa está completada y sus archivos no cambiaron desde entonces"""
+        with self.lock:
+            stage = self.state['stages'].get(name)
+            files = dict(self.state['files'])
+        if not stage or stage['status'] != 'done':
+            return False
+        for path in stage.get('outputs', []):
+            if not os.path.exists(path) or files.get(path) != file_sha256(path):
+                logging.info(f"La salida {path} de la etapa {name} cambió, se repetirá")
+                return False
+        return True
+
+    def mark_done(self, name, outputs=()):
+        """Marca la etapa como completada y guarda el hash actual de sus archivos"""
+        outputs = [str(path) for path in outputs]
+        hashes = {path: file_sha256(path) for path in outputs}
+        with self.lock:
+            self.state['files'].update(hashes)
+            self.state['stages'][name] = {
+                'status': 'done',
+                'outputs': outputs,
+                'completed_at': datetime.now().isoformat(timespec='seconds')
+            }
+            self._save()
+
+    def mark_failed(self, name, error):
+        with self.lock:
+            self.state['stages'][name] = {
+                'status': 'failed',
+                'error': str(error),
+                'failed_at': datetime.now().isoformat(timespec='seconds')
+            }
+            self._save()
+
+    def finish(self):
+        """Marca la ejecución como terminada; la próxima comenzará de cero"""
+        with self.lock:
+            self.state['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            self._save()
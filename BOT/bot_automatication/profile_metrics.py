@@ -0,0 +1,124 @@
+"""
+Mide cuánto cuesta cargar las páginas que usa el bot con el perfil liviano de Firefox
+activado y desactivado: tiempo de carga y bytes transferidos según la Navigation y
+Resource Timing API del navegador.
+
+Uso (desde bot_automatication):
+    python cli.py profile                       # analytics de cada tienda y carpetas de SharePoint
+    python cli.py profile --url https://... -n 3
+"""
+import logging
+import time
+from statistics import median
+from selenium import webdriver
+from selenium.webdriver.support.ui import WebDriverWait
+from driver_pool import build_firefox_options
+from session_manager import SessionManager
+from adaptive_wait import network_idle
+
+PAGE_METRICS_SCRIPT = (
+    "const nav = performance.getEntriesByType('navigation')[0];"
+    "const resources = performance.getEntriesByType('resource');"
+    "const bytes = resources.reduce((total, e) => total + (e.transferSize || 0), nav ? nav.transferSize || 0 : 0);"
+    "return {"
+    "load_ms: nav ? (nav.loadEventEnd || performance.now()) - nav.startTime : null,"
+    "dom_ms: nav ? nav.domContentLoadedEventEnd - nav.startTime : null,"
+    "bytes: bytes,"
+    "requests: resources.length + 1"
+    "};")
+
+class ProfilePage:
+    """Página a medir y, si requiere login, la cuenta cuya sesión guardada se restaura"""
+
+    def __init__(self, name, url, session_key=None, lean_url=None):
+        self.name = name
+        self.url = url
+        self.session_key = session_key
+        # URL alternativa con el perfil liviano, p. ej. la consulta sin VISUALIZE
+        self.lean_url = lean_url or url
+
+def measure_page(driver, url, timeout=60):
+    """
+    Carga `url` y espera a que la red quede inactiva.
+
+    Returns:
+        dict: load_ms, dom_ms, bytes y requests de la carga, y wall_ms medido desde Python
+    """
+    started = time.perf_counter()
+    driver.get(url)
+    WebDriverWait(driver, timeout, poll_frequency=0.2).until(network_idle(1.0))
+    metrics = driver.execute_script(PAGE_METRICS_SCRIPT)
+    metrics['wall_ms'] = (time.perf_counter() - started) * 1000
+    return metrics
+
+def _summarize(samples):
+    summary = {}
+    for key in ('load_ms', 'dom_ms', 'wall_ms', 'bytes', 'requests'):
+        values = [sample[key] for sample in samples if sample.get(key) is not None]
+        summary[key] = median(values) if values else None
+    summary['samples'] = len(samples)
+    return summary
+
+def measure_profile(pages, lean, repeats=3, headless=True, sessions=None):
+    """
+    Inicia un Firefox con el perfil indicado y mide cada página `repeats` veces.
+
+    Returns:
+        dict: Mediana de las métricas por nombre de página
+    """
+    sessions = sessions or SessionManager()
+    driver = webdriver.Firefox(options=build_firefox_options(headless, lean))
+    results = {}
+    try:
+        restored = set()
+        for page in pages:
+            if page.session_key and page.session_key not in restored:
+                cookies = sessions.load_cookies(page.session_key)
+                if cookies:
+                    sessions.restore(driver, cookies)
+                else:
+                    logging.warning(f"No hay sesión guardada para {page.session_key}, se medirá sin login")
+                restored.add(page.session_key)
+
+            samples = []
+            for attempt in range(repeats):
+                try:
+                    samples.append(measure_page(driver, page.lean_url if lean else page.url))
+                except Exception as e:
+                    logging.warning(f"No se pudo medir {page.name} (intento {attempt + 1}): {e}")
+            results[page.name] = _summarize(samples)
+    finally:
+        driver.quit()
+    return results
+
+def compare_profiles(pages, repeats=3, headless=True):
+    """
+    Mide las páginas con el perfil completo y con el liviano.
+
+    Returns:
+        dict: Por página, las métricas de cada perfil y el ahorro relativo del liviano
+    """
+    full = measure_profile(pages, lean=False, repeats=repeats, headless=headless)
+    lean = measure_profile(pages, lean=True, repeats=repeats, headless=headless)
+    report = {}
+    for page in pages:
+        entry = {'full': full[page.name], 'lean': lean[page.name]}
+        for key in ('load_ms', 'bytes'):
+            before, after = full[page.name][key], lean[page.name][key]
+            entry[f"{key}_saved"] = (before - after) / before if before and after is not None else None
+        report[page.name] = entry
+    return report
+
+def format_report(report):
+    """Tabla de texto con los resultados de compare_profiles"""
+    lines = [f"{'página':<28} {'perfil':<6} {'carga (ms)':>11} {'KB':>10} {'requests':>9}"]
+    for name, entry in report.items():
+        for profile in ('full', 'lean'):
+            metrics = entry[profile]
+            load = f"{metrics['load_ms']:.0f}" if metrics['load_ms'] is not None else '-'
+            size = f"{metrics['bytes'] / 1024:.0f}" if metrics['bytes'] is not None else '-'
+            requests = f"{metrics['requests']:.0f}" if metrics['requests'] is not None else '-'
+            lines.append(f"{name:<28} {profile:<6} {load:>11} {size:>10} {requests:>9}")
+        if entry['load_ms_saved'] is not None and entry['bytes_saved'] is not None:
+            lines.append(f"{'':<28} ahorro {entry['load_ms_saved']:>10.0%} {entry['bytes_saved']:>10.0%}")
+    return "\n".join(lines)
@@ -0,0 +1,155 @@
+import csv
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+FINER_GRANULARITY = {
+    'month': 'week',
+    'week': 'day',
+    'day': None
+}
+
+def _window_end(start, granularity):
+    if granularity == 'month':
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return next_month - timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=6)
+    if granularity == 'day':
+        return start
+    raise ValueError(f"Granularidad no soportada: {granularity}")
+
+def split_date_range(since, until, granularity):
+    """
+    Divide el rango [since, until] en ventanas consecutivas de la granularidad dada.
+
+    Args:
+        since (date): Primer día del rango
+        until (date): Último día del rango (inclusive)
+        granularity (str): 'month', 'week' o 'day'
+    Returns:
+        list: Tuplas (inicio, fin) de cada ventana
+    """
+    windows = []
+    start = since
+    while start <= until:
+        end = min(_window_end(start, granularity), until)
+        windows.append((start, end))
+        start = end + timedelta(days=1)
+    return windows
+
+class TruncatedExportError(Exception):
+    """Una ventana de un solo día sigue devolviendo el LIMIT, así que el export estaría incompleto"""
+
+def count_csv_rows(file_path, day_column=None):
+    """
+    Cuenta las filas de datos de un CSV sin cargarlo en memoria. Si se indica `day_column`,
+    no cuenta las filas sin día (la fila de TOTALS de WITH TOTALS), que no ocupan el LIMIT.
+    """
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return 0
+        if day_column is None:
+            return sum(1 for row in reader if row)
+        day_index = header.index(day_column)
+        return sum(1 for row in reader if row and row[day_index].strip())
+
+def concat_csv_files(file_paths, output_path, key_columns, day_column='Day'):
+    """
+    Concatena varios CSV con las mismas columnas y elimina filas duplicadas por clave,
+    conservando la última aparición. Las filas sin día (la línea de TOTALS de cada ventana)
+    se descartan: solo suman su propia ventana y no sirven para el archivo combinado.
+
+    Args:
+        file_paths (list): CSV a concatenar, en orden
+        output_path (str): Archivo de salida (se reemplaza atómicamente)
+        key_columns (list): Columnas que identifican una fila de negocio
+        day_column (str): Columna con el día
+    Returns:
+        int: Filas escritas
+    """
+    folder = os.path.dirname(output_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.csv.tmp')
+    header = None
+    rows = {}
+    try:
+        for file_path in file_paths:
+            with open(file_path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                file_header = next(reader, None)
+                if file_header is None:
+                    continue
+                if header is None:
+                    header = file_header
+                    key_indexes = [header.index(col) for col in key_columns]
+                    day_index = header.index(day_column)
+                elif file_header != header:
+                    raise ValueError(f"Las columnas de {file_path} no coinciden con las demás ventanas")
+                for row in reader:
+                    if row and row[day_index]:
+                        rows[tuple(row[i] for i in key_indexes)] = row
+
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            if header is not None:
+                writer.writerow(header)
+                writer.writerows(rows.values())
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logging.info(f"{len(file_paths)} ventanas concatenadas en {output_path}: {len(rows)} filas únicas")
+    return len(rows)
+
+class ShardPlanner:
+    """Cola de ventanas de fecha que se subdivide cuando una ventana alcanza el LIMIT"""
+
+    def __init__(self, since, until, limit, granularity='month'):
+        self.limit = limit
+        self.pending = [(start, end, granularity) for start, end in split_date_range(since, until, granularity)]
+        self.completed = []
+
+    def has_pending(self):
+        return bool(self.pending)
+
+    def next_batch(self, size):
+        """Retorna hasta `size` ventanas pendientes"""
+        batch, self.pending = self.pending[:size], self.pending[size:]
+        return batch
+
+    def report(self, window, file_path, row_count):
+        """
+        Registra el resultado de una ventana. Si alcanzó el LIMIT se descarta y se
+        reencolan sus sub-ventanas con la granularidad siguiente.
+
+        Args:
+            row_count (int): Filas de datos de la ventana, sin contar la fila de TOTALS
+        Returns:
+            bool: True si la ventana se acepta como completa
+        Raises:
+            TruncatedExportError: Si una ventana de un día sigue en el LIMIT
+        """
+        start, end, granularity = window
+        finer = FINER_GRANULARITY[granularity]
+        if row_count >= self.limit and finer and start != end:
+            logging.warning(f"Ventana {start}..{end} devolvió {row_count} filas (LIMIT {self.limit}), "
+                            f"dividiendo por {finer}")
+            sub_windows = [(s, e, finer) for s, e in split_date_range(start, end, finer)]
+            self.pending = sub_windows + self.pending
+            return False
+
+        if row_count >= self.limit:
+            raise TruncatedExportError(f"Ventana {start}..{end} sigue truncada en {row_count} filas "
+                                       f"(LIMIT {self.limit}) con granularidad diaria")
+        logging.info(f"Ventana {start}..{end} ({granularity}): {row_count} filas")
+        self.completed.append((start, file_path))
+        return True
+
+    def completed_files(self):
+        """Archivos de las ventanas aceptadas, ordenados por fecha"""
+        return [file_path for _, file_path in sorted(self.completed)]
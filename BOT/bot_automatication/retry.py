@@ -0,0 +1,209 @@
+import logging
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import requests
+from config import RETRY_SETTINGS
+from sharepoint_http import SharePointUploadError
+from shopify_api import ShopifyAPIError
+from query_sharding import TruncatedExportError
+import tracing
+
+AUTH = 'auth'
+ELEMENT_MISSING = 'element_missing'
+TIMEOUT = 'timeout'
+DOWNLOAD_MISSING = 'download_missing'
+NETWORK = 'network'
+CIRCUIT_OPEN = 'circuit_open'
+TRUNCATED = 'truncated'
+UNKNOWN = 'unknown'
+
+# Clases que indican que el servicio (no la página) está fallando
+SERVICE_FAILURES = (TIMEOUT, NETWORK)
+
+class AuthError(Exception):
+    """Credenciales rechazadas; reintentar no ayuda"""
+
+class ElementMissingError(Exception):
+    """Un elemento esperado de la página no apareció o no se pudo usar"""
+
+class DownloadMissingError(Exception):
+    """La exportación no produjo ninguna descarga"""
+
+class CircuitOpenError(Exception):
+    """El servicio falló demasiadas veces seguidas y se dejó de intentar por un tiempo"""
+
+NETWORK_MARKERS = ('net::', 'neterror', 'dnsnotfound', 'connectionfailure', 'netreset', 'nssfailure')
+
+def _selenium_exceptions():
+    """
+    Módulo de excepciones de selenium si ya se cargó. No se importa aquí para que la subida
+    por HTTP no cargue selenium: si nunca se importó, ninguna falla puede venir de él.
+    """
+    return sys.modules.get('selenium.common.exceptions')
+
+def classify(error) -> str:
+    """Clase de falla de una excepción, usada para elegir el presupuesto de reintentos"""
+    selenium_errors = _selenium_exceptions()
+    element_errors = (ElementMissingError,)
+    timeout_errors = (requests.Timeout, socket.timeout, TimeoutError)
+    if selenium_errors is not None:
+        element_errors += (selenium_errors.NoSuchElementException, selenium_errors.StaleElementReferenceException,
+                           selenium_errors.ElementNotInteractableException,
+                           selenium_errors.ElementClickInterceptedException)
+        timeout_errors += (selenium_errors.TimeoutException,)
+
+    if isinstance(error, CircuitOpenError):
+        return CIRCUIT_OPEN
+    if isinstance(error, AuthError):
+        return AUTH
+    if isinstance(error, TruncatedExportError):
+        return TRUNCATED
+    if isinstance(error, DownloadMissingError):
+        return DOWNLOAD_MISSING
+    if isinstance(error, element_errors):
+        return ELEMENT_MISSING
+    if isinstance(error, timeout_errors):
+        return TIMEOUT
+    if isinstance(error, (requests.ConnectionError, ConnectionError)):
+        return NETWORK
+    if isinstance(error, requests.RequestException) and not isinstance(error, requests.HTTPError):
+        # La petición no obtuvo respuesta completa (p. ej. conexión cortada a mitad del cuerpo)
+        return NETWORK
+    if isinstance(error, (requests.HTTPError, SharePointUploadError, ShopifyAPIError)):
+        status = getattr(error, 'status', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+        match = re.search(r'\b(401|403|429|5\d\d)\b', str(error))
+        status = status or (int(match.group(1)) if match else None)
+        if status in (401, 403):
+            return AUTH
+        if status is not None and (status == 429 or status >= 500):
+            return NETWORK
+    if (selenium_errors is not None and isinstance(error, selenium_errors.WebDriverException)
+            and any(marker in str(error).lower() for marker in NETWORK_MARKERS)):
+        return NETWORK
+    return UNKNOWN
+
+class CircuitBreaker:
+    """
+    Corta los intentos contra un servicio después de `failure_threshold` fallas de red o
+    timeouts seguidas. Pasados `reset_seconds` deja pasar un solo intento de prueba (los
+    demás siguen recibiendo CircuitOpenError mientras dura): si funciona se cierra y si
+    falla vuelve a abrirse.
+    """
+
+    _breakers = {}
+    _breakers_lock = threading.Lock()
+
+    def __init__(self, service, failure_threshold=None, reset_seconds=None):
+        settings = RETRY_SETTINGS['circuit_breaker']
+        self.service = service
+        self.failure_threshold = failure_threshold or settings['failure_threshold']
+        self.reset_seconds = reset_seconds or settings['reset_seconds']
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @classmethod
+    def for_service(cls, service):
+        """Breaker común del proceso para el servicio"""
+        with cls._breakers_lock:
+            if service not in cls._breakers:
+                cls._breakers[service] = cls(service)
+            return cls._breakers[service]
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(f"{self.service} no disponible, se reintentará en {remaining:.0f}s")
+            if self.probing:
+                raise CircuitOpenError(f"{self.service} no disponible, hay un intento de prueba en curso")
+            self.probing = True
+            logging.info(f"Probando nuevamente {self.service} después de {self.reset_seconds}s")
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self, error_class):
+        with self.lock:
+            # Una prueba que falla por otra causa libera el turno sin cerrar el circuito
+            self.probing = False
+            if error_class not in SERVICE_FAILURES:
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.error(f"{self.service} falló {self.failures} veces seguidas, se suspenden los intentos")
+                self.opened_at = time.monotonic()
+
+class RetryPolicy:
+    """
+    Reintenta una operación según la clase de la falla.
+
+    Cada clase tiene su propio presupuesto de intentos y su backoff exponencial con jitter
+    (RETRY_SETTINGS['classes']). Las clases sin reintentos (credenciales rechazadas,
+    circuito abierto) fallan de inmediato. Si se indica un servicio, las fallas de red y
+    timeouts alimentan su CircuitBreaker.
+    """
+
+    def __init__(self, name, service=None, classes=None, max_attempts=None):
+        self.name = name
+        self.breaker = CircuitBreaker.for_service(service) if service else None
+        self.classes = dict(RETRY_SETTINGS['classes'], **(classes or {}))
+        self.max_attempts = max_attempts or RETRY_SETTINGS['max_attempts']
+
+    def delay_for(self, error_class, failures, retry_after=None):
+        """
+        Backoff exponencial con jitter para la n-ésima falla de la clase. Si el servicio
+        pidió esperar `retry_after` segundos (Retry-After, THROTTLED), se espera al menos
+        eso, sin pasar del máximo de la clase.
+        """
+        settings = self.classes[error_class]
+        delay = min(settings['max_delay'], settings['base_delay'] * 2 ** (failures - 1))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after:
+            delay = max(delay, min(retry_after, settings['max_delay']))
+        return delay
+
+    def call(self, operation, *args, **kwargs):
+        """
+        Ejecuta `operation` con reintentos y retorna su resultado.
+
+        Raises:
+            La última excepción de la operación cuando se agota el presupuesto de su clase
+            o la falla no es reintentable
+        """
+        failures = {}
+        for attempt in range(1, self.max_attempts + 1):
+            if self.breaker is not None:
+                self.breaker.before_call()
+            try:
+                result = operation(*args, **kwargs)
+            except Exception as e:
+                error_class = classify(e)
+                if self.breaker is not None:
+                    self.breaker.record_failure(error_class)
+                failures[error_class] = failures.get(error_class, 0) + 1
+                budget = self.classes.get(error_class, self.classes[UNKNOWN])['max_attempts']
+                if failures[error_class] >= budget or attempt == self.max_attempts:
+                    logging.error(f"{self.name}: falla {error_class} no reintentable o sin intentos restantes: {e}")
+                    raise
+                delay = self.delay_for(error_class, failures[error_class], getattr(e, 'retry_after', None))
+                logging.warning(f"{self.name}: falla {error_class} en el intento {attempt} ({e}), "
+                                f"reintentando en {delay:.1f}s")
+                tracing.count('retries')
+                tracing.count(f"retries_{error_class}")
+                tracing.sleep(delay, f"{self.name} retry {error_class}")
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
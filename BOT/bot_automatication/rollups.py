@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+import pandas as pd
+from config import NUMERIC_COLUMNS, DAY_COLUMN, CSV_CHUNK_SIZE, ROLLUP_SETTINGS
+from stores import get_rollup_paths
+
+STORE_COLUMN = 'Store'
+
+def _state_file(csv_path):
+    digest = hashlib.sha256(str(Path(csv_path).absolute()).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(ROLLUP_SETTINGS['state_dir'], f"{digest}.json")
+
+def _load_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"No se pudo leer el estado de los resúmenes, se recalcularán: {e}")
+        return {}
+
+def _atomic_write(path, write):
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _key_columns():
+    return list(dict.fromkeys(column for keys in ROLLUP_SETTINGS['rollups'].values() for column in keys))
+
+def day_digests(csv_path, chunk_size=CSV_CHUNK_SIZE) -> dict:
+    """
+    Huella por día de las columnas que usan los resúmenes. Es independiente del orden de
+    las filas, así que solo cambia si cambiaron las filas de ese día.
+    """
+    columns = [DAY_COLUMN] + _key_columns() + NUMERIC_COLUMNS
+    totals = {}
+    for chunk in pd.read_csv(csv_path, usecols=columns, dtype=str, keep_default_na=False, chunksize=chunk_size):
+        hashes = pd.util.hash_pandas_object(chunk[columns], index=False).to_numpy()
+        # Sumar las dos mitades de 32 bits por separado evita el desbordamiento
+        parts = pd.DataFrame({
+            'high': (hashes >> 32).astype('int64'),
+            'low': (hashes & 0xFFFFFFFF).astype('int64'),
+            'rows': 1
+        })
+        for day, row in parts.groupby(chunk[DAY_COLUMN].to_numpy()).sum().iterrows():
+            high, low, rows = totals.get(day, (0, 0, 0))
+            totals[day] = (high + int(row['high']), low + int(row['low']), rows + int(row['rows']))
+    return {day: f"{rows}:{high:x}:{low:x}" for day, (high, low, rows) in totals.items()}
+
+def aggregate_days(csv_path, days, chunk_size=CSV_CHUNK_SIZE) -> dict:
+    """Totales de las columnas numéricas de los días indicados para cada resumen"""
+    key_columns = _key_columns()
+    dtype = {column: str for column in key_columns}
+    dtype.update({column: 'float64' for column in NUMERIC_COLUMNS})
+    partials = {name: [] for name in ROLLUP_SETTINGS['rollups']}
+    for chunk in pd.read_csv(csv_path, usecols=[DAY_COLUMN] + key_columns + NUMERIC_COLUMNS,
+                             dtype=dict(dtype, **{DAY_COLUMN: str}), chunksize=chunk_size):
+        chunk = chunk[chunk[DAY_COLUMN].isin(days)].fillna({column: '' for column in key_columns})
+        if chunk.empty:
+            continue
+        for name, keys in ROLLUP_SETTINGS['rollups'].items():
+            partials[name].append(chunk.groupby([DAY_COLUMN] + keys, sort=False)[NUMERIC_COLUMNS].sum())
+
+    result = {}
+    for name, keys in ROLLUP_SETTINGS['rollups'].items():
+        if partials[name]:
+            result[name] = pd.concat(partials[name]).groupby(level=list(range(len(keys) + 1))).sum().reset_index()
+        else:
+            result[name] = pd.DataFrame(columns=[DAY_COLUMN] + keys + NUMERIC_COLUMNS)
+    return result
+
+def update_rollups(csv_path, store_name, chunk_size=CSV_CHUNK_SIZE) -> list:
+    """
+    Actualiza los resúmenes diarios (tienda, tipo de producto y SKU) del CSV procesado.
+
+    Solo se recalculan los días cuya huella cambió desde la última vez; las filas de los
+    demás días se conservan de los archivos de resumen existentes y las de días que ya
+    no están en el CSV se eliminan.
+
+    Args:
+        csv_path (Path): CSV procesado de la tienda
+        store_name (str): Nombre de la tienda para la columna Store
+        chunk_size (int): Filas por bloque
+    Returns:
+        list: Archivos de resumen escritos
+    """
+    csv_path = Path(csv_path)
+    state_file = _state_file(csv_path)
+    paths = get_rollup_paths(csv_path)
+    previous = _load_state(state_file)
+    written = all(path.exists() for path in paths.values())
+    if not written:
+        previous = {}
+
+    digests = day_digests(csv_path, chunk_size)
+    changed = {day for day, digest in digests.items() if previous.get(day) != digest}
+    removed = set(previous) - set(digests)
+    # Un CSV sin días (el año abierto el 1 de enero) igual deja los resúmenes con sus columnas
+    if written and not changed and not removed:
+        logging.info(f"Resúmenes de {csv_path} al día, sin días modificados")
+        return list(paths.values())
+
+    logging.info(f"Recalculando resúmenes de {csv_path}: {len(changed)} días modificados, {len(removed)} eliminados")
+    aggregates = aggregate_days(csv_path, changed, chunk_size)
+    for name, keys in ROLLUP_SETTINGS['rollups'].items():
+        columns = [STORE_COLUMN, DAY_COLUMN] + keys + NUMERIC_COLUMNS
+        fresh = aggregates[name]
+        fresh.insert(0, STORE_COLUMN, store_name)
+        if previous:
+            existing = pd.read_csv(paths[name], dtype={column: str for column in [STORE_COLUMN, DAY_COLUMN] + keys},
+                                   keep_default_na=False)
+            existing = existing[~existing[DAY_COLUMN].isin(changed | removed)]
+            fresh = pd.concat([existing, fresh], ignore_index=True)
+        fresh = fresh[columns].sort_values([DAY_COLUMN] + keys, kind='stable')
+        _atomic_write(paths[name], lambda f: fresh.to_csv(f, index=False))
+
+    _atomic_write(state_file, lambda f: json.dump(digests, f, sort_keys=True))
+    return list(paths.values())
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import requests
+from config import SESSION_SETTINGS
+
+class SessionManager:
+    """
+    Guarda en disco las cookies de cada cuenta autenticada y las restaura en nuevos
+    drivers. Antes de restaurar verifica la sesión con una petición HTTP liviana, de modo
+    que el flujo de login del navegador solo se ejecuta cuando la sesión expiró.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+    # Momento en que este proceso guardó la sesión de cada cuenta
+    _saved_at = {}
+
+    def __init__(self, sessions_dir=None):
+        self.sessions_dir = sessions_dir or SESSION_SETTINGS['sessions_dir']
+
+    def account_lock(self, account):
+        """Lock por cuenta: evita que dos workers hagan login a la vez con la misma cuenta"""
+        with self._locks_guard:
+            return self._locks.setdefault(account, threading.Lock())
+
+    def _cookie_file(self, account):
+        digest = hashlib.sha256(account.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.sessions_dir, f"{digest}.json")
+
+    def load_cookies(self, account):
+        path = self._cookie_file(account)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"No se pudo leer la sesión guardada de {account}: {e}")
+            return []
+
+    def save(self, driver, account):
+        """Guarda las cookies actuales del driver para la cuenta"""
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.sessions_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(driver.get_cookies(), f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self._cookie_file(account))
+        self._saved_at[account] = time.monotonic()
+        logging.info(f"Sesión guardada para {account}")
+
+    def clear(self, account):
+        self._saved_at.pop(account, None)
+        path = self._cookie_file(account)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def build_http_session(self, account, cookies=None):
+        """requests.Session con las cookies guardadas de la cuenta"""
+        session = requests.Session()
+        for cookie in cookies if cookies is not None else self.load_cookies(account):
+            session.cookies.set(cookie['name'], cookie['value'],
+                                domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        return session
+
+    def is_valid(self, account, check_url, cookies=None):
+        """
+        Verifica la sesión con un GET sin seguir redirecciones: un 200 significa que las
+        cookies siguen autenticadas; una redirección al login significa que expiraron.
+        """
+        cookies = cookies if cookies is not None else self.load_cookies(account)
+        if not cookies or not check_url:
+            return False
+        try:
+            with self.build_http_session(account, cookies) as session:
+                response = session.get(check_url, allow_redirects=False,
+                                       timeout=SESSION_SETTINGS['check_timeout'])
+            return response.status_code == 200
+        except requests.RequestException as e:
+            logging.warning(f"No se pudo verificar la sesión de {account}: {e}")
+            return False
+
+    def restore(self, driver, cookies):
+        """Carga las cookies en el driver visitando una vez cada dominio"""
+        by_domain = {}
+        for cookie in cookies:
+            by_domain.setdefault(cookie.get('domain', '').lstrip('.'), []).append(cookie)
+
+        for domain, domain_cookies in by_domain.items():
+            if not domain:
+                continue
+            driver.get(f"https://{domain}/robots.txt")
+            for cookie in domain_cookies:
+                cookie = {key: value for key, value in cookie.items() if key != 'sameSite' or value in ('Strict', 'Lax', 'None')}
+                try:
+                    driver.add_cookie(cookie)
+                except Exception as e:
+                    logging.debug(f"No se pudo restaurar la cookie {cookie.get('name')}: {e}")
+
+    def is_fresh(self, account):
+        """True si este proceso guardó la sesión hace poco, p. ej. otro worker que acaba de hacer login"""
+        saved_at = self._saved_at.get(account)
+        return saved_at is not None and time.monotonic() - saved_at < SESSION_SETTINGS['fresh_seconds']
+
+    def restore_if_valid(self, driver, account, check_url):
+        """
+        Restaura la sesión guardada en el driver si sigue siendo válida. Las sesiones
+        recién guardadas por este proceso se restauran sin la verificación HTTP.
+
+        Returns:
+            bool: True si el driver quedó autenticado sin pasar por el login
+        """
+        cookies = self.load_cookies(account)
+        if not (cookies and self.is_fresh(account)) and not self.is_valid(account, check_url, cookies):
+            logging.info(f"No hay sesión válida guardada para {account}, se hará login")
+            return False
+        self.restore(driver, cookies)
+        logging.info(f"Sesión restaurada para {account}, omitiendo login")
+        return True
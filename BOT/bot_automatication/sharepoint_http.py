@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, quote
+import requests
+from requests.adapters import HTTPAdapter
+from config import SHAREPOINT_HTTP_SETTINGS
+
+class SharePointUploadError(Exception):
+    pass
+
+def folder_from_url(folder_url: str) -> str:
+    """
+    Obtiene la ruta relativa al servidor de una carpeta a partir de la URL que se abre en
+    el navegador (parámetro `id` de AllItems.aspx) o de una URL directa a la carpeta.
+    """
+    parsed = urlparse(folder_url)
+    folder_id = parse_qs(parsed.query).get('id')
+    if folder_id:
+        return folder_id[0].rstrip('/')
+    return parsed.path.rstrip('/')
+
+def _odata_path(value: str) -> str:
+    return quote(value.replace("'", "''"), safe='/')
+
+def build_http_session(cookies=None, pool_size=None) -> requests.Session:
+    """requests.Session con pool de conexiones y las cookies de la sesión de SharePoint"""
+    pool_size = pool_size or SHAREPOINT_HTTP_SETTINGS['pool_size']
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept': 'application/json;odata=nometadata'})
+    for cookie in cookies or []:
+        session.cookies.set(cookie['name'], cookie['value'],
+                            domain=cookie.get('domain'), path=cookie.get('path', '/'))
+    return session
+
+class SharePointHttpUploader:
+    """
+    Sube archivos directamente con la API REST de SharePoint.
+
+    Archivos pequeños se envían en una sola petición (Files/add). Los grandes usan una
+    sesión de carga por partes (StartUpload / ContinueUpload / FinishUpload) sobre un
+    archivo temporal de la misma carpeta, que al terminar reemplaza al destino con MoveTo;
+    así el archivo anterior sigue intacto mientras dura la carga. El estado de la sesión se
+    guarda en disco para que el reintento del llamador (RetryPolicy) continúe desde el
+    último offset confirmado si la transferencia falla. Al terminar se comparan el tamaño y el ETag del servidor con los
+    del archivo local y la respuesta de la carga.
+    """
+
+    def __init__(self, site_url: str, session: requests.Session, chunk_size=None, state_dir=None):
+        self.site_url = site_url.rstrip('/')
+        self.session = session
+        self.chunk_size = chunk_size or SHAREPOINT_HTTP_SETTINGS['chunk_size']
+        self.state_dir = state_dir or SHAREPOINT_HTTP_SETTINGS['state_dir']
+        self.timeout = SHAREPOINT_HTTP_SETTINGS['timeout']
+        self._digest = None
+        self._digest_expires = 0
+        # Las subidas simultáneas comparten el digest
+        self._digest_lock = threading.Lock()
+
+    def _api(self, path: str) -> str:
+        return f"{self.site_url}/_api/web/{path}"
+
+    def _request_digest(self) -> str:
+        with self._digest_lock:
+            if self._digest is None or time.monotonic() >= self._digest_expires:
+                response = self.session.post(f"{self.site_url}/_api/contextinfo", timeout=self.timeout)
+                response.raise_for_status()
+                info = response.json()
+                self._digest = info['FormDigestValue']
+                self._digest_expires = time.monotonic() + info.get('FormDigestTimeoutSeconds', 1800) - 60
+            return self._digest
+
+    @staticmethod
+    def _etag(response: requests.Response):
+        """ETag del SP.File que devuelven Files/add y FinishUpload, si la respuesta lo trae"""
+        try:
+            return response.json().get('ETag')
+        except ValueError:
+            return None
+
+    def _post(self, url: str, data=b'') -> requests.Response:
+        response = self.session.post(url, data=data, timeout=self.timeout,
+                                     headers={'X-RequestDigest': self._request_digest()})
+        if response.status_code >= 400:
+            raise SharePointUploadError(f"{response.status_code} en {url}: {response.text[:200]}")
+        return response
+
+    def _state_file(self, file_path: Path, target: str) -> str:
+        digest = hashlib.sha256(f"{file_path.absolute()}|{target}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.state_dir, f"{digest}.json")
+
+    def _load_state(self, file_path: Path, target: str, stat):
+        path = self._state_file(file_path, target)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        if (state.get('size') != stat.st_size or state.get('mtime') != stat.st_mtime
+                or 'temp_name' not in state):
+            os.remove(path)
+            return None
+        return state
+
+    def _save_state(self, file_path: Path, target: str, state: dict):
+        os.makedirs(self.state_dir, exist_ok=True)
+        with open(self._state_file(file_path, target), 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+
+    def _clear_state(self, file_path: Path, target: str):
+        path = self._state_file(file_path, target)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def upload(self, file_path: Path, folder: str) -> dict:
+        """
+        Sube un archivo a la carpeta (ruta relativa al servidor) reemplazando el existente.
+
+        Returns:
+            dict: Tamaño y ETag informados por el servidor
+        """
+        size = file_path.stat().st_size
+        if size <= self.chunk_size:
+            with open(file_path, 'rb') as f:
+                response = self._post(self._api(
+                    f"GetFolderByServerRelativeUrl('{_odata_path(folder)}')"
+                    f"/Files/add(url='{_odata_path(file_path.name)}',overwrite=true)"), data=f.read())
+            etag = self._etag(response)
+        else:
+            resuming = self._load_state(file_path, f"{folder}/{file_path.name}", file_path.stat()) is not None
+            try:
+                etag = self._upload_chunked(file_path, folder)
+            except SharePointUploadError as e:
+                if not resuming:
+                    raise
+                logging.warning(f"No se pudo reanudar la subida de {file_path.name} ({e}), comenzando de nuevo")
+                self._clear_state(file_path, f"{folder}/{file_path.name}")
+                etag = self._upload_chunked(file_path, folder)
+        return self.verify(file_path, folder, etag)
+
+    def _upload_chunked(self, file_path: Path, folder: str):
+        """
+        Carga por partes sobre `<nombre>.<id>.uploading` y lo mueve sobre el destino.
+
+        Returns:
+            str: ETag informado por FinishUpload, o None si la respuesta no lo trae
+        """
+        target = f"{folder}/{file_path.name}"
+        stat = file_path.stat()
+        state = self._load_state(file_path, target, stat)
+
+        if state:
+            logging.info(f"Reanudando subida de {file_path.name} desde el byte {state['offset']}")
+        else:
+            upload_id = str(uuid.uuid4())
+            temp_name = f"{file_path.name}.{upload_id[:8]}.uploading"
+            # Archivo nuevo y vacío: el destino no se toca hasta el MoveTo final
+            self._post(self._api(
+                f"GetFolderByServerRelativeUrl('{_odata_path(folder)}')"
+                f"/Files/add(url='{_odata_path(temp_name)}',overwrite=true)"))
+            state = {'upload_id': upload_id, 'temp_name': temp_name, 'offset': 0, 'started': False,
+                     'size': stat.st_size, 'mtime': stat.st_mtime}
+        temp_target = f"{folder}/{state['temp_name']}"
+        file_url = self._api(f"GetFileByServerRelativeUrl('{_odata_path(temp_target)}')")
+        etag = state.get('etag')
+
+        with open(file_path, 'rb') as f:
+            while state['offset'] < stat.st_size:
+                f.seek(state['offset'])
+                chunk = f.read(self.chunk_size)
+                is_last = state['offset'] + len(chunk) >= stat.st_size
+                upload_id = f"guid'{state['upload_id']}'"
+                if not state['started']:
+                    action = f"StartUpload(uploadId={upload_id})"
+                elif is_last:
+                    action = f"FinishUpload(uploadId={upload_id},fileOffset={state['offset']})"
+                else:
+                    action = f"ContinueUpload(uploadId={upload_id},fileOffset={state['offset']})"
+
+                response = self._post(f"{file_url}/{action}", data=chunk)
+                state['started'] = True
+                state['offset'] += len(chunk)
+                if is_last:
+                    etag = state['etag'] = self._etag(response)
+                self._save_state(file_path, target, state)
+
+        self._post(f"{file_url}/MoveTo(newurl='{_odata_path(target)}',flags=1)")
+        self._clear_state(file_path, target)
+        return etag
+
+    def verify(self, file_path: Path, folder: str, expected_etag=None) -> dict:
+        """
+        Compara el tamaño local con el informado por el servidor y, si se indica
+        `expected_etag` (el de la respuesta de la carga), que el ETag del archivo coincida;
+        uno distinto significa que otra escritura lo reemplazó después de la nuestra.
+        """
+        target = f"{folder}/{file_path.name}"
+        response = self.session.get(
+            self._api(f"GetFileByServerRelativeUrl('{_odata_path(target)}')?$select=Length,ETag"),
+            timeout=self.timeout)
+        response.raise_for_status()
+        info = response.json()
+        remote_size = int(info['Length'])
+        local_size = file_path.stat().st_size
+        if remote_size != local_size:
+            raise SharePointUploadError(
+                f"Tamaño en SharePoint ({remote_size}) distinto al local ({local_size}) para {file_path.name}")
+        etag = info.get('ETag')
+        if expected_etag and etag != expected_etag:
+            raise SharePointUploadError(
+                f"ETag en SharePoint ({etag}) distinto al de la carga ({expected_etag}) para {file_path.name}")
+        return {'size': remote_size, 'etag': etag}
@@ -1,133 +1,75 @@
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
+# selenium, adaptive_wait y driver_pool se importan en los métodos del navegador para que
+# la subida por HTTP no los cargue
+from __future__ import annotations
 import os
+from typing import TYPE_CHECKING
 from pathlib import Path
 import logging
-import time
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from session_manager import SessionManager
+from manifest import FileManifest
+from sharepoint_http import SharePointHttpUploader, build_http_session, folder_from_url
+from stores import get_store_types, get_store_csv_path, get_rollup_paths
+from config import ROLLUP_SETTINGS, SHAREPOINT_UPLOAD_SETTINGS
+import tracing
+from bot_logging import setup_logging, capture_failure
+from retry import RetryPolicy, AuthError
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+    from selenium.webdriver.support.ui import WebDriverWait
+
+UPLOAD_PROGRESS_XPATH = "//*[@role='progressbar']"
 
 @dataclass
 class SharePointConfig:
     email: str
     password: str
     base_url: str
-    mayorca_folder_url: str
-    monteria_folder_url: str
+    folder_urls: dict = field(default_factory=dict)
+    upload_backend: str = 'http'
 
 class SharePointUploader:
-    def __init__(self, config: SharePointConfig):
+    def __init__(self, config: SharePointConfig, pool=None):
         self.config = config
+        self._pool = pool
+        self._uses_shared_pool = pool is None
+        self.sessions = SessionManager()
         self.setup_logging()
+
+    @property
+    def pool(self):
+        """Pool de drivers; el común se crea recién cuando una subida necesita el navegador"""
+        if self._pool is None:
+            from driver_pool import get_shared_pool
+            self._pool = get_shared_pool()
+        return self._pool
+
+    def close(self):
+        """Cierra los navegadores del pool común si alguna subida llegó a usarlo"""
+        if self._uses_shared_pool and self._pool is not None:
+            from driver_pool import shutdown_shared_pool
+            shutdown_shared_pool()
+            self._pool = None
     
     def setup_logging(self):
         """Configura el sistema de logging"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('sharepoint_upload.log'),
-                logging.StreamHandler()
-            ]
-        )
+        setup_logging()
         self.logger = logging.getLogger(__name__)
 
-        def handle_replace_dialog(self, driver: webdriver.Firefox, wait: WebDriverWait):
-            """Maneja el diálogo de reemplazo de archivo si aparece"""
-            try:
-                
-                replace_dialog = wait.until(EC.presence_of_element_located(
-                    (By.XPATH, "//div[contains(@role, 'dialog') and contains(.//span, 'replace')]")
-                ))
-            
-          
-                replace_button = wait.until(EC.element_to_be_clickable(
-                    (By.XPATH, "//button[contains(.//span, 'Replace') or contains(.//span, 'Reemplazar')]")
-                ))
-            
-          
-                try:
-                    replace_button.click()
-                except:
-                    driver.execute_script("arguments[0].click();", replace_button)
-                
-                self.logger.info("Archivo existente reemplazado exitosamente")
-                return True
-            
-            except TimeoutException:
-             
-                return True
-            except Exception as e:
-                self.logger.error(f"Error manejando el diálogo de reemplazo: {str(e)}")
-                return False
-
-    def upload_file_to_folder(self, driver: webdriver.Firefox, wait: WebDriverWait, 
-                            folder_url: str, file_path: Path) -> bool:
-        """Sube un archivo a una carpeta específica de SharePoint"""
-        try:
-            driver.get(folder_url)
-            time.sleep(5)
-            
-            upload_button = wait.until(EC.presence_of_element_located(
-                (By.XPATH, "//span[contains(text(), 'Cargar') or contains(text(), 'Upload')]")))
-            
-            driver.execute_script("arguments[0].scrollIntoView(true);", upload_button)
-            time.sleep(2)
-            
-            try:
-                upload_button.click()
-            except:
-                driver.execute_script("arguments[0].click();", upload_button)
-
-            files_button = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//span[contains(text(), 'Archivos') or contains(text(), 'Files')]")))
-            
-            try:
-                files_button.click()
-            except:
-                driver.execute_script("arguments[0].click();", files_button)
-
-            file_input = wait.until(EC.presence_of_element_located(
-                (By.XPATH, "//input[@type='file']")))
-            
-            file_input.send_keys(str(file_path.absolute()))
-            
-
-            time.sleep(5)
-            
-
-            if not self.handle_replace_dialog(driver, wait):
-                return False
-            
-     
-            time.sleep(10)
-            
-            try:
-                wait.until(EC.presence_of_element_located(
-                    (By.XPATH, f"//*[contains(text(), '{file_path.name}')]")))
-            except TimeoutException:
-                self.logger.warning(f"No se pudo verificar la subida de {file_path.name}, pero el proceso terminó sin errores")
-            
-            self.logger.info(f"Archivo {file_path.name} subido exitosamente a {folder_url}")
-            return True
-
-        except Exception as e:
-            self.logger.error(f"Error subiendo archivo {file_path}: {str(e)}")
-            driver.save_screenshot(f"error_upload_{file_path.name.replace('.', '_')}.png")
-            return False
+    def login_to_sharepoint(self, driver: webdriver.Firefox, wait: WebDriverWait):
+        """
+        Maneja el proceso de login a SharePoint.
 
-    def setup_driver(self):
-        """Configura el driver de Firefox para la subida de archivos"""
-        options = Options()
-        options.set_preference("browser.download.folderList", 2)
-        options.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/octet-stream")
-        return webdriver.Firefox(options=options)
+        Raises:
+            AuthError: Si Microsoft rechaza la contraseña
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        from adaptive_wait import AdaptiveWaiter
 
-    def login_to_sharepoint(self, driver: webdriver.Firefox, wait: WebDriverWait):
-        """Maneja el proceso de login a SharePoint"""
         try:
             driver.get("https://login.microsoftonline.com")
             
@@ -147,29 +89,44 @@ class SharePointUploader:
             password_elem.send_keys(self.config.password)
             
 
-            for _ in range(2):
-                wait.until(EC.element_to_be_clickable((By.ID, "idSIButton9"))).click()
-                time.sleep(1)
+            waiter = AdaptiveWaiter(driver)
+            for step in ("SharePoint sign in", "SharePoint stay signed in"):
+                button = wait.until(EC.element_to_be_clickable((By.ID, "idSIButton9")))
+                button.click()
+                try:
+                    waiter.until(step, EC.staleness_of(button), max_timeout=10, min_timeout=1)
+                except TimeoutException:
+                    self.logger.info(f"{step}: la página no cambió, continuando")
+                if driver.find_elements(By.ID, "passwordError"):
+                    raise AuthError("Microsoft rechazó la contraseña de SharePoint")
 
             return True
         except Exception as e:
             self.logger.error(f"Error en login: {str(e)}")
-            driver.save_screenshot("login_error.png")
-            return False
+            capture_failure(driver, "login_error")
+            raise
 
     def upload_file_to_folder(self, driver: webdriver.Firefox, wait: WebDriverWait, 
                             folder_url: str, file_path: Path) -> bool:
-        """Sube un archivo a una carpeta específica de SharePoint"""
+        """
+        Sube un archivo a una carpeta específica de SharePoint.
+
+        Raises:
+            La excepción del paso que falló, para que la política de reintentos la clasifique
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException
+        from adaptive_wait import AdaptiveWaiter
+
         try:
-           
+            waiter = AdaptiveWaiter(driver)
             driver.get(folder_url)
-            time.sleep(5)  
-            upload_button = wait.until(EC.presence_of_element_located(
-                (By.XPATH, "//span[contains(text(), 'Cargar') or contains(text(), 'Upload')]")))
+            upload_button = waiter.until("SharePoint library loaded", EC.element_to_be_clickable(
+                (By.XPATH, "//span[contains(text(), 'Cargar') or contains(text(), 'Upload')]")), max_timeout=30)
             
    
             driver.execute_script("arguments[0].scrollIntoView(true);", upload_button)
-            time.sleep(2) 
             
 
             try:
@@ -191,11 +148,17 @@ class SharePointUploader:
 
             file_input.send_keys(str(file_path.absolute()))
 
-            time.sleep(10)
+            try:
+                waiter.until("SharePoint upload started", EC.presence_of_element_located(
+                    (By.XPATH, UPLOAD_PROGRESS_XPATH)), max_timeout=3, min_timeout=1)
+            except TimeoutException:
+                pass
             
             try:
-                wait.until(EC.presence_of_element_located(
-                    (By.XPATH, f"//*[contains(text(), '{file_path.name}')]")))
+                waiter.until("SharePoint upload finished", EC.all_of(
+                    EC.invisibility_of_element_located((By.XPATH, UPLOAD_PROGRESS_XPATH)),
+                    EC.presence_of_element_located((By.XPATH, f"//*[contains(text(), '{file_path.name}')]"))
+                ), max_timeout=120)
             except TimeoutException:
                 self.logger.warning(f"No se pudo verificar la subida de {file_path.name}, pero el proceso terminó sin errores")
             
@@ -204,53 +167,180 @@ class SharePointUploader:
 
         except Exception as e:
             self.logger.error(f"Error subiendo archivo {file_path}: {str(e)}")
-            driver.save_screenshot(f"error_upload_{file_path.name.replace('.', '_')}.png")
-            return False
+            capture_failure(driver, f"error_upload_{file_path.name}")
+            raise
 
-    def upload_files(self, max_retries=3):
-        """Proceso principal de subida de archivos con reintentos"""
-        driver = None
-        try:
-            driver = self.setup_driver()
-            wait = WebDriverWait(driver, 30)
-
-            for attempt in range(max_retries):
-                if self.login_to_sharepoint(driver, wait):
-                    break
-                if attempt < max_retries - 1:
-                    self.logger.warning(f"Reintento {attempt + 1} de login...")
-                    time.sleep(5)
-                else:
-                    raise Exception("Fallo en el login a SharePoint después de todos los reintentos")
-            
-            def upload_with_retry(file_path: Path, folder_url: str):
-                for attempt in range(max_retries):
-                    if self.upload_file_to_folder(driver, wait, folder_url, file_path):
-                        return True
-                    elif attempt < max_retries - 1:
-                        self.logger.warning(f"Reintento {attempt + 1} de subida para {file_path}...")
-                        time.sleep(5)
-                return False
-
-            mayorca_file = Path("Mayorca/2025.csv")
-            if mayorca_file.exists():
-                if not upload_with_retry(mayorca_file, self.config.mayorca_folder_url):
-                    self.logger.error(f"Falló la subida de {mayorca_file} después de {max_retries} intentos")
-            else:
-                self.logger.error(f"Archivo no encontrado: {mayorca_file}")
+    def ensure_logged_in(self, driver: webdriver.Firefox, wait: WebDriverWait, max_retries=3):
+        """Restaura la sesión guardada de SharePoint o hace login si expiró"""
+        session_key = f"sharepoint:{self.config.email}"
+        with self.sessions.account_lock(session_key):
+            with tracing.span('session_restore', service='sharepoint'):
+                if self.sessions.restore_if_valid(driver, session_key, self.config.base_url):
+                    return
+
+            with tracing.span('login', service='sharepoint'):
+                policy = RetryPolicy("Login SharePoint", service='sharepoint', max_attempts=max_retries)
+                policy.call(self.login_to_sharepoint, driver, wait)
+                # Visitar el sitio emite las cookies de SharePoint (FedAuth/rtFa)
+                driver.get(self.config.base_url)
+                self.sessions.save(driver, session_key)
+
+    def get_upload_targets(self, files=None):
+        """
+        Archivos locales y la carpeta de SharePoint a la que se suben, por tienda. Por
+        defecto el CSV del año abierto y sus resúmenes, que van a la misma carpeta; con
+        `files`, esos archivos en la carpeta de la tienda que los contiene (p. ej. el CSV de
+        un año que se cierra).
+        """
+        targets = []
+        for store_type in get_store_types():
+            folder_url = self.config.folder_urls.get(store_type)
+            if not folder_url:
+                continue
+            csv_file = get_store_csv_path(store_type)
+            if files is not None:
+                targets.extend((Path(file_path), folder_url) for file_path in files
+                               if Path(file_path).parent == csv_file.parent)
+                continue
+            targets.append((csv_file, folder_url))
+            if ROLLUP_SETTINGS['enabled']:
+                targets.extend((rollup_file, folder_url) for rollup_file in get_rollup_paths(csv_file).values())
+        return targets
+
+    def get_max_workers(self):
+        """Límite de subidas simultáneas (variable de entorno o config)"""
+        return int(os.getenv('SHAREPOINT_MAX_CONCURRENT_UPLOADS',
+                             SHAREPOINT_UPLOAD_SETTINGS['max_concurrent_uploads']))
+
+    def run_uploads(self, targets, upload, backend):
+        """
+        Sube los archivos a sus carpetas en paralelo, hasta `get_max_workers()` a la vez.
+        Cada archivo se reintenta por su cuenta dentro de `upload`, así que el tiempo total
+        se acerca al del archivo más lento y no a la suma.
 
-            monteria_file = Path("Monteria/2025.csv")
-            if monteria_file.exists():
-                if not upload_with_retry(monteria_file, self.config.monteria_folder_url):
-                    self.logger.error(f"Falló la subida de {monteria_file} después de {max_retries} intentos")
+        Args:
+            targets (list): Pares (archivo, carpeta)
+            upload (callable): Sube un archivo a su carpeta o lanza la excepción final
+            backend (str): 'http' o 'selenium', para los logs
+        Returns:
+            list: Pares (archivo, carpeta) que no se pudieron subir
+        """
+        failed = []
+        max_workers = max(1, min(self.get_max_workers(), len(targets)))
+        self.logger.info(f"Subiendo {len(targets)} archivos por {backend} con hasta {max_workers} a la vez")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"upload-{backend}") as executor:
+            futures = {executor.submit(tracing.bind(upload), file_path, folder_url): (file_path, folder_url)
+                       for file_path, folder_url in targets}
+            for future in as_completed(futures):
+                file_path, folder_url = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    self.logger.error(f"Subida {backend} de {file_path} a {folder_url} falló: {str(e)}")
+                    failed.append((file_path, folder_url))
+                    continue
+                self.record_upload(file_path, folder_url)
+        # Mismo orden que los destinos para que los logs y reintentos sean predecibles
+        return sorted(failed, key=targets.index)
+
+    def upload_files_http(self, targets, max_retries=3):
+        """
+        Sube los archivos con la API REST de SharePoint usando la sesión guardada. Las
+        subidas simultáneas comparten la sesión HTTP y su pool de conexiones.
+
+        Returns:
+            list: Archivos que no se pudieron subir por HTTP
+        """
+        session_key = f"sharepoint:{self.config.email}"
+        cookies = self.sessions.load_cookies(session_key)
+        if not self.sessions.is_valid(session_key, self.config.base_url, cookies):
+            self.logger.info("Sin sesión HTTP válida para SharePoint, se usará el navegador")
+            return targets
+
+        policy = RetryPolicy("Subida HTTP", service='sharepoint', max_attempts=max_retries)
+        with build_http_session(cookies) as session:
+            uploader = SharePointHttpUploader(self.config.base_url, session)
+
+            def upload(file_path, folder_url):
+                with tracing.span('upload_attempt', backend='http', file=str(file_path)):
+                    result = uploader.upload(file_path, folder_from_url(folder_url))
+                    tracing.count('bytes_uploaded', result['size'])
+                return result
+
+            def upload_with_retry(file_path, folder_url):
+                result = policy.call(upload, file_path, folder_url)
+                self.logger.info(f"Archivo {file_path.name} subido por HTTP a {folder_url} "
+                                 f"({result['size']} bytes, ETag {result['etag']})")
+
+            return self.run_uploads(targets, upload_with_retry, 'http')
+
+    def record_upload(self, file_path: Path, folder_url: str):
+        """Registra en el manifiesto el contenido subido a la carpeta"""
+        FileManifest.shared().record('upload', f"{file_path}|{folder_url}", file_path)
+
+    def upload_files(self, max_retries=3, force=False, files=None):
+        """
+        Proceso principal de subida de archivos con reintentos. Los archivos cuyo contenido
+        ya se subió a la misma carpeta se omiten, salvo que se indique `force`.
+
+        Args:
+            files (list): Subir solo estos archivos, por defecto todos
+        Returns:
+            list: Archivos que no se pudieron subir
+        """
+        manifest = FileManifest.shared()
+        targets = []
+        failed = []
+        for file_path, folder_url in self.get_upload_targets(files):
+            if not file_path.exists():
+                self.logger.error(f"Archivo no encontrado: {file_path}")
+                failed.append(file_path)
+            elif not force and manifest.is_unchanged('upload', f"{file_path}|{folder_url}", file_path):
+                self.logger.info(f"{file_path} no cambió desde la última subida a {folder_url}, se omite")
             else:
-                self.logger.error(f"Archivo no encontrado: {monteria_file}")
+                targets.append((file_path, folder_url))
 
-        except Exception as e:
-            self.logger.error(f"Error en el proceso de subida: {str(e)}")
-            if driver:
-                driver.save_screenshot("error_upload.png")
-            raise
+        if targets and self.config.upload_backend == 'http':
+            targets = self.upload_files_http(targets, max_retries)
+            if targets:
+                self.logger.warning(f"Subiendo con el navegador: {', '.join(str(f) for f, _ in targets)}")
+
+        if targets:
+            failed.extend(self.upload_files_selenium(targets, max_retries))
+        return failed
+
+    def upload_files_selenium(self, targets, max_retries=3):
+        """
+        Sube los archivos a través de la interfaz web de SharePoint. Cada subida toma su
+        propio driver del pool; el primero inicia sesión y los demás restauran esa misma
+        sesión guardada en vez de volver a autenticarse.
+
+        Returns:
+            list: Archivos que no se pudieron subir
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+        from adaptive_wait import WaitStats
+
+        policy = RetryPolicy("Subida SharePoint", service='sharepoint', max_attempts=max_retries)
+
+        def upload_with_retry(file_path: Path, folder_url: str):
+            with self.pool.acquire() as driver:
+                wait = WebDriverWait(driver, 30)
+                try:
+                    self.ensure_logged_in(driver, wait, max_retries)
+                except Exception:
+                    capture_failure(driver, "error_upload")
+                    raise
+
+                def upload():
+                    with tracing.span('upload_attempt', backend='selenium', file=str(file_path)):
+                        self.upload_file_to_folder(driver, wait, folder_url, file_path)
+                        tracing.count('bytes_uploaded', file_path.stat().st_size)
+
+                policy.call(upload)
+
+        try:
+            failed = self.run_uploads(targets, upload_with_retry, 'selenium')
         finally:
-            if driver:
-                driver.quit()
\ No newline at end of file
+            WaitStats.shared().save()
+        return [file_path for file_path, _ in failed]
\ No newline at end of file
@@ -0,0 +1,161 @@
+import csv
+import logging
+import os
+import tempfile
+import requests
+from requests.adapters import HTTPAdapter
+from config import SHOPIFY_API_SETTINGS, DAY_COLUMN
+from query_sharding import ShardPlanner
+
+SHOPIFYQL_QUERY = """
+query ($query: String!) {
+  shopifyqlQuery(query: $query) {
+    __typename
+    ... on TableResponse {
+      tableData {
+        columns { name dataType displayName }
+        rowData
+      }
+    }
+    parseErrors { code message }
+  }
+}
+"""
+
+class ShopifyAPIError(Exception):
+    """Error de la API; `status` y `retry_after` (segundos) los usan retry.classify y RetryPolicy"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def _retry_after(response):
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+class ShopifyQLClient:
+    """
+    Cliente HTTP de la Admin API (GraphQL) para ejecutar consultas ShopifyQL.
+
+    Reutiliza conexiones con un requests.Session. Cada consulta se intenta una sola vez:
+    las respuestas 429 y 5xx y los errores THROTTLED se lanzan como ShopifyAPIError con la
+    espera que pide Shopify (Retry-After o el throttleStatus), y el RetryPolicy del
+    llamador decide si reintentar.
+    """
+
+    def __init__(self, shop_domain, access_token, api_version=None, endpoint=None, session=None):
+        api_version = api_version or SHOPIFY_API_SETTINGS['api_version']
+        self.endpoint = endpoint or f"https://{shop_domain}/admin/api/{api_version}/graphql.json"
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=SHOPIFY_API_SETTINGS['pool_size'])
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'X-Shopify-Access-Token': access_token,
+            'Content-Type': 'application/json'
+        })
+        self.timeout = SHOPIFY_API_SETTINGS['timeout']
+
+    def close(self):
+        self.session.close()
+
+    @staticmethod
+    def _throttle_delay(payload):
+        """Segundos hasta que el bucket de costo de la API vuelva a cubrir la consulta"""
+        cost = payload.get('extensions', {}).get('cost', {})
+        status = cost.get('throttleStatus', {})
+        restore_rate = status.get('restoreRate') or 50
+        missing = cost.get('requestedQueryCost', restore_rate) - status.get('currentlyAvailable', 0)
+        return max(missing / restore_rate, 0)
+
+    def execute(self, query):
+        """
+        Ejecuta una consulta ShopifyQL.
+
+        Returns:
+            tuple: (nombres de columnas para el CSV, lista de filas)
+        Raises:
+            ShopifyAPIError: Si la API responde con error o limita la consulta (429/THROTTLED)
+            requests.RequestException: Si la petición no llega a la API
+        """
+        response = self.session.post(self.endpoint, json={
+            'query': SHOPIFYQL_QUERY, 'variables': {'query': query}}, timeout=self.timeout)
+        if response.status_code >= 400:
+            raise ShopifyAPIError(f"API de Shopify respondió {response.status_code}: {response.text[:200]}",
+                                  status=response.status_code, retry_after=_retry_after(response))
+
+        payload = response.json()
+        errors = payload.get('errors') or []
+        if any(error.get('extensions', {}).get('code') == 'THROTTLED' for error in errors):
+            # Equivale a un 429 de la API GraphQL
+            raise ShopifyAPIError("API de Shopify limitada (THROTTLED)", status=429,
+                                  retry_after=self._throttle_delay(payload))
+        if errors:
+            raise ShopifyAPIError(f"Errores de la API de Shopify: {errors}")
+
+        result = payload['data']['shopifyqlQuery']
+        if result.get('parseErrors'):
+            raise ShopifyAPIError(f"Error en la consulta ShopifyQL: {result['parseErrors']}")
+        table = result['tableData']
+        columns = [column.get('displayName') or column['name'] for column in table['columns']]
+        return columns, table['rowData']
+
+def export_query_to_csv(client, build_query, since, until, output_path, key_columns, limit):
+    """
+    Exporta el rango SINCE/UNTIL a un CSV paginando por ventanas de fecha: cada ventana que
+    devuelve el LIMIT se subdivide (mes, semana, día). Como en concat_csv_files, las filas
+    se deduplican por clave conservando la última aparición y se descartan las que no tienen
+    día (la línea de TOTALS de cada ventana). Se escriben a un temporal que reemplaza
+    atómicamente al destino.
+
+    Args:
+        client (ShopifyQLClient): Cliente de la API
+        build_query (callable): Función (since, until) -> consulta ShopifyQL
+        since (date): Primer día
+        until (date): Último día
+        output_path (str): CSV de destino
+        key_columns (list): Columnas que identifican una fila de negocio
+        limit (int): LIMIT de la consulta
+    Returns:
+        int: Filas escritas
+    Raises:
+        TruncatedExportError: Si una ventana de un día alcanza el LIMIT
+    """
+    planner = ShardPlanner(since, until, limit)
+    folder = os.path.dirname(output_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.csv.tmp')
+    header = None
+    rows_by_key = {}
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as out:
+            while planner.has_pending():
+                window = planner.next_batch(1)[0]
+                columns, rows = client.execute(build_query(window[0], window[1]))
+                day_index = columns.index(DAY_COLUMN)
+                data_rows = [row for row in rows if row[day_index] not in (None, '')]
+                if not planner.report(window, None, len(data_rows)):
+                    continue
+
+                if header is None:
+                    header = columns
+                    key_indexes = [header.index(column) for column in key_columns]
+                elif columns != header:
+                    raise ShopifyAPIError("Las columnas de la API cambiaron entre ventanas")
+                for row in data_rows:
+                    rows_by_key[tuple(row[i] for i in key_indexes)] = row
+
+            writer = csv.writer(out)
+            if header is not None:
+                writer.writerow(header)
+                writer.writerows(rows_by_key.values())
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    logging.info(f"Export por API completado en {output_path}: {len(rows_by_key)} filas")
+    return len(rows_by_key)
@@ -1,5 +1,3 @@
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -8,17 +6,41 @@ from selenium.webdriver.common.keys import Keys
 import os
 import dotenv
 import logging
-import time
-from datetime import datetime
+from datetime import datetime, date, timedelta
 from urllib.parse import quote
-from config import STORE_CONFIGS
+from session_manager import SessionManager
+from driver_pool import get_shared_pool
+from config import STORE_CONFIGS, EXPORT_SETTINGS, VALIDATION_SETTINGS, DAY_COLUMN, DEDUP_KEY_COLUMNS
+from stores import get_open_year, get_store_csv_path, get_year_window, has_closed_days
+from incremental_export import WatermarkStore, get_incremental_since, merge_incremental_csv
+from adaptive_wait import AdaptiveWaiter, WaitStats, page_ready, network_idle
+from download_watcher import DownloadWatcher, move_download
+from manifest import FileManifest, file_sha256
+from shopify_api import ShopifyQLClient, export_query_to_csv
+from query_sharding import ShardPlanner, concat_csv_files, count_csv_rows
+import tracing
+from bot_logging import setup_logging, capture_failure
+from retry import RetryPolicy, AuthError, ElementMissingError, DownloadMissingError
 
 class ShopifyAutomation:
-    def __init__(self, store_type):
+    MORE_ACTIONS_XPATH = "//button[contains(@class, '_Button_1yxn0_1') and .//shopify-internal-icon[@type='menu-horizontal']]"
+
+    def __init__(self, store_type, incremental=None, pool=None, year=None):
         if store_type not in STORE_CONFIGS:
             raise ValueError(f"Store type must be one of {list(STORE_CONFIGS.keys())}")
         
+        self.store_type = store_type
         self.store_config = STORE_CONFIGS[store_type]
+        # Año que se exporta: el abierto, o uno cerrado que se completa antes de archivarlo
+        self.year = year or get_open_year()
+        self.output_file = get_store_csv_path(store_type, self.year).name
+        self.incremental = EXPORT_SETTINGS['incremental'] if incremental is None else incremental
+        self.watermarks = WatermarkStore(EXPORT_SETTINGS['watermark_file'])
+        self.export_window = None
+        self.waiter = None
+        self.sessions = SessionManager()
+        self.pool = pool or get_shared_pool()
+        self.step_policy = RetryPolicy("Selenium step", max_attempts=3)
         self.setup_folders()
         self.setup_logging()
         dotenv.load_dotenv()
@@ -27,26 +49,34 @@ class ShopifyAutomation:
         """Crea la estructura de carpetas necesaria"""
         self.store_folder = os.path.join(os.getcwd(), self.store_config['folder_name'])
         if not os.path.exists(self.store_folder):
-            os.makedirs(self.store_folder)
+            os.makedirs(self.store_folder, exist_ok=True)
             logging.info(f"Created folder: {self.store_folder}")
 
         
 
     def setup_logging(self):
         """Configura el sistema de logging para la automatización"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('shopify_automation.log'),
-                logging.StreamHandler()
-            ]
-        )
-
-    def get_shopify_url(self):
-        """Genera la URL de Shopify con los parámetros de consulta necesarios"""
-        start_date = "2024-12-01"
-        end_date = datetime.now().strftime('%Y-%m-%d')
+        setup_logging()
+
+    def get_export_window(self):
+        """Calcula el rango SINCE/UNTIL dentro del año exportado y si la exportación es incremental"""
+        default_start, until = get_year_window(self.year)
+        output_path = os.path.join(self.store_folder, self.output_file)
+        watermark = self.watermarks.get(self.store_type, self.year) if self.incremental else None
+
+        if watermark is None or not os.path.exists(output_path):
+            return default_start, until, False
+
+        since = get_incremental_since(watermark, EXPORT_SETTINGS['overlap_days'], default_start)
+        return since, until, True
+
+    def build_query(self, since=None, until=None, visualize=None):
+        """
+        Genera la consulta ShopifyQL de ventas para el rango indicado. El gráfico
+        (VISUALIZE) solo se agrega si EXPORT_SETTINGS['visualize'] lo pide.
+        """
+        start_date = (since or date.fromisoformat(EXPORT_SETTINGS['start_date'])).isoformat()
+        end_date = (until or datetime.now().date()).isoformat()
         
         query = f"""FROM sales
 SHOW quantity_ordered, gross_sales, discounts, total_sales, net_sales
@@ -57,186 +87,328 @@ HAVING quantity_ordered != 0
 SINCE {start_date}
 UNTIL {end_date}
 ORDER BY day ASC
-LIMIT 1000
-VISUALIZE total_sales TYPE line"""
-        
-        encoded_query = quote(query)
+LIMIT {EXPORT_SETTINGS['query_limit']}"""
+        if EXPORT_SETTINGS['visualize'] if visualize is None else visualize:
+            query += "\nVISUALIZE total_sales TYPE line"
+        return query
+
+    def get_shopify_url(self, since=None, until=None, visualize=None):
+        """Genera la URL de Shopify con los parámetros de consulta necesarios"""
+        encoded_query = quote(self.build_query(since, until, visualize))
         return f"{self.store_config['base_url']}?ql={encoded_query}"
 
-    def setup_firefox_driver(self):
-        """Configura y retorna una instancia del driver de Firefox con las opciones necesarias"""
-        firefox_options = Options()
-        firefox_options.set_preference("browser.download.folderList", 2)
-        firefox_options.set_preference("browser.download.dir", self.store_folder) 
-        firefox_options.set_preference("browser.download.useDownloadDir", True)
-        firefox_options.set_preference("browser.helperApps.neverAsk.saveToDisk", "application/csv,text/csv")
-        firefox_options.set_preference("browser.download.manager.showWhenStarting", False)
-        firefox_options.set_preference("browser.download.manager.focusWhenStarting", False)
-        firefox_options.set_preference("browser.download.manager.closeWhenDone", True)
-        
-        firefox_options.set_preference("browser.download.manager.alertOnEXEOpen", False)
-        firefox_options.set_preference("browser.download.manager.useWindow", False)
-        firefox_options.set_preference("browser.download.manager.addToRecentDocs", False)
-        firefox_options.set_preference("browser.download.always_ask_before_handling_new_types", False)
-
-        firefox_options.set_preference("browser.download.lastDir", self.store_folder)
-        firefox_options.set_preference("browser.download.defaultFolder", self.store_folder)
-        firefox_options.set_preference("browser.download.manager.defaultFileName", self.store_config['output_file'])
-        
-        return webdriver.Firefox(options=firefox_options)
+    def get_waiter(self, driver):
+        """Retorna el AdaptiveWaiter asociado al driver actual"""
+        if self.waiter is None or self.waiter.driver is not driver:
+            self.waiter = AdaptiveWaiter(driver)
+        return self.waiter
 
     def wait_and_click(self, driver, wait, xpath, message, timeout=5):
-        """Espera a que un elemento sea clickeable y lo clickea"""
-        max_attempts = 3
-        for attempt in range(max_attempts):
+        """Espera a que un elemento sea clickeable, lo clickea y espera a que la página se estabilice"""
+        waiter = self.get_waiter(driver)
+
+        def click():
+            element = waiter.until(message, EC.element_to_be_clickable((By.XPATH, xpath)), max_timeout=20)
+            driver.execute_script("arguments[0].scrollIntoView(true);", element)
+            driver.execute_script("arguments[0].click();", element)
+            try:
+                waiter.until(f"{message} settle", network_idle(), max_timeout=timeout, min_timeout=1)
+            except TimeoutException:
+                logging.info(f"{message}: la página siguió con actividad de red, continuando")
+
+        with tracing.span('selenium_step', step=message, store=self.store_type) as step_span:
+            logging.info(message)
             try:
-                logging.info(f"{message} (Attempt {attempt + 1}/{max_attempts})")
-                element = wait.until(EC.element_to_be_clickable((By.XPATH, xpath)))
-                driver.execute_script("arguments[0].scrollIntoView(true);", element)
-                time.sleep(1)
-                driver.execute_script("arguments[0].click();", element)
-                time.sleep(timeout)
+                self.step_policy.call(click)
                 return True
             except Exception as e:
-                if attempt == max_attempts - 1:
-                    logging.error(f"Failed to {message.lower()}: {str(e)}")
-                    driver.save_screenshot(f"error_{message.lower().replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
-                    return False
-                time.sleep(2)
-        return False
-
-    def rename_downloaded_file(self):
-        """Renombra el archivo descargado al nombre deseado"""
-        max_attempts = 10
-        attempt = 0
-        while attempt < max_attempts:
-            time.sleep(2)
-            for filename in os.listdir(self.store_folder):
-                if filename.endswith('.csv') and filename != self.store_config['output_file']:
+                logging.error(f"Failed to {message.lower()}: {str(e)}")
+                capture_failure(driver, f"error_{message.lower()}")
+                step_span.status = 'failed'
+                return False
+
+    def get_download_file_name(self):
+        """Nombre temporal de la descarga antes de compararla y combinarla con el CSV de la tienda"""
+        return f"_download_{self.output_file}"
+
+    def rename_downloaded_file(self, watcher, target_name=None):
+        """Espera a que termine la descarga detectada por el watcher y la renombra al nombre deseado"""
+        target_name = target_name or self.output_file
+        downloaded_path = watcher.wait_for_download(EXPORT_SETTINGS['download_timeout'])
+        if downloaded_path is None:
+            logging.error(f"No se detectó ninguna descarga en {self.store_folder} después de {EXPORT_SETTINGS['download_timeout']}s")
+            return False
+
+        try:
+            move_download(downloaded_path, os.path.join(self.store_folder, target_name))
+            logging.info(f"Archivo {os.path.basename(downloaded_path)} renombrado exitosamente a {target_name} en {self.store_folder}")
+            return True
+        except Exception as e:
+            logging.error(f"Error al renombrar archivo: {e}")
+            return False
+
+    def export_current_report(self, driver, wait, target_name=None):
+        """Exporta a CSV el reporte abierto en la pestaña actual y renombra la descarga"""
+        try:
+            waiter = self.get_waiter(driver)
+            waiter.until("Report loaded", EC.all_of(
+                page_ready, EC.element_to_be_clickable((By.XPATH, self.MORE_ACTIONS_XPATH))), max_timeout=30)
+            if not self.wait_and_click(driver, wait, self.MORE_ACTIONS_XPATH, "Clicking more actions button"):
+                raise ElementMissingError("Failed to click more actions button")
+            export_button_xpath = "//button[contains(., 'Export')]"
+            if not self.wait_and_click(driver, wait, export_button_xpath, "Clicking Export button"):
+                raise ElementMissingError("Failed to click Export button")
+            
+            try:
+                csv_radio = waiter.until("Export dialog open", EC.presence_of_element_located(
+                    (By.XPATH, "//input[@type='radio' and @value='csv']")), max_timeout=20)
+                if not csv_radio.is_selected():
+                    csv_radio.click()
+                    waiter.until("CSV option selected", lambda d: csv_radio.is_selected(), max_timeout=5, min_timeout=1)
+            except Exception as e:
+                logging.error(f"Error selecting CSV option: {e}")
+                capture_failure(driver, "csv_selection_error")
+                raise
+
+            export_final_button = "//button[contains(., 'Export')]"
+            with DownloadWatcher(self.store_folder) as watcher:
+                if not self.wait_and_click(driver, wait, export_final_button, "Clicking final Export button"):
+                    raise ElementMissingError("Failed to click final Export button")
+                
+                if not self.rename_downloaded_file(watcher, target_name):
+                    raise DownloadMissingError("No se pudo completar el proceso de renombrado del archivo")
+                
+            return True
+            
+        except Exception as e:
+            logging.error(f"Error clicking more actions button: {e}")
+            capture_failure(driver, "more_actions_error")
+            raise
+
+    def export_sharded(self, driver, wait, since, until, target_name):
+        """
+        Exporta el rango en ventanas de fecha que se subdividen (mes, semana, día) cuando
+        alcanzan el LIMIT de la consulta. Hasta `max_parallel_tabs` ventanas se cargan a la
+        vez en pestañas distintas y luego se exportan una por una.
+        """
+        planner = ShardPlanner(since, until, EXPORT_SETTINGS['query_limit'])
+        max_tabs = max(1, EXPORT_SETTINGS['max_parallel_tabs'])
+        main_handle = driver.current_window_handle
+        shard_files = []
+
+        try:
+            while planner.has_pending():
+                batch = planner.next_batch(max_tabs)
+                tabs = []
+                for window in batch:
+                    driver.switch_to.window(main_handle)
+                    known_handles = set(driver.window_handles)
+                    driver.execute_script("window.open(arguments[0], '_blank');",
+                                          self.get_shopify_url(window[0], window[1]))
+                    new_handle = next(h for h in driver.window_handles if h not in known_handles)
+                    tabs.append((window, new_handle))
+
+                for window, handle in tabs:
+                    start, end, _ = window
+                    shard_name = f"_shard_{start.isoformat()}_{end.isoformat()}.csv"
+                    driver.switch_to.window(handle)
                     try:
-                        old_path = os.path.join(self.store_folder, filename)
-                        new_path = os.path.join(self.store_folder, self.store_config['output_file'])
-                        
-                        if os.path.exists(new_path):
-                            os.remove(new_path)
-                        
-                        os.rename(old_path, new_path)
-                        logging.info(f"Archivo renombrado exitosamente a {self.store_config['output_file']} en {self.store_folder}")
-                        return True
-                    except Exception as e:
-                        logging.error(f"Error al renombrar archivo: {e}")
-                        attempt += 1
-                        continue
-            attempt += 1
-            time.sleep(2) 
+                        if not self.export_current_report(driver, wait, shard_name):
+                            return False
+                    finally:
+                        driver.close()
+                    shard_path = os.path.join(self.store_folder, shard_name)
+                    shard_files.append(shard_path)
+                    planner.report(window, shard_path, count_csv_rows(shard_path, DAY_COLUMN))
+            driver.switch_to.window(main_handle)
+
+            concat_csv_files(planner.completed_files(), os.path.join(self.store_folder, target_name),
+                             DEDUP_KEY_COLUMNS, DAY_COLUMN)
+            return True
+        finally:
+            for shard_path in shard_files:
+                if os.path.exists(shard_path):
+                    os.remove(shard_path)
+
+    def login(self, driver, wait):
+        """Ejecuta el flujo de login de Shopify con email y contraseña"""
+        waiter = self.get_waiter(driver)
+        driver.get("https://accounts.shopify.com/store-login")
+
+        email_input = waiter.until("Login page loaded", EC.presence_of_element_located((By.ID, "account_email")))
+        email_input.clear()
+        email_input.send_keys(os.getenv('SHOPIFY_EMAIL'))
+
+        if not self.wait_and_click(driver, wait, "//button[@type='submit']", "Clicking Next button"):
+            raise ElementMissingError("Failed to click Next button")
         
-        logging.error("No se pudo renombrar el archivo después de varios intentos")
-        return False
+        try:
+            password_input = waiter.until("Password field ready", EC.element_to_be_clickable((By.ID, "account_password")))
+            password_input.clear()
+            password_input.send_keys(os.getenv('SHOPIFY_PASSWORD'))
+        except Exception as e:
+            logging.error(f"Password field error: {str(e)}")
+            capture_failure(driver, "password_error")
+            raise
+
+        if not self.wait_and_click(driver, wait, "//button[@type='submit']", "Clicking Login button"):
+            raise ElementMissingError("Failed to click Login button")
+        
+
+        try:
+            waiter.until("Login completed", EC.presence_of_element_located(
+                (By.CSS_SELECTOR, ".Polaris-Navigation, .Polaris-TopBar")), max_timeout=30)
+        except TimeoutException:
+            capture_failure(driver, "login_failed")
+            # Seguir en el formulario de contraseña significa que Shopify rechazó las credenciales
+            if driver.find_elements(By.ID, "account_password"):
+                raise AuthError("Shopify rejected the login credentials")
+            raise
 
     def shopify_login(self):
-        """Realiza el proceso completo de login y exportación de datos"""
-        driver = None
+        """
+        Realiza el proceso completo de login y exportación de datos.
+
+        Raises:
+            La excepción del paso que falló, para que la política de reintentos la clasifique
+        """
+        session_restored = False
         try:
             for var in ['SHOPIFY_EMAIL', 'SHOPIFY_PASSWORD']:
                 if not os.getenv(var):
-                    raise ValueError(f"Missing environment variable: {var}")
+                    raise AuthError(f"Missing environment variable: {var}")
 
- 
-            driver = self.setup_firefox_driver()
-            driver.maximize_window()
-            wait = WebDriverWait(driver, 20)
+            with self.pool.acquire(self.store_folder) as driver:
+                wait = WebDriverWait(driver, 20)
 
+                session_key = f"shopify:{os.getenv('SHOPIFY_EMAIL')}"
+                with self.sessions.account_lock(session_key):
+                    with tracing.span('session_restore', service='shopify', store=self.store_type):
+                        session_restored = self.sessions.restore_if_valid(driver, session_key, self.store_config['base_url'])
+                    if not session_restored:
+                        with tracing.span('login', service='shopify', store=self.store_type):
+                            self.login(driver, wait)
+                        self.sessions.save(driver, session_key)
 
-            driver.get("https://accounts.shopify.com/store-login")
-            time.sleep(3)
+                since, until, is_incremental = self.export_window
+                logging.info(f"Exporting {since} to {until} ({'incremental' if is_incremental else 'full'})")
+                target_name = self.get_download_file_name()
 
-            email_input = wait.until(EC.presence_of_element_located((By.ID, "account_email")))
-            email_input.clear()
-            email_input.send_keys(os.getenv('SHOPIFY_EMAIL'))
+                if EXPORT_SETTINGS['sharding']:
+                    if not self.export_sharded(driver, wait, since, until, target_name):
+                        raise DownloadMissingError("La exportación por ventanas no se completó")
+                else:
+                    driver.get(self.get_shopify_url(since, until))
+                    if not self.export_current_report(driver, wait, target_name):
+                        raise DownloadMissingError("La exportación no se completó")
 
-            if not self.wait_and_click(driver, wait, "//button[@type='submit']", "Clicking Next button"):
-                raise Exception("Failed to click Next button")
-            
-            try:
-                password_input = wait.until(EC.element_to_be_clickable((By.ID, "account_password")))
-                time.sleep(2)
-                password_input.clear()
-                password_input.send_keys(os.getenv('SHOPIFY_PASSWORD'))
-            except Exception as e:
-                logging.error(f"Password field error: {str(e)}")
-                driver.save_screenshot("password_error.png")
-                raise
+                return self.finalize_export()
 
-            if not self.wait_and_click(driver, wait, "//button[@type='submit']", "Clicking Login button"):
-                raise Exception("Failed to click Login button")
-            time.sleep(5)
-            
+        except Exception as e:
+            logging.error(f"An error occurred during the export process: {e}")
+            if session_restored:
+                logging.info("Discarding restored session, next attempt will log in again")
+                self.sessions.clear(session_key)
+            raise
+        finally:
+            WaitStats.shared().save()
 
+    def export_via_api(self):
+        """Exporta el reporte con la Admin API de Shopify en lugar del navegador"""
+        try:
+            token_env = self.store_config.get('access_token_env', 'SHOPIFY_ACCESS_TOKEN')
+            access_token = os.getenv(token_env)
+            if not access_token:
+                raise AuthError(f"Missing environment variable: {token_env}")
+
+            since, until, is_incremental = self.export_window
+            logging.info(f"Exporting {since} to {until} via API ({'incremental' if is_incremental else 'full'})")
+            client = ShopifyQLClient(self.store_config['shop_domain'], access_token,
+                                     endpoint=self.store_config.get('api_endpoint'))
             try:
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".Polaris-Navigation, .Polaris-TopBar")))
-            except TimeoutException:
-                driver.save_screenshot("login_failed.png")
-                raise Exception("Login verification failed")
+                export_query_to_csv(
+                    client,
+                    lambda window_since, window_until: self.build_query(window_since, window_until, visualize=False),
+                    since, until,
+                    os.path.join(self.store_folder, self.get_download_file_name()),
+                    DEDUP_KEY_COLUMNS,
+                    EXPORT_SETTINGS['query_limit']
+                )
+            finally:
+                client.close()
+            return self.finalize_export()
+        except Exception as e:
+            logging.error(f"An error occurred during the API export: {e}")
+            raise
 
-            shopify_url = self.get_shopify_url()
-            driver.get(shopify_url)
-            time.sleep(8)
+    def export(self):
+        """Ejecuta un intento de exportación con el backend configurado para la tienda"""
+        if self.store_config.get('backend', 'browser') == 'api':
+            return self.export_via_api()
+        return self.shopify_login()
 
-            try:
-                more_actions_button = "//button[contains(@class, '_Button_1yxn0_1') and .//shopify-internal-icon[@type='menu-horizontal']]"
-                if not self.wait_and_click(driver, wait, more_actions_button, "Clicking more actions button"):
-                    raise Exception("Failed to click more actions button")
-                time.sleep(2)
-                export_button_xpath = "//button[contains(., 'Export')]"
-                if not self.wait_and_click(driver, wait, export_button_xpath, "Clicking Export button"):
-                    raise Exception("Failed to click Export button")
-                time.sleep(3)
-                
-                try:
-                    csv_radio = wait.until(EC.presence_of_element_located((By.XPATH, "//input[@type='radio' and @value='csv']")))
-                    if not csv_radio.is_selected():
-                        csv_radio.click()
-                        time.sleep(1)
-                except Exception as e:
-                    logging.error(f"Error selecting CSV option: {e}")
-                    driver.save_screenshot("csv_selection_error.png")
-                    raise
-
-                export_final_button = "//button[contains(., 'Export')]"
-                if not self.wait_and_click(driver, wait, export_final_button, "Clicking final Export button"):
-                    raise Exception("Failed to click final Export button")
-                
-                time.sleep(5)
-                if not self.rename_downloaded_file():
-                    logging.error("No se pudo completar el proceso de renombrado del archivo")
-                    return False
-                    
-                return True
-                
-            except Exception as e:
-                logging.error(f"Error clicking more actions button: {e}")
-                driver.save_screenshot("more_actions_error.png")
-                raise
+    def finalize_export(self):
+        """
+        Lleva la descarga al CSV de la tienda y avanza el watermark. Si la descarga es
+        idéntica a la anterior (mismo hash en el manifiesto) se descarta y el CSV ya
+        procesado queda intacto, para que las etapas siguientes también puedan omitirse.
+        La descarga se valida antes de combinarla; si falla, va a la cuarentena y el CSV de
+        la tienda queda intacto. El manifiesto y el watermark solo se actualizan después de
+        que la combinación o el reemplazo terminó, para que una falla a mitad repita la
+        descarga en el próximo intento.
+        """
+        since, until, is_incremental = self.export_window
+        output_path = os.path.join(self.store_folder, self.output_file)
+        download_path = os.path.join(self.store_folder, self.get_download_file_name())
+        download_hash = file_sha256(download_path)
+        download_size = os.path.getsize(download_path)
+        manifest = FileManifest.shared()
 
-        except Exception as e:
-            logging.error(f"An error occurred during the export process: {e}")
-            return False
-        finally:
-            if driver:
-                driver.quit()
+        if os.path.exists(output_path) and manifest.is_unchanged('export', output_path, download_path, download_hash):
+            logging.info(f"Export for {self.store_type} is identical to the previous one, keeping {output_path}")
+            os.remove(download_path)
+        else:
+            if VALIDATION_SETTINGS['enabled']:
+                from validation import validate_download, ValidationError
 
-    def run(self):
-        """Ejecuta el proceso completo con reintentos"""
-        max_attempts = 3
-        for attempt in range(max_attempts):
-            logging.info(f"Attempt {attempt + 1} of {max_attempts}")
-            if self.shopify_login():
-                logging.info("Script completed successfully")
-                break
+                result = validate_download(download_path, is_incremental, require_rows=has_closed_days(since, until))
+                if not result.ok:
+                    raise ValidationError(f"La descarga de {self.store_type} no pasó la validación y quedó en "
+                                          f"{result.quarantined_to}: {'; '.join(result.errors)}")
+            if is_incremental:
+                merge_incremental_csv(output_path, download_path, since, DEDUP_KEY_COLUMNS, DAY_COLUMN)
+                os.remove(download_path)
             else:
-                if attempt < max_attempts - 1:
-                    logging.info(f"Waiting 10 seconds before next attempt...")
-                    time.sleep(10)
-                else:
-                    logging.error("All attempts failed")
+                os.replace(download_path, output_path)
+            manifest.record('export', output_path, download_path, sha256=download_hash, size=download_size)
+
+        if self.incremental:
+            # El día de hoy puede estar incompleto; un año cerrado queda completo hasta `until`
+            self.watermarks.set(self.store_type, self.year, min(until, datetime.now().date() - timedelta(days=1)))
+        return True
+
+    def run(self):
+        """
+        Ejecuta el proceso completo con reintentos según la clase de falla: credenciales
+        rechazadas fallan de inmediato y las fallas de red abren el circuito del servicio.
+        """
+        self.export_window = self.get_export_window()
+        backend = self.store_config.get('backend', 'browser')
+        policy = RetryPolicy(f"Export {self.store_type}", service=f"shopify_{backend}")
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            logging.info(f"Attempt {attempts}")
+            with tracing.span('export_attempt', store=self.store_type, attempt=attempts):
+                return self.export()
+
+        try:
+            policy.call(attempt)
+        except Exception as e:
+            logging.error(f"All attempts failed: {e}")
+            return False
+        logging.info("Script completed successfully")
+        return True
 
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import logging
+import os
+import time
+from config import SCHEDULER_SETTINGS
+from stores import get_store_types, get_store_timeout
+import tracing
+
+class StoreTimeoutError(Exception):
+    pass
+
+@dataclass
+class StoreRunResult:
+    """Resultado agregado de la tarea (exportación o pipeline completo) de todas las tiendas"""
+    results: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    durations: dict = field(default_factory=dict)
+
+    @property
+    def succeeded(self):
+        return [store for store, ok in self.results.items() if ok]
+
+    @property
+    def failed(self):
+        return [store for store, ok in self.results.items() if not ok]
+
+    @property
+    def all_succeeded(self):
+        return bool(self.results) and not self.failed
+
+class StoreDeadline:
+    """
+    Tiempo límite blando de una tienda: se verifica antes de empezar cada etapa y, si ya
+    venció, la tienda falla sin empezarla. Una etapa en curso no se interrumpe; la acotan
+    sus propios timeouts (ver SCHEDULER_SETTINGS['default_timeout_minutes']).
+    """
+
+    def __init__(self, store_type: str, timeout: float):
+        self.store_type = store_type
+        self.expires = time.monotonic() + timeout
+
+    @property
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def check(self, stage: str):
+        if self.remaining <= 0:
+            raise StoreTimeoutError(f"La tienda {self.store_type} superó su tiempo límite antes de {stage}")
+
+def get_max_workers():
+    """Retorna el límite de tiendas procesadas en paralelo (variable de entorno o config)"""
+    return int(os.getenv('BOT_MAX_STORE_WORKERS', SCHEDULER_SETTINGS['max_workers']))
+
+def run_store_tasks(task, store_types=None, max_workers=None) -> StoreRunResult:
+    """
+    Ejecuta `task(store_type, deadline)` para cada tienda en un pool acotado de workers.
+
+    Las tiendas se encolan por prioridad, así que las más importantes toman primero los
+    workers libres. Cada tienda avanza por sus etapas sin esperar a las demás; los
+    navegadores siguen limitados por el pool de drivers.
+
+    Args:
+        task (callable): Función (store_type, StoreDeadline) -> bool
+        store_types (list): Tiendas a procesar, por defecto todas las configuradas
+        max_workers (int): Número máximo de tiendas simultáneas
+    Returns:
+        StoreRunResult: Éxito/fallo, error y duración por tienda
+    """
+    store_types = sorted(store_types, key=get_store_types().index) if store_types else get_store_types()
+    max_workers = max(1, min(max_workers or get_max_workers(), len(store_types)))
+    result = StoreRunResult()
+
+    logging.info(f"Procesando {len(store_types)} tiendas con hasta {max_workers} workers: {', '.join(store_types)}")
+    def timed_task(store_type):
+        started = time.monotonic()
+        try:
+            return task(store_type, StoreDeadline(store_type, get_store_timeout(store_type)))
+        finally:
+            result.durations[store_type] = time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='store') as executor:
+        futures = {executor.submit(tracing.bind(timed_task), store_type): store_type for store_type in store_types}
+
+        for future in as_completed(futures):
+            store_type = futures[future]
+            try:
+                result.results[store_type] = bool(future.result())
+            except Exception as e:
+                logging.error(f"Error procesando la tienda {store_type}: {str(e)}")
+                result.results[store_type] = False
+                result.errors[store_type] = str(e)
+            status = "OK" if result.results[store_type] else "FALLÓ"
+            logging.info(f"Tienda {store_type}: {status} en {result.durations[store_type]:.1f}s")
+
+    return result
@@ -0,0 +1,89 @@
+import os
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from config import STORE_CONFIGS, SCHEDULER_SETTINGS, ROLLUP_SETTINGS, EXPORT_SETTINGS
+
+def get_store_types():
+    """Tiendas configuradas ordenadas por prioridad (menor valor primero)"""
+    return sorted(STORE_CONFIGS, key=get_store_priority)
+
+def get_store_priority(store_type: str) -> int:
+    return STORE_CONFIGS[store_type].get('priority', SCHEDULER_SETTINGS['default_priority'])
+
+def get_store_timeout(store_type: str) -> float:
+    """Tiempo máximo de la tienda en segundos; es un límite blando que se verifica entre etapas"""
+    minutes = STORE_CONFIGS[store_type].get('timeout_minutes', SCHEDULER_SETTINGS['default_timeout_minutes'])
+    return minutes * 60
+
+def get_open_year(today=None) -> int:
+    """Año que todavía recibe ventas y que se exporta en cada ejecución"""
+    return (today or date.today()).year
+
+def get_year_window(year: int, today=None) -> tuple:
+    """Rango SINCE/UNTIL completo del CSV de un año: desde start_date o el 1 de enero hasta hoy o el 31 de diciembre"""
+    today = today or date.today()
+    return max(date.fromisoformat(EXPORT_SETTINGS['start_date']), date(year, 1, 1)), min(today, date(year, 12, 31))
+
+def has_closed_days(since, until, today=None) -> bool:
+    """
+    Si el rango incluye algún día ya terminado. Hoy todavía puede no tener ventas, así que
+    un rango que solo cubre hoy (p. ej. el año abierto el 1 de enero) puede venir vacío.
+    """
+    return since <= min(until, (today or date.today()) - timedelta(days=1))
+
+def get_store_csv_path(store_type: str, year: int = None) -> Path:
+    """Ruta local del CSV de una tienda para un año, por defecto el año abierto"""
+    store_config = STORE_CONFIGS[store_type]
+    file_name = store_config['output_file'].format(year=year or get_open_year())
+    return Path(store_config['folder_name']) / file_name
+
+def get_store_year_files(store_type: str) -> dict:
+    """CSV anuales que existen en la carpeta de la tienda, por año"""
+    store_config = STORE_CONFIGS[store_type]
+    prefix, _, suffix = store_config['output_file'].partition('{year}')
+    pattern = re.compile(re.escape(prefix) + r'(\d{4})' + re.escape(suffix) + '$')
+    folder = Path(store_config['folder_name'])
+    if not folder.is_dir():
+        return {}
+    files = {}
+    for path in folder.iterdir():
+        match = pattern.match(path.name)
+        if match and path.is_file():
+            files[int(match.group(1))] = path
+    return dict(sorted(files.items()))
+
+def get_sharepoint_folder_url(store_type: str) -> str:
+    """Carpeta de SharePoint de la tienda: URL fija en la config o variable de entorno"""
+    store_config = STORE_CONFIGS[store_type]
+    return store_config.get('sharepoint_folder_url') or os.getenv(store_config['sharepoint_url_env'])
+
+def get_required_env_vars(store_types=None, stages=None):
+    """
+    Variables de entorno que necesitan las tiendas y etapas indicadas.
+
+    Args:
+        store_types (list): Tiendas, por defecto todas
+        stages (list): 'export' y/o 'upload', por defecto ambas
+    """
+    store_types = list(store_types or STORE_CONFIGS)
+    stages = set(stages or ('export', 'upload'))
+    required_vars = []
+    if 'upload' in stages:
+        required_vars += ['SHAREPOINT_EMAIL', 'SHAREPOINT_PASSWORD', 'SHAREPOINT_BASE_URL']
+    for store_type in store_types:
+        store_config = STORE_CONFIGS[store_type]
+        if 'export' in stages:
+            if store_config.get('backend', 'browser') == 'api':
+                required_vars.append(store_config.get('access_token_env', 'SHOPIFY_ACCESS_TOKEN'))
+            else:
+                required_vars += ['SHOPIFY_EMAIL', 'SHOPIFY_PASSWORD']
+        if 'upload' in stages and not store_config.get('sharepoint_folder_url'):
+            required_vars.append(store_config['sharepoint_url_env'])
+    return list(dict.fromkeys(required_vars))
+
+def get_rollup_paths(csv_path) -> dict:
+    """Archivos de resumen que acompañan al CSV de la tienda, por nombre de resumen"""
+    csv_path = Path(csv_path)
+    return {name: csv_path.with_name(f"{csv_path.stem}_{name}{csv_path.suffix}")
+            for name in ROLLUP_SETTINGS['rollups']}
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Los módulos del bot se importan como top-level (from config import ...), igual que al
+# ejecutar main.py o cli.py desde bot_automatication
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,31 @@
+"""Pruebas de DownloadWatcher con inotify"""
+import threading
+import time
+import pytest
+import download_watcher
+from download_watcher import DownloadWatcher
+
+def _write_later(path, chunks, delay=0.05):
+    """Escribe `chunks` en `path` dejando el archivo abierto entre una escritura y otra"""
+    def write():
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                f.flush()
+                time.sleep(delay)
+    thread = threading.Thread(target=write)
+    thread.start()
+    return thread
+
+@pytest.mark.skipif(download_watcher.INotify is None, reason="inotify_simple no está instalado")
+def test_inotify_waits_for_the_file_to_be_closed(tmp_path):
+    target = tmp_path / 'export.csv'
+    with DownloadWatcher(str(tmp_path)) as watcher:
+        writer = _write_later(target, ['a,b\n'] + ['1,2\n'] * 5, delay=0.2)
+        found = watcher.wait_for_download(timeout=5)
+        closed = not writer.is_alive()
+        writer.join()
+
+    assert found == str(target)
+    assert closed
+    assert target.read_text(encoding='utf-8').count('\n') == 6
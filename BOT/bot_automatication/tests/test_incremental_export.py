@@ -0,0 +1,57 @@
+"""Pruebas del watermark por tienda y año y del merge de un export incremental"""
+import csv
+import json
+from datetime import date
+from incremental_export import WatermarkStore, merge_incremental_csv
+
+HEADER = ['Order name', 'Day', 'Net sales']
+KEY_COLUMNS = ['Order name', 'Day']
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return path
+
+def _read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))[1:]
+
+def test_watermarks_are_kept_per_year(tmp_path):
+    store = WatermarkStore(str(tmp_path / 'watermarks.json'))
+
+    store.set('pos', 2025, date(2025, 12, 20))
+    store.set('pos', 2026, date(2026, 1, 3))
+    store.clear('pos', 2025)
+
+    assert store.get('pos', 2025) is None
+    assert store.get('pos', 2026) == date(2026, 1, 3)
+
+def test_legacy_watermark_belongs_to_the_year_of_its_day(tmp_path):
+    state_file = tmp_path / 'watermarks.json'
+    state_file.write_text(json.dumps({'pos': '2026-01-03'}), encoding='utf-8')
+    store = WatermarkStore(str(state_file))
+
+    assert store.get('pos', 2026) == date(2026, 1, 3)
+    assert store.get('pos', 2025) is None
+
+def test_merge_copies_rows_before_since_and_dedups_the_delta(tmp_path):
+    existing = _write_csv(tmp_path / '2024.csv', [
+        ['#1001', '2024-03-01', '10.0'],
+        ['#1001', '2024-03-02', '11.0'],
+        ['#1002', '2024-03-03', '20.0'],
+        ['', '', '41.0']
+    ])
+    delta = _write_csv(tmp_path / 'delta.csv', [
+        ['#1002', '2024-03-03', '21.0'],
+        ['#1003', '2024-03-04', '30.0'],
+        ['#1003', '2024-03-04', '31.0'],
+        ['', '', '82.0']
+    ])
+
+    stats = merge_incremental_csv(str(existing), str(delta), date(2024, 3, 3), KEY_COLUMNS)
+
+    assert _read_rows(existing) == [['#1001', '2024-03-01', '10.0'], ['#1001', '2024-03-02', '11.0'],
+                                    ['#1002', '2024-03-03', '21.0'], ['#1003', '2024-03-04', '31.0']]
+    assert stats == {'kept': 2, 'new': 2, 'duplicates': 1, 'no_day': 2}
@@ -0,0 +1,33 @@
+"""Pruebas de la concatenación de las ventanas de un export fragmentado"""
+import csv
+from query_sharding import concat_csv_files
+
+HEADER = ['Order name', 'Day', 'Net sales']
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return path
+
+def test_concat_drops_window_totals_and_keeps_last_duplicate(tmp_path):
+    first = _write_csv(tmp_path / 'w1.csv', [
+        ['#1001', '2024-03-01', '10.0'],
+        ['#1002', '2024-03-02', '20.0'],
+        ['', '', '30.0']
+    ])
+    second = _write_csv(tmp_path / 'w2.csv', [
+        ['#1002', '2024-03-02', '25.0'],
+        ['#1003', '2024-03-03', '40.0'],
+        ['', '', '65.0']
+    ])
+    output = tmp_path / 'out.csv'
+
+    written = concat_csv_files([first, second], output, ['Order name', 'Day'], 'Day')
+
+    with open(output, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert written == 3
+    assert rows == [HEADER, ['#1001', '2024-03-01', '10.0'], ['#1002', '2024-03-02', '25.0'],
+                    ['#1003', '2024-03-03', '40.0']]
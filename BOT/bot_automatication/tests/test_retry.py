@@ -0,0 +1,57 @@
+"""Pruebas de la clasificación de fallas, el CircuitBreaker y el RetryPolicy"""
+import pytest
+import requests
+import retry
+from retry import CircuitBreaker, CircuitOpenError, RetryPolicy, classify, NETWORK, AUTH
+from shopify_api import ShopifyAPIError
+
+def test_api_limits_and_dropped_connections_are_network_failures():
+    assert classify(ShopifyAPIError("THROTTLED", status=429)) == NETWORK
+    assert classify(ShopifyAPIError("API de Shopify respondió 503", status=503)) == NETWORK
+    assert classify(requests.exceptions.ChunkedEncodingError("conexión cortada")) == NETWORK
+    assert classify(ShopifyAPIError("API de Shopify respondió 401", status=401)) == AUTH
+
+def test_half_open_breaker_lets_a_single_probe_through(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker('servicio', failure_threshold=1, reset_seconds=10)
+    breaker.record_failure(NETWORK)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    now[0] = 11
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError, match='prueba'):
+        breaker.before_call()
+
+    breaker.record_success()
+    breaker.before_call()
+    breaker.before_call()
+
+def test_failed_probe_reopens_the_breaker(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(retry.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker('servicio', failure_threshold=1, reset_seconds=10)
+    breaker.record_failure(NETWORK)
+    now[0] = 11
+
+    breaker.before_call()
+    breaker.record_failure(NETWORK)
+
+    with pytest.raises(CircuitOpenError, match='se reintentará'):
+        breaker.before_call()
+
+def test_policy_waits_at_least_the_retry_after_of_the_service(monkeypatch):
+    waits = []
+    monkeypatch.setattr(retry.tracing, 'sleep', lambda seconds, label: waits.append(seconds))
+    policy = RetryPolicy('API', classes={NETWORK: {'max_attempts': 3, 'base_delay': 0.01, 'max_delay': 5}})
+    responses = [ShopifyAPIError("THROTTLED", status=429, retry_after=2.5),
+                 ShopifyAPIError("THROTTLED", status=429, retry_after=60)]
+
+    def operation():
+        if responses:
+            raise responses.pop(0)
+        return 'ok'
+
+    assert policy.call(operation) == 'ok'
+    assert waits == [2.5, 5]
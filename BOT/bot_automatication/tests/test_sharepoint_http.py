@@ -0,0 +1,178 @@
+"""
+Pruebas de SharePointHttpUploader contra un servidor local que imita la API REST de
+SharePoint (contextinfo, Files/add, StartUpload / ContinueUpload / FinishUpload, MoveTo y
+la consulta de Length y ETag).
+"""
+import json
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+import pytest
+from sharepoint_http import SharePointHttpUploader, SharePointUploadError, build_http_session
+
+FOLDER = '/sites/ventas/Shared Documents/Monteria'
+CHUNK_SIZE = 1024
+
+class FakeSharePoint:
+    """Estado del servidor: contenido y ETag de cada archivo por ruta relativa al servidor"""
+
+    def __init__(self):
+        self.files = {}
+        # Como en SharePoint, el ETag es "{UniqueId},versión" y MoveTo conserva ambos
+        self.ids = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+        self.calls = []
+        # Acción -> veces que debe fallar con 500 antes de responder normalmente
+        self.failures = {}
+        # Contenido del destino en el momento de cada StartUpload / ContinueUpload
+        self.target_snapshots = []
+        self.watch = None
+
+    def etag(self, path):
+        return f'"{{{self.ids[path]}}},{self.versions[path]}"'
+
+    def write(self, path, content):
+        self.files[path] = content
+        self.ids.setdefault(path, str(uuid.uuid4()))
+        self.versions[path] = self.versions.get(path, 0) + 1
+
+    def file_info(self, path):
+        return {'Length': str(len(self.files[path])), 'ETag': self.etag(path)}
+
+def _handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload=None):
+            body = json.dumps(payload or {}).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = unquote(self.path)
+            match = re.search(r"GetFileByServerRelativeUrl\('(.+)'\)\?\$select=", path)
+            with fake.lock:
+                if not match or match.group(1) not in fake.files:
+                    return self._reply(404)
+                return self._reply(200, fake.file_info(match.group(1)))
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            path = unquote(self.path)
+            if path.endswith('/_api/contextinfo'):
+                return self._reply(200, {'FormDigestValue': 'digest', 'FormDigestTimeoutSeconds': 1800})
+            if self.headers.get('X-RequestDigest') != 'digest':
+                return self._reply(403)
+
+            action = re.findall(r"'\)/(?:Files/)?(\w+)\(", path)[-1]
+            with fake.lock:
+                fake.calls.append(action)
+                if fake.failures.get(action):
+                    fake.failures[action] -= 1
+                    return self._reply(500)
+
+                if action == 'add':
+                    folder = re.search(r"GetFolderByServerRelativeUrl\('(.+?)'\)", path).group(1)
+                    name = re.search(r"add\(url='(.+?)'", path).group(1)
+                    target = f"{folder}/{name}"
+                    fake.write(target, body)
+                    return self._reply(200, fake.file_info(target))
+
+                file_path = re.search(r"GetFileByServerRelativeUrl\('(.+?)'\)", path).group(1)
+                if file_path not in fake.files:
+                    return self._reply(404)
+                if action in ('StartUpload', 'ContinueUpload', 'FinishUpload'):
+                    if fake.watch:
+                        fake.target_snapshots.append(fake.files.get(fake.watch))
+                    offset = int(re.search(r"fileOffset=(\d+)", path).group(1)) if action != 'StartUpload' else 0
+                    if offset != len(fake.files[file_path]):
+                        return self._reply(400)
+                    fake.write(file_path, fake.files[file_path] + body)
+                    if action == 'FinishUpload':
+                        return self._reply(200, fake.file_info(file_path))
+                    return self._reply(200, {'value': str(offset + len(body))})
+                if action == 'MoveTo':
+                    target = re.search(r"newurl='(.+?)'", path).group(1)
+                    fake.files[target] = fake.files.pop(file_path)
+                    fake.ids[target] = fake.ids.pop(file_path)
+                    fake.versions[target] = fake.versions.pop(file_path)
+                    return self._reply(200)
+            return self._reply(400)
+    return Handler
+
+@pytest.fixture
+def sharepoint():
+    fake = FakeSharePoint()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(fake))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.site_url = f"http://127.0.0.1:{server.server_address[1]}/sites/ventas"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+def _uploader(fake, tmp_path):
+    return SharePointHttpUploader(fake.site_url, build_http_session(), chunk_size=CHUNK_SIZE,
+                                  state_dir=str(tmp_path / 'state'))
+
+def _local_file(tmp_path, size):
+    file_path = tmp_path / '2024.csv'
+    file_path.write_bytes(bytes(i % 251 for i in range(size)))
+    return file_path
+
+def test_small_file_is_replaced_in_one_request(sharepoint, tmp_path):
+    sharepoint.write(f"{FOLDER}/2024.csv", b'old')
+    file_path = _local_file(tmp_path, 100)
+
+    result = _uploader(sharepoint, tmp_path).upload(file_path, FOLDER)
+
+    assert sharepoint.files[f"{FOLDER}/2024.csv"] == file_path.read_bytes()
+    assert result == {'size': 100, 'etag': sharepoint.etag(f"{FOLDER}/2024.csv")}
+    assert sharepoint.calls == ['add']
+
+def test_chunked_upload_keeps_the_old_file_until_it_finishes(sharepoint, tmp_path):
+    target = f"{FOLDER}/2024.csv"
+    sharepoint.write(target, b'old contents')
+    sharepoint.watch = target
+    file_path = _local_file(tmp_path, CHUNK_SIZE * 3 + 10)
+
+    result = _uploader(sharepoint, tmp_path).upload(file_path, FOLDER)
+
+    assert sharepoint.target_snapshots == [b'old contents'] * 4
+    assert sharepoint.files[target] == file_path.read_bytes()
+    assert list(sharepoint.files) == [target]
+    assert result['size'] == file_path.stat().st_size
+    assert sharepoint.calls == ['add', 'StartUpload', 'ContinueUpload', 'ContinueUpload', 'FinishUpload', 'MoveTo']
+
+def test_chunked_upload_resumes_from_the_last_confirmed_offset(sharepoint, tmp_path):
+    file_path = _local_file(tmp_path, CHUNK_SIZE * 3 + 10)
+    sharepoint.failures['ContinueUpload'] = 1
+    uploader = _uploader(sharepoint, tmp_path)
+
+    with pytest.raises(SharePointUploadError):
+        uploader.upload(file_path, FOLDER)
+    assert f"{FOLDER}/2024.csv" not in sharepoint.files
+
+    sharepoint.calls.clear()
+    uploader.upload(file_path, FOLDER)
+
+    assert sharepoint.files[f"{FOLDER}/2024.csv"] == file_path.read_bytes()
+    assert sharepoint.calls == ['ContinueUpload', 'ContinueUpload', 'FinishUpload', 'MoveTo']
+    assert not list((tmp_path / 'state').iterdir())
+
+def test_verify_rejects_a_file_replaced_after_the_upload(sharepoint, tmp_path):
+    file_path = _local_file(tmp_path, 100)
+    uploader = _uploader(sharepoint, tmp_path)
+    etag = uploader.upload(file_path, FOLDER)['etag']
+
+    sharepoint.write(f"{FOLDER}/2024.csv", file_path.read_bytes())
+
+    with pytest.raises(SharePointUploadError, match='ETag'):
+        uploader.verify(file_path, FOLDER, etag)
@@ -0,0 +1,157 @@
+"""
+Pruebas de ShopifyQLClient y export_query_to_csv contra un servidor local que imita el
+endpoint GraphQL de la Admin API: respuestas por ventana SINCE/UNTIL con la fila de
+TOTALS, 429 con Retry-After y errores THROTTLED.
+"""
+import csv
+import json
+import re
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from retry import RetryPolicy, NETWORK
+from shopify_api import ShopifyAPIError, ShopifyQLClient, export_query_to_csv
+
+COLUMNS = ['Order name', 'Day', 'Net sales']
+KEY_COLUMNS = ['Order name', 'Day']
+LIMIT = 4
+TOKEN = 'shpat_test'
+
+class FakeShopify:
+    """Ventas por día y fallas programadas por número de petición"""
+
+    def __init__(self, sales):
+        self.sales = sales
+        self.windows = []
+        self.failures = {}
+        self.requests = 0
+        self.tokens = set()
+        self.lock = threading.Lock()
+
+    def table(self, since, until):
+        rows = [row for row in self.sales if since <= row[1] <= until][:LIMIT]
+        total = sum(float(row[2]) for row in rows)
+        return rows + [[None, None, str(total)]]
+
+def _throttled_payload():
+    return {
+        'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+        'extensions': {'cost': {'requestedQueryCost': 100,
+                                'throttleStatus': {'currentlyAvailable': 0, 'restoreRate': 50}}}
+    }
+
+def _handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, payload, headers=None):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            query = body['variables']['query']
+            with fake.lock:
+                fake.requests += 1
+                fake.tokens.add(self.headers.get('X-Shopify-Access-Token'))
+                failure = fake.failures.pop(fake.requests, None)
+                if failure == 429:
+                    return self._reply(429, {'errors': 'Throttled'}, {'Retry-After': '0'})
+                if failure == 'THROTTLED':
+                    return self._reply(200, _throttled_payload())
+                since, until = re.search(r"SINCE (\S+)\s+UNTIL (\S+)", query).groups()
+                fake.windows.append((since, until))
+                rows = fake.table(since, until)
+            self._reply(200, {'data': {'shopifyqlQuery': {
+                '__typename': 'TableResponse',
+                'tableData': {
+                    'columns': [{'name': name.lower().replace(' ', '_'), 'dataType': 'STRING', 'displayName': name}
+                                for name in COLUMNS],
+                    'rowData': rows
+                },
+                'parseErrors': []
+            }}})
+    return Handler
+
+@pytest.fixture
+def shopify():
+    sales = [
+        ['#1001', '2024-03-01', '10.0'],
+        ['#1002', '2024-03-01', '20.0'],
+        ['#1003', '2024-03-02', '30.0'],
+        # La misma clave dos veces: se conserva la última, como en el resto del pipeline
+        ['#1003', '2024-03-02', '35.0'],
+        ['#1004', '2024-03-15', '40.0'],
+        ['#1005', '2024-03-16', '50.0'],
+        ['#1006', '2024-03-17', '60.0'],
+        ['#1007', '2024-04-01', '70.0']
+    ]
+    fake = FakeShopify(sales)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(fake))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    fake.endpoint = f"http://127.0.0.1:{server.server_address[1]}/admin/api/graphql.json"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+def _build_query(since, until):
+    return f"FROM sales SHOW net_sales GROUP BY order_name, day SINCE {since} UNTIL {until} LIMIT {LIMIT}"
+
+def _export(fake, output_path, policy=None):
+    client = ShopifyQLClient(None, TOKEN, endpoint=fake.endpoint)
+    try:
+        run = lambda: export_query_to_csv(client, _build_query, date(2024, 3, 1), date(2024, 4, 30),
+                                          str(output_path), KEY_COLUMNS, LIMIT)
+        return policy.call(run) if policy else run()
+    finally:
+        client.close()
+
+def _read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+def test_export_splits_full_windows_and_keeps_the_last_duplicate(shopify, tmp_path):
+    output = tmp_path / 'export.csv'
+
+    written = _export(shopify, output)
+
+    assert written == 7
+    assert _read_rows(output) == [COLUMNS] + [row for row in shopify.sales if row != ['#1003', '2024-03-02', '30.0']]
+    # Marzo y su primera semana llegan al LIMIT y se subdividen; abril entra en una sola consulta
+    assert shopify.windows[0] == ('2024-03-01', '2024-03-31')
+    assert {('2024-03-01', '2024-03-07'), ('2024-03-01', '2024-03-01'), ('2024-03-15', '2024-03-21'),
+            ('2024-04-01', '2024-04-30')} <= set(shopify.windows)
+    assert shopify.tokens == {TOKEN}
+
+@pytest.mark.parametrize('failure', [429, 'THROTTLED'])
+def test_client_raises_limits_for_the_retry_policy(shopify, failure):
+    shopify.failures[1] = failure
+    client = ShopifyQLClient(None, TOKEN, endpoint=shopify.endpoint)
+
+    with pytest.raises(ShopifyAPIError) as error:
+        client.execute(_build_query(date(2024, 4, 1), date(2024, 4, 30)))
+    client.close()
+
+    assert error.value.status == 429
+    assert error.value.retry_after == (0 if failure == 429 else 2)
+    assert shopify.requests == 1
+
+def test_export_recovers_from_limits_through_the_retry_policy(shopify, tmp_path):
+    shopify.failures.update({2: 429, 5: 'THROTTLED'})
+    policy = RetryPolicy('Export API', classes={NETWORK: {'max_attempts': 3, 'base_delay': 0, 'max_delay': 0}})
+    output = tmp_path / 'export.csv'
+
+    written = _export(shopify, output, policy)
+
+    assert written == 7
+    assert not shopify.failures
+    assert len(_read_rows(output)) == 8
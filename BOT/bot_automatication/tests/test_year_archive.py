@@ -0,0 +1,52 @@
+"""Pruebas del archivo histórico: índice por día y SKU y lectura por row groups"""
+import csv
+from datetime import date
+import pytest
+from config import ARCHIVE_SETTINGS, DAY_COLUMN
+import year_archive
+
+SKU = ARCHIVE_SETTINGS['sku_column']
+HEADER = ['Order name', DAY_COLUMN, SKU, 'Net sales']
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return path
+
+@pytest.fixture
+def year_csv(tmp_path):
+    rows = [
+        ['#1003', '2024-03-02', 'B', '30.0'],
+        ['#1001', '2024-03-01', 'A', '10.0'],
+        ['#1002', '2024-03-01', 'B', '20.0'],
+        ['#1004', '2024-12-31', 'A', '40.0'],
+        # Fila de TOTALS de WITH TOTALS: sin orden, día ni SKU
+        ['', '', '', '100.0']
+    ]
+    return _write_csv(tmp_path / '2024.csv', rows)
+
+def test_archive_skips_totals_row(year_csv, tmp_path):
+    archive_dir = tmp_path / 'archive'
+
+    index = year_archive.archive_year(year_csv, archive_dir, 2024)
+
+    assert index['rows'] == 4
+    assert (index['min_day'], index['max_day']) == ('2024-03-01', '2024-12-31')
+    assert index['days'] == {'2024-03-01': [0, 2], '2024-03-02': [2, 3], '2024-12-31': [3, 4]}
+    assert index['sku_days'] == {'A': ['2024-03-01', '2024-12-31'], 'B': ['2024-03-01', '2024-03-02']}
+    assert year_archive.archived_years(archive_dir) == [2024]
+    assert year_archive.is_archived(year_csv, archive_dir, 2024)
+
+def test_read_archive_filters_by_day_and_sku(year_csv, tmp_path, monkeypatch):
+    monkeypatch.setitem(ARCHIVE_SETTINGS, 'row_group_size', 1)
+    archive_dir = tmp_path / 'archive'
+    year_archive.archive_year(year_csv, archive_dir, 2024)
+
+    march = year_archive.read_archive(archive_dir, 2024, since=date(2024, 3, 1), until=date(2024, 3, 31),
+                                      columns=['Order name', 'Net sales'])
+    sku_a = year_archive.read_archive(archive_dir, 2024, skus=['A'], columns=['Order name'])
+
+    assert march.to_pydict() == {'Order name': ['#1001', '#1002', '#1003'], 'Net sales': [10.0, 20.0, 30.0]}
+    assert sku_a.column('Order name').to_pylist() == ['#1001', '#1004']
@@ -0,0 +1,99 @@
+"""
+Pruebas del cambio de año: el año que cerró se completa, valida, procesa, sube y archiva
+antes de exportar el año abierto, cuya primera descarga puede venir vacía.
+"""
+import csv
+from datetime import date
+import pytest
+from config import EXPORT_SETTINGS, SALES_COLUMNS, NUMERIC_COLUMNS
+import main
+import year_archive
+from pipeline_state import PipelineState
+from stores import get_store_csv_path, get_year_window, has_closed_days
+from validation import validate_download
+
+STORE = 'pos'
+OPEN_YEAR = date.today().year
+CLOSED_YEAR = OPEN_YEAR - 1
+
+def _write_sales(path, days):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(SALES_COLUMNS)
+        for i, day in enumerate(days):
+            values = {column: f"{column} {i}" for column in SALES_COLUMNS}
+            values.update({column: '1.0' for column in NUMERIC_COLUMNS})
+            values.update({'Order name': f"#{1000 + i}", 'Day': day.isoformat()})
+            writer.writerow([values[column] for column in SALES_COLUMNS])
+    return path
+
+class FakeUploader:
+    def __init__(self):
+        self.files = []
+
+    def upload_files(self, force=False, files=None):
+        self.files += files
+        return []
+
+@pytest.fixture
+def rollover(tmp_path, monkeypatch):
+    """Carpeta de trabajo con el CSV del año cerrado a medio exportar, como el 1 de enero"""
+    monkeypatch.chdir(tmp_path)
+    # El año abierto recién empieza: su ventana solo cubre hoy
+    monkeypatch.setitem(EXPORT_SETTINGS, 'start_date', date.today().isoformat())
+    _write_sales(get_store_csv_path(STORE, CLOSED_YEAR), [date(CLOSED_YEAR, 12, 30)])
+    exports = []
+
+    def export_year(store_type, year=None):
+        exports.append(year)
+        if year == CLOSED_YEAR:
+            _write_sales(get_store_csv_path(store_type, year), [date(year, 12, 30), date(year, 12, 31)])
+        else:
+            _write_sales(get_store_csv_path(store_type, year), [])
+        return True
+
+    monkeypatch.setattr(main, 'export_year', export_year)
+    state = PipelineState()
+    state.begin(force_new=True)
+    return exports, state
+
+def test_closed_year_is_archived_and_empty_open_year_passes(rollover):
+    exports, state = rollover
+    uploader = FakeUploader()
+
+    assert main.run_store_pipeline(STORE, state, uploader)
+
+    assert exports == [CLOSED_YEAR, OPEN_YEAR]
+    archive_dir = year_archive.get_archive_dir(STORE)
+    assert year_archive.archived_years(archive_dir) == [CLOSED_YEAR]
+    assert year_archive.load_index(archive_dir, CLOSED_YEAR)['rows'] == 2
+    assert get_store_csv_path(STORE, CLOSED_YEAR) in uploader.files
+    assert get_store_csv_path(STORE, OPEN_YEAR) in uploader.files
+
+def test_closed_year_is_archived_when_the_open_year_export_fails(rollover, monkeypatch):
+    exports, state = rollover
+    export_year = main.export_year
+
+    def failing_open_year(store_type, year=None):
+        if year == OPEN_YEAR:
+            raise RuntimeError("Shopify no respondió")
+        return export_year(store_type, year)
+
+    monkeypatch.setattr(main, 'export_year', failing_open_year)
+
+    with pytest.raises(RuntimeError):
+        main.run_store_pipeline(STORE, state, FakeUploader())
+
+    assert year_archive.archived_years(year_archive.get_archive_dir(STORE)) == [CLOSED_YEAR]
+
+def test_download_without_closed_days_may_be_empty(tmp_path):
+    first_day = date(2026, 1, 1)
+    window_rows = has_closed_days(*get_year_window(2026, today=first_day), today=first_day)
+    empty = _write_sales(tmp_path / 'empty.csv', [])
+    rejected = _write_sales(tmp_path / 'rejected.csv', [])
+
+    assert not window_rows
+    assert validate_download(empty, incremental=False, require_rows=window_rows).ok
+    assert not validate_download(rejected, incremental=False, require_rows=True).ok
+    assert not rejected.exists()
@@ -0,0 +1,199 @@
+from contextlib import contextmanager
+import contextvars
+from datetime import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from config import TRACING_SETTINGS
+
+class Span:
+    """Tramo medido de la ejecución con sus atributos, contadores y tramos hijos"""
+
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.counters = {}
+        self.children = []
+        self.status = 'ok'
+        self.error = None
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.start = time.monotonic()
+        self.duration = None
+        self.lock = threading.Lock()
+
+    def add_child(self, span):
+        with self.lock:
+            self.children.append(span)
+
+    def count(self, key, value=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def end(self, error=None):
+        self.duration = time.monotonic() - self.start
+        if error is not None:
+            self.status = 'error'
+            self.error = str(error)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'attrs': self.attrs,
+            'counters': self.counters,
+            'status': self.status,
+            'error': self.error,
+            'started_at': self.started_at,
+            'duration_seconds': round(self.duration, 3) if self.duration is not None else None,
+            'children': [child.to_dict() for child in self.children]
+        }
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+class Tracer:
+    """
+    Registra tramos anidados. El tramo activo vive en un ContextVar, así que los tramos
+    abiertos en un worker cuelgan del tramo que estaba activo al enviar la tarea si esta se
+    envuelve con `bind`; sin contexto cuelgan del tramo raíz de la ejecución.
+
+    Al terminar la ejecución escribe un reporte JSON y, si está configurado, un archivo
+    de texto para el textfile collector de Prometheus.
+    """
+
+    def __init__(self, report_dir=None, prometheus_file=None):
+        self.report_dir = report_dir or TRACING_SETTINGS['report_dir']
+        self.prometheus_file = prometheus_file or os.getenv('BOT_PROMETHEUS_FILE') or TRACING_SETTINGS['prometheus_file']
+        self.active = contextvars.ContextVar(f"tracing_span_{id(self)}", default=None)
+        self.root = None
+
+    def current(self):
+        return self.active.get() or self.root
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Mide un tramo anidado en el tramo activo del contexto"""
+        span = Span(name, attrs)
+        parent = self.current()
+        if parent is not None:
+            parent.add_child(span)
+        token = self.active.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        else:
+            span.end()
+        finally:
+            self.active.reset(token)
+
+    def count(self, key, value=1):
+        """Suma un contador (reintentos, filas, bytes) en el tramo activo"""
+        span = self.current()
+        if span is not None:
+            span.count(key, value)
+
+    def start_run(self, **attrs):
+        self.root = Span('run', attrs)
+        self.active.set(None)
+        return self.root
+
+    def finish_run(self, error=None):
+        """Cierra la ejecución y escribe los reportes"""
+        root, self.root = self.root, None
+        if root is None:
+            return None
+        root.end(error=error)
+        report_path = None
+        try:
+            report_path = self.write_report(root)
+            if self.prometheus_file:
+                self.write_prometheus(root)
+        except OSError as e:
+            logging.warning(f"No se pudo escribir el reporte de la ejecución: {e}")
+        return report_path
+
+    def _atomic_write(self, path, text):
+        folder = os.path.dirname(path) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def write_report(self, root):
+        """Escribe el árbol de tramos como JSON (uno por ejecución y `latest.json`)"""
+        text = json.dumps(root.to_dict(), indent=2, ensure_ascii=False)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        report_path = os.path.join(self.report_dir, f"run_{stamp}.json")
+        self._atomic_write(report_path, text)
+        self._atomic_write(os.path.join(self.report_dir, 'latest.json'), text)
+        logging.info(f"Reporte de la ejecución en {report_path}")
+        return report_path
+
+    def write_prometheus(self, root):
+        """Agrega duraciones y contadores por nombre de tramo y tienda en formato Prometheus"""
+        durations = {}
+        counters = {}
+        for span in root.walk():
+            labels = {'span': span.name}
+            for key in ('store', 'stage', 'step'):
+                if key in span.attrs:
+                    labels[key] = span.attrs[key]
+            label_key = tuple(sorted(labels.items()))
+            total, calls = durations.get(label_key, (0.0, 0))
+            durations[label_key] = (total + (span.duration or 0.0), calls + 1)
+            for name, value in span.counters.items():
+                counter_key = (name, label_key)
+                counters[counter_key] = counters.get(counter_key, 0) + value
+
+        def fmt(label_key):
+            return ','.join(f'{key}="{str(value)}"' for key, value in label_key)
+
+        lines = [
+            '# HELP bot_span_duration_seconds_sum Tiempo total por tramo en la última ejecución',
+            '# TYPE bot_span_duration_seconds_sum gauge'
+        ]
+        lines += [f'bot_span_duration_seconds_sum{{{fmt(key)}}} {total:.3f}' for key, (total, _) in durations.items()]
+        lines += ['# TYPE bot_span_count gauge']
+        lines += [f'bot_span_count{{{fmt(key)}}} {calls}' for key, (_, calls) in durations.items()]
+        lines += ['# TYPE bot_span_counter gauge']
+        lines += [f'bot_span_counter{{counter="{name}",{fmt(key)}}} {value}'
+                  for (name, key), value in counters.items()]
+        lines += [
+            '# TYPE bot_run_success gauge',
+            f'bot_run_success {int(root.status == "ok")}',
+            '# TYPE bot_run_last_timestamp_seconds gauge',
+            f'bot_run_last_timestamp_seconds {int(time.time())}'
+        ]
+        self._atomic_write(self.prometheus_file, '\n'.join(lines) + '\n')
+
+_tracer = Tracer()
+
+def get_tracer():
+    return _tracer
+
+def span(name, **attrs):
+    return _tracer.span(name, **attrs)
+
+def count(key, value=1):
+    _tracer.count(key, value)
+
+def bind(fn):
+    """
+    Envuelve `fn` para ejecutarla en una copia del contexto actual, de modo que los tramos
+    que abra en un worker cuelguen del tramo activo al enviarla. Se llama una vez por
+    tarea enviada: un mismo contexto no puede estar activo en dos hilos a la vez.
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def sleep(seconds, reason):
+    """time.sleep medido como tramo, para ver qué esperas fijas dominan la ejecución"""
+    with _tracer.span('sleep', reason=reason, seconds=seconds):
+        time.sleep(seconds)
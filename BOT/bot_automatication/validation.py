@@ -0,0 +1,328 @@
+"""
+Validación del CSV exportado antes de procesarlo y subirlo: columnas y tipos esperados de
+la consulta, filas de TOTALS (WITH TOTALS) mezcladas con los datos, filas duplicadas (con
+las mismas dimensiones del GROUP BY) y comparación de filas y totales contra la validación
+anterior. Cada descarga se valida antes de combinarse con el CSV de la tienda y, si no
+pasa, se mueve a la carpeta de cuarentena; el CSV de la tienda se vuelve a validar antes de
+procesarlo y, si no pasa, queda en su lugar sin subirse.
+
+El archivo se recorre por bloques con pandas: los tipos, las filas de totales y el hash de
+las dimensiones de cada fila se calculan vectorizados por bloque, y los duplicados se detectan con
+un índice hash sobre todas las filas, de modo que el costo crece linealmente con las filas.
+"""
+import csv
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from config import (SALES_COLUMNS, NUMERIC_COLUMNS, DAY_COLUMN, DEDUP_KEY_COLUMNS, CSV_CHUNK_SIZE,
+                    VALIDATION_SETTINGS)
+from manifest import FileManifest
+import tracing
+
+_state_lock = threading.Lock()
+
+class ValidationError(Exception):
+    """Una descarga no pasó la validación y quedó en cuarentena"""
+
+@dataclass
+class ValidationResult:
+    """Resultado de validar el CSV de una tienda"""
+    file_path: Path
+    rows_in: int = 0
+    rows_out: int = 0
+    duplicates: int = 0
+    totals_rows: int = 0
+    invalid_rows: int = 0
+    totals: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+    quarantined_to: Path = None
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {
+            'file': str(self.file_path),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'duplicates': self.duplicates,
+            'totals_rows': self.totals_rows,
+            'invalid_rows': self.invalid_rows,
+            'totals': self.totals,
+            'errors': self.errors,
+            'warnings': self.warnings
+        }
+
+def _read_header(file_path):
+    with open(file_path, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+def check_columns(header, result):
+    """Columnas faltantes son error (Shopify las renombró); las sobrantes, advertencia"""
+    if header is None:
+        result.errors.append("El archivo está vacío")
+        return
+    missing = [column for column in SALES_COLUMNS if column not in header]
+    extra = [column for column in header if column not in SALES_COLUMNS]
+    if missing:
+        result.errors.append(f"Faltan columnas: {', '.join(missing)}")
+    if extra:
+        result.warnings.append(f"Columnas no esperadas: {', '.join(extra)}")
+
+def _scan_chunk(chunk):
+    """
+    Clasifica las filas de un bloque. Una fila de TOTALS no tiene día válido y, o bien no
+    tiene ninguna columna de la clave, o su primera columna dice 'Total'.
+
+    Returns:
+        tuple: Máscaras (totales, inválidas) y hash de las dimensiones de cada fila
+    """
+    day = pd.to_datetime(chunk[DAY_COLUMN], format='%Y-%m-%d', errors='coerce')
+    key_columns = [column for column in DEDUP_KEY_COLUMNS if column != DAY_COLUMN]
+    first_column = chunk[key_columns[0]].fillna('').str.strip().str.lower()
+    totals = day.isna() & (chunk[key_columns].isna().all(axis=1) | first_column.str.startswith('total'))
+
+    raw_numeric = chunk[NUMERIC_COLUMNS]
+    numeric = raw_numeric.apply(pd.to_numeric, errors='coerce')
+    bad_numeric = (numeric.isna() & raw_numeric.notna()).any(axis=1)
+    invalid = (day.isna() | bad_numeric) & ~totals
+
+    hashes = pd.util.hash_pandas_object(chunk[DEDUP_KEY_COLUMNS], index=False)
+    return totals.to_numpy(), invalid.to_numpy(), hashes.to_numpy()
+
+def scan_file(file_path, result, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Recorre el archivo por bloques y calcula qué filas se conservan: las que no son de
+    TOTALS y, entre las de iguales dimensiones, la última aparición.
+
+    Returns:
+        numpy.ndarray: Máscara booleana de filas a conservar
+    """
+    columns = list(dict.fromkeys(DEDUP_KEY_COLUMNS + [DAY_COLUMN] + NUMERIC_COLUMNS))
+    chunks = pd.read_csv(file_path, usecols=columns, dtype=str, keep_default_na=False,
+                         na_values=[''], chunksize=chunk_size)
+    totals_parts, invalid_parts, hash_parts = [], [], []
+    for chunk in chunks:
+        totals, invalid, hashes = _scan_chunk(chunk)
+        totals_parts.append(totals)
+        invalid_parts.append(invalid)
+        hash_parts.append(hashes)
+
+    if not hash_parts:
+        return np.zeros(0, dtype=bool)
+    totals = np.concatenate(totals_parts)
+    invalid = np.concatenate(invalid_parts)
+    hashes = np.concatenate(hash_parts)
+
+    data_rows = ~totals
+    duplicated = np.zeros(len(hashes), dtype=bool)
+    duplicated[data_rows] = pd.Series(hashes[data_rows]).duplicated(keep='last').to_numpy()
+    keep = data_rows & ~duplicated
+
+    result.rows_in = len(keep)
+    result.rows_out = int(keep.sum())
+    result.totals_rows = int(totals.sum())
+    result.duplicates = int(duplicated.sum())
+    result.invalid_rows = int(invalid.sum())
+    return keep
+
+def sum_totals(file_path, keep, chunk_size=CSV_CHUNK_SIZE):
+    """Suma de las columnas de control sobre las filas conservadas"""
+    columns = VALIDATION_SETTINGS['total_columns']
+    totals = pd.Series(0.0, index=columns)
+    offset = 0
+    for chunk in pd.read_csv(file_path, usecols=columns, chunksize=chunk_size):
+        numeric = chunk.apply(pd.to_numeric, errors='coerce')
+        totals += numeric[keep[offset:offset + len(chunk)]].sum()
+        offset += len(chunk)
+    return {column: float(value) for column, value in totals.items()}
+
+def rewrite_file(file_path, keep):
+    """Reescribe el CSV solo con las filas conservadas, copiándolas sin re-formatear"""
+    fd, tmp_path = tempfile.mkstemp(dir=Path(file_path).parent, suffix='.csv.tmp')
+    try:
+        with open(file_path, newline='', encoding='utf-8') as source, \
+                os.fdopen(fd, 'w', newline='', encoding='utf-8') as target:
+            reader = csv.reader(source)
+            writer = csv.writer(target)
+            writer.writerow(next(reader))
+            rows = (row for row in reader if row)
+            writer.writerows(row for kept, row in zip(keep, rows) if kept)
+            if next(rows, None) is not None:
+                raise ValueError("El archivo tiene más filas de las que pandas pudo leer")
+        os.replace(tmp_path, file_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _load_state():
+    state_file = VALIDATION_SETTINGS['state_file']
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"No se pudo leer el estado de validación, se ignorará: {e}")
+        return {}
+
+def _save_state(state):
+    state_file = VALIDATION_SETTINGS['state_file']
+    folder = os.path.dirname(state_file) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, state_file)
+
+def compare_with_previous(result, previous):
+    """Error si las filas o algún total cayeron más de lo permitido respecto a la validación anterior"""
+    if not previous:
+        return
+    max_drop = VALIDATION_SETTINGS['max_drop_ratio']
+    if previous['rows'] and result.rows_out < previous['rows'] * (1 - max_drop):
+        result.errors.append(f"Las filas bajaron de {previous['rows']} a {result.rows_out}")
+    for column, value in result.totals.items():
+        before = previous.get('totals', {}).get(column)
+        if before and before > 0 and value < before * (1 - max_drop):
+            result.errors.append(f"El total de {column} bajó de {before:.2f} a {value:.2f}")
+
+def quarantine_file(file_path, result):
+    """Mueve el archivo y su reporte a la cuarentena, conservando solo los más recientes"""
+    file_path = Path(file_path)
+    folder = file_path.parent / VALIDATION_SETTINGS['quarantine_dir']
+    folder.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    target = folder / f"{file_path.stem}_{stamp}{file_path.suffix}"
+    shutil.move(str(file_path), target)
+    with open(target.with_suffix('.json'), 'w', encoding='utf-8') as f:
+        json.dump(result.to_dict(), f, indent=2, ensure_ascii=False)
+    result.quarantined_to = target
+
+    quarantined = sorted(folder.glob(f"*{file_path.suffix}"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for old_file in quarantined[VALIDATION_SETTINGS['max_quarantined']:]:
+        old_file.unlink()
+        old_file.with_suffix('.json').unlink(missing_ok=True)
+    return target
+
+def _check_file(file_path, result, previous=None, require_rows=True):
+    """
+    Revisa columnas, filas inválidas, duplicados y totales, y los compara con `previous`.
+
+    Returns:
+        numpy.ndarray: Máscara de filas a conservar, o None si las columnas no son válidas
+    """
+    keep = None
+    check_columns(_read_header(file_path), result)
+    if result.ok:
+        keep = scan_file(file_path, result)
+        if result.invalid_rows > VALIDATION_SETTINGS['max_invalid_rows']:
+            result.errors.append(f"{result.invalid_rows} filas con día o valores numéricos inválidos")
+        if require_rows and result.rows_out == 0:
+            result.errors.append("El archivo no tiene filas de datos")
+    if result.ok:
+        result.totals = sum_totals(file_path, keep)
+        compare_with_previous(result, previous)
+
+    tracing.count('rows_duplicated', result.duplicates)
+    tracing.count('rows_totals', result.totals_rows)
+    return keep
+
+def _clean_file(file_path, result, keep):
+    """Quita del archivo las filas de TOTALS y duplicadas"""
+    for warning in result.warnings:
+        logging.warning(f"{file_path}: {warning}")
+    if result.rows_out != result.rows_in:
+        rewrite_file(file_path, keep)
+    logging.info(f"Validación de {file_path.name}: {result.rows_in} filas, {result.totals_rows} de totales "
+                 f"y {result.duplicates} duplicados descartados, {result.invalid_rows} inválidas")
+
+def _record_state(key, result):
+    with _state_lock:
+        state = _load_state()
+        state[key] = {'rows': result.rows_out, 'totals': result.totals,
+                      'validated_at': datetime.now().isoformat(timespec='seconds')}
+        _save_state(state)
+
+def validate_download(download_path: Path, incremental: bool, require_rows: bool = True) -> ValidationResult:
+    """
+    Valida una descarga antes de combinarla con el CSV de la tienda y quita sus filas de
+    TOTALS y duplicadas. Si falla, la descarga se mueve a la cuarentena y el CSV de la
+    tienda no se toca. Una descarga incremental solo trae los días nuevos, así que no se
+    compara con la validación anterior.
+
+    Args:
+        download_path (Path): Archivo descargado
+        incremental (bool): La descarga es solo el rango desde el watermark
+        require_rows (bool): Fallar si no trae filas; False cuando la ventana exportada no
+            tiene días terminados (ver stores.has_closed_days)
+    Returns:
+        ValidationResult: Conteos, errores y, si falló, la ruta en cuarentena
+    """
+    file_path = Path(download_path)
+    result = ValidationResult(file_path)
+    key = str(file_path.absolute())
+    previous = None
+    if not incremental:
+        with _state_lock:
+            previous = _load_state().get(key)
+
+    keep = _check_file(file_path, result, previous, require_rows)
+    if not result.ok:
+        target = quarantine_file(file_path, result)
+        logging.error(f"Validación fallida para {file_path}, movido a {target}: {'; '.join(result.errors)}")
+        return result
+
+    _clean_file(file_path, result, keep)
+    if not incremental:
+        _record_state(key, result)
+    return result
+
+def validate_csv_file(file_path: Path, force: bool = False, require_rows: bool = True) -> ValidationResult:
+    """
+    Valida el CSV de la tienda y quita filas de TOTALS y duplicados. Si falla, el archivo
+    queda en su lugar para que no se procese ni se suba; solo las descargas van a la
+    cuarentena (ver validate_download). Se omite si el archivo no cambió desde la última
+    validación exitosa.
+
+    Args:
+        file_path (Path): CSV de la tienda
+        force (bool): Validar aunque el archivo no haya cambiado
+        require_rows (bool): Fallar si no tiene filas; False para el CSV del año abierto
+            mientras no tiene días terminados
+    Returns:
+        ValidationResult: Conteos y errores
+    """
+    file_path = Path(file_path)
+    result = ValidationResult(file_path)
+    manifest = FileManifest.shared()
+    if not force and manifest.is_unchanged('validate', file_path, file_path):
+        logging.info(f"{file_path} no cambió desde la última validación, se omite")
+        entry = manifest.get('validate', file_path)
+        result.rows_in = result.rows_out = entry.get('rows') or 0
+        return result
+
+    key = str(file_path.absolute())
+    with _state_lock:
+        previous = _load_state().get(key)
+
+    keep = _check_file(file_path, result, previous, require_rows)
+    if not result.ok:
+        logging.error(f"Validación fallida para {file_path}, no se procesará: {'; '.join(result.errors)}")
+        return result
+
+    _clean_file(file_path, result, keep)
+    _record_state(key, result)
+    manifest.record('validate', file_path, file_path, rows=result.rows_out)
+    return result
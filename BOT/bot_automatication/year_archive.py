@@ -0,0 +1,334 @@
+"""
+Archivo histórico de las ventas por año. Cuando cambia el año, el CSV del año cerrado se
+valida, procesa y sube como el del año abierto y luego se congela en
+`<carpeta de la tienda>/archive/year=<año>/` como un Parquet comprimido ordenado por día y
+SKU, con un índice JSON que indica en qué filas está cada día y en qué días aparece cada
+SKU. Solo el CSV del año abierto se sigue exportando y reescribiendo.
+
+Las consultas entre años leen del archivo únicamente los row groups que cubren los días
+pedidos, y del año abierto las particiones del dataset Parquet de la tienda.
+"""
+from bisect import bisect_right
+from datetime import date, timedelta
+from pathlib import Path
+import csv
+import json
+import logging
+import os
+import tempfile
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from config import (STORE_CONFIGS, ARCHIVE_SETTINGS, PARQUET_SETTINGS, EXPORT_SETTINGS,
+                    DAY_COLUMN, NUMERIC_COLUMNS)
+from stores import get_open_year, get_store_year_files
+from incremental_export import WatermarkStore
+from manifest import file_sha256
+import parquet_store
+
+INDEX_FILE = 'index.json'
+
+def get_archive_dir(store_type) -> Path:
+    """Carpeta del archivo histórico de una tienda"""
+    return Path(STORE_CONFIGS[store_type]['folder_name']) / ARCHIVE_SETTINGS['archive_dir']
+
+def _year_dir(archive_dir, year):
+    return Path(archive_dir) / f"year={year}"
+
+def archived_years(archive_dir):
+    """Años con archivo histórico, en orden"""
+    archive_dir = Path(archive_dir)
+    if not archive_dir.is_dir():
+        return []
+    years = [int(path.name.split('=', 1)[1]) for path in archive_dir.glob('year=*')
+             if (path / INDEX_FILE).exists()]
+    return sorted(years)
+
+def load_index(archive_dir, year):
+    """Índice del año archivado, o None si el año no está archivado"""
+    index_path = _year_dir(archive_dir, year) / INDEX_FILE
+    if not index_path.exists():
+        return None
+    with open(index_path, encoding='utf-8') as f:
+        return json.load(f)
+
+def is_archived(csv_path, archive_dir, year):
+    """True si el año ya está archivado a partir de este mismo CSV"""
+    index = load_index(archive_dir, year)
+    return index is not None and index['source_sha256'] == file_sha256(csv_path)
+
+def _read_csv(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        columns = next(csv.reader(f), [])
+    if DAY_COLUMN not in columns:
+        raise ValueError(f"El archivo {csv_path} no tiene la columna {DAY_COLUMN}")
+    table = pa_csv.read_csv(csv_path, convert_options=pa_csv.ConvertOptions(
+        column_types=parquet_store.column_types(columns)))
+    return table, columns
+
+def _build_index(table, sku_column):
+    """Rango de filas de cada día y días en que aparece cada SKU, sobre la tabla ya ordenada"""
+    days = table[DAY_COLUMN].to_numpy()
+    unique_days, starts, counts = np.unique(days, return_index=True, return_counts=True)
+    day_ranges = {str(day): [int(start), int(start + count)]
+                  for day, start, count in zip(unique_days, starts, counts)}
+
+    sku_days = {}
+    if sku_column in table.column_names:
+        grouped = table.group_by(sku_column).aggregate([(DAY_COLUMN, 'distinct')])
+        for sku, sku_day_list in zip(grouped[sku_column].to_pylist(),
+                                     grouped[f"{DAY_COLUMN}_distinct"].to_pylist()):
+            sku_days[sku or ''] = sorted(day.isoformat() for day in sku_day_list)
+    return day_ranges, sku_days
+
+def _atomic_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def archive_year(csv_path, archive_dir, year):
+    """
+    Congela el CSV de un año en un Parquet comprimido ordenado por día y SKU, con su índice.
+
+    Las filas sin día (la fila de TOTALS de WITH TOTALS) no se archivan. El Parquet se
+    escribe con un nombre que incluye el hash del CSV y el índice, que lo referencia, se
+    reemplaza atómicamente al final: un archivado interrumpido deja el anterior intacto.
+
+    Args:
+        csv_path (Path): CSV del año cerrado
+        archive_dir (Path): Carpeta del archivo histórico de la tienda
+        year (int): Año que se archiva
+    Returns:
+        dict: Índice del año archivado
+    """
+    sku_column = ARCHIVE_SETTINGS['sku_column']
+    source_sha256 = file_sha256(csv_path)
+    table, columns = _read_csv(csv_path)
+    without_day = table[DAY_COLUMN].null_count
+    if without_day:
+        logging.info(f"{csv_path}: {without_day} filas sin día (totales) no se archivan")
+        table = table.filter(pc.is_valid(table[DAY_COLUMN]))
+    sort_keys = [(DAY_COLUMN, 'ascending')]
+    if sku_column in columns:
+        sort_keys.append((sku_column, 'ascending'))
+    table = table.sort_by(sort_keys)
+
+    year_dir = _year_dir(archive_dir, year)
+    year_dir.mkdir(parents=True, exist_ok=True)
+    data_file = f"data-{source_sha256[:12]}.parquet"
+    tmp_path = year_dir / f"{data_file}.tmp"
+    pq.write_table(table, tmp_path, compression=ARCHIVE_SETTINGS['compression'],
+                   row_group_size=ARCHIVE_SETTINGS['row_group_size'])
+    os.replace(tmp_path, year_dir / data_file)
+
+    metadata = pq.ParquetFile(year_dir / data_file).metadata
+    row_group_starts = []
+    offset = 0
+    for i in range(metadata.num_row_groups):
+        row_group_starts.append(offset)
+        offset += metadata.row_group(i).num_rows
+
+    day_ranges, sku_days = _build_index(table, sku_column)
+    index = {
+        'year': year,
+        'data_file': data_file,
+        'source': str(csv_path),
+        'source_sha256': source_sha256,
+        'columns': columns,
+        'rows': table.num_rows,
+        'min_day': min(day_ranges) if day_ranges else None,
+        'max_day': max(day_ranges) if day_ranges else None,
+        'row_group_starts': row_group_starts,
+        'days': day_ranges,
+        'sku_days': sku_days
+    }
+    _atomic_json(year_dir / INDEX_FILE, index)
+
+    for old_file in year_dir.glob('data-*.parquet'):
+        if old_file.name != data_file:
+            old_file.unlink()
+    logging.info(f"Año {year} archivado en {year_dir}: {table.num_rows} filas, {len(day_ranges)} días")
+    return index
+
+def _row_filter(since, until, skus, sku_column, column_names):
+    expression = None
+    conditions = [
+        pc.field(DAY_COLUMN) >= pa.scalar(since, pa.date32()) if since else None,
+        pc.field(DAY_COLUMN) <= pa.scalar(until, pa.date32()) if until else None,
+        pc.field(sku_column).isin(list(skus)) if skus and sku_column in column_names else None
+    ]
+    for condition in conditions:
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+    return expression
+
+def read_archive(archive_dir, year, since=None, until=None, skus=None, columns=None):
+    """
+    Lee de un año archivado las filas de los días y SKUs pedidos. Con el índice se eligen
+    solo los row groups que contienen esos días; el resto del archivo no se lee.
+
+    Args:
+        archive_dir (Path): Carpeta del archivo histórico de la tienda
+        year (int): Año archivado
+        since (date): Primer día incluido
+        until (date): Último día incluido
+        skus (list): SKUs a incluir, por defecto todos
+        columns (list): Columnas a leer, por defecto todas
+    Returns:
+        pyarrow.Table: Filas seleccionadas
+    """
+    sku_column = ARCHIVE_SETTINGS['sku_column']
+    index = load_index(archive_dir, year)
+    parquet_file = pq.ParquetFile(_year_dir(archive_dir, year) / index['data_file'])
+    columns = columns or index['columns']
+    read_columns = list(dict.fromkeys(columns + [DAY_COLUMN] + ([sku_column] if skus else [])))
+    read_columns = [column for column in read_columns if column in index['columns']]
+
+    since_key = since.isoformat() if since else ''
+    until_key = until.isoformat() if until else '9999-12-31'
+    days = {day for day in index['days'] if since_key <= day <= until_key}
+    if skus:
+        sku_days = set()
+        for sku in skus:
+            sku_days.update(index['sku_days'].get(sku, []))
+        days &= sku_days
+
+    starts = index['row_group_starts']
+    row_groups = set()
+    for day in days:
+        start, stop = index['days'][day]
+        row_groups.update(range(bisect_right(starts, start) - 1, bisect_right(starts, stop - 1)))
+    if not row_groups:
+        return parquet_file.schema_arrow.empty_table().select(columns)
+
+    table = parquet_file.read_row_groups(sorted(row_groups), columns=read_columns)
+    expression = _row_filter(since, until, skus, sku_column, read_columns)
+    if expression is not None:
+        table = table.filter(expression)
+    return table.select(columns)
+
+def _read_csv_range(csv_path, since, until, skus, columns):
+    table, _ = _read_csv(csv_path)
+    expression = _row_filter(since, until, skus, ARCHIVE_SETTINGS['sku_column'], table.column_names)
+    if expression is not None:
+        table = table.filter(expression)
+    return table.select(columns)
+
+def query_sales(store_type, since=None, until=None, skus=None, columns=None):
+    """
+    Ventas de una tienda entre dos días, aunque el rango abarque varios años. Los años
+    archivados se leen por el índice; el año abierto desde su dataset Parquet (o su CSV si
+    el dataset está deshabilitado), y un año cerrado aún sin archivar desde su CSV.
+
+    Args:
+        store_type (str): Tienda de STORE_CONFIGS
+        since (date): Primer día incluido
+        until (date): Último día incluido
+        skus (list): SKUs a incluir, por defecto todos
+        columns (list): Columnas, por defecto día, SKU y columnas numéricas
+    Returns:
+        pyarrow.Table: Filas de todos los años en el rango
+    """
+    sku_column = ARCHIVE_SETTINGS['sku_column']
+    columns = columns or [DAY_COLUMN, sku_column] + NUMERIC_COLUMNS
+    archive_dir = get_archive_dir(store_type)
+    open_year = get_open_year()
+    since_key = since.isoformat() if since else ''
+    until_key = until.isoformat() if until else '9999-12-31'
+
+    tables = []
+    years = archived_years(archive_dir)
+    for year in years:
+        index = load_index(archive_dir, year)
+        if index['min_day'] is None or index['max_day'] < since_key or index['min_day'] > until_key:
+            continue
+        tables.append(read_archive(archive_dir, year, since, until, skus, columns))
+
+    for year, csv_path in get_store_year_files(store_type).items():
+        if year in years or (since and year < since.year) or (until and year > until.year):
+            continue
+        dataset_dir = csv_path.parent / PARQUET_SETTINGS['dataset_dir']
+        if year == open_year and PARQUET_SETTINGS['enabled'] and dataset_dir.is_dir():
+            table = parquet_store.read_dataset(dataset_dir, columns=columns, since=since, until=until)
+            if skus:
+                table = table.filter(pc.field(sku_column).isin(list(skus)))
+            tables.append(table.select(columns))
+        else:
+            tables.append(_read_csv_range(csv_path, since, until, skus, columns))
+
+    if not tables:
+        schema = pa.schema([(column, parquet_store.column_types(columns)[column]) for column in columns])
+        return schema.empty_table()
+    schema = tables[0].schema
+    return pa.concat_tables([table.cast(schema) for table in tables])
+
+def _same_day_last_year(day):
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:
+        return day.replace(year=day.year - 1, day=28)
+
+def compare_with_last_year(store_type, since, until, metric='Net sales', group_by=None):
+    """
+    Totales de `metric` por SKU (u otra columna) en el rango y en el mismo rango del año
+    anterior, p. ej. marzo de este año contra marzo del año pasado.
+
+    Returns:
+        pyarrow.Table: Columna de agrupación, `metric` y `<metric> last year`
+    """
+    group_by = group_by or ARCHIVE_SETTINGS['sku_column']
+    totals = []
+    for period_since, period_until, name in (
+            (since, until, metric),
+            (_same_day_last_year(since), _same_day_last_year(until), f"{metric} last year")):
+        table = query_sales(store_type, period_since, period_until, columns=[group_by, metric])
+        totals.append(table.group_by(group_by).aggregate([(metric, 'sum')])
+                      .rename_columns([group_by, name]))
+    return totals[0].join(totals[1], group_by, join_type='full outer').sort_by(group_by)
+
+def month_range(year, month):
+    """Primer y último día del mes"""
+    first = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return first, next_month - timedelta(days=1)
+
+def years_to_close(store_type, today=None):
+    """
+    Años anteriores al abierto cuyo CSV todavía no recibió las ventas hasta el 31 de
+    diciembre según su watermark: se exportan una última vez antes de archivarlos. Un año
+    sin watermark no se sabe completo y también se exporta.
+    """
+    if not EXPORT_SETTINGS['incremental']:
+        return []
+    watermarks = WatermarkStore(EXPORT_SETTINGS['watermark_file'])
+    open_year = get_open_year(today)
+    archive_dir = get_archive_dir(store_type)
+    closing = []
+    for year in get_store_year_files(store_type):
+        if year >= open_year or load_index(archive_dir, year) is not None:
+            continue
+        watermark = watermarks.get(store_type, year)
+        if watermark is None or watermark < date(year, 12, 31):
+            closing.append(year)
+    return closing
+
+def years_to_archive(store_type, today=None):
+    """
+    CSV de años cerrados que no están archivados o que cambiaron desde el último archivado.
+    El pipeline los valida, procesa y sube antes de archivarlos.
+
+    Returns:
+        dict: Ruta del CSV por año
+    """
+    open_year = get_open_year(today)
+    archive_dir = get_archive_dir(store_type)
+    return {year: csv_path for year, csv_path in get_store_year_files(store_type).items()
+            if year < open_year and not is_archived(csv_path, archive_dir, year)}